@@ -0,0 +1,125 @@
+from time import time
+import threading
+import Switch_Driver
+import Switch_Records
+
+class Arp_Resolver:
+
+    '''
+    Resolves MAC addresses to IP addresses from whole ARP tables. The ARP table of each gateway (the dist or VSS
+    switch that routes for an access switch) is pulled once with 'show ip arp' and indexed by MAC, then every access
+    switch behind that gateway is answered from memory. Share one resolver between drivers to share the tables.
+    @args username: username to log into the gateways
+    @args password: password associated with the username
+    @args ttl: seconds a gateway's ARP table is used before it is pulled again. Default is 300
+    @args pool: optional Connection_Pool for the gateway sessions. Give it a Jump_Host factory to reach the gateways through a bastion
+    @args topology: optional Cdp_Crawler. Access switches in its graph get their gateway from memory instead of from their CDP neighbors
+    @args devices: optional list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices).
+    Gateways found in it are opened with their own group and os, the rest as an ios switch of the group of gateway
+    '''
+
+    ### CDP neighbor name that marks the gateway of each access group, and the group of that gateway
+    GATEWAYS = {'access': ('vss', 'vss'), 'resnet-access': ('dist', 'resnet-dist')}
+
+    def __init__(self, username, password, ttl = 300, pool = None, topology = None, devices = None):
+        self.user = username
+        self.password = password
+        self.ttl = ttl
+        self.pool = pool
+        self.topology = topology
+        self.devices = {}
+        for device in devices if devices != None else []:
+            self.devices[device['hostname'].lower()] = device
+        self._tables = {}
+        self._gateways = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    '''
+    Returns the hostname of the gateway that holds the ARP entries for a driver's device, or None when it cannot be found.
+    dist and VSS switches are their own gateway, access switches use the matching CDP neighbor from the topology
+    graph when they are in it, or from the switch itself when they are not. A gateway that was not found is looked
+    up again on the next call, so one failed lookup does not leave the switch unresolvable.
+    '''
+    def gateway_for(self, drive):
+        if 'dist' in drive.device_group or drive.device_group == 'vss':
+            return drive.host
+        with self._lock:
+            gateway = self._gateways.get(drive.host)
+        if gateway != None:
+            return gateway
+        keyword = self.GATEWAYS.get(drive.device_group, (None, None))[0]
+        if keyword != None and self.topology != None and self.topology.known(drive.host):
+            gateway = self.topology.find_neighbor(drive.host, keyword)
+        elif keyword != None:
+            for neighbor in drive.get_cdp_neighbors():
+                if keyword in neighbor['device'].lower():
+                    ### CDP gives the domain name, the drivers add the domain themselves
+                    gateway = neighbor['device'].split('.')[0]
+                    break
+        if gateway != None:
+            with self._lock:
+                self._gateways[drive.host] = gateway
+        return gateway
+
+    '''
+    Returns the MAC to IP index of a gateway, pulling its ARP table when it is not loaded or older than ttl.
+    Only one thread pulls a given gateway, the others wait for its table.
+    @args gateway: hostname of the gateway
+    @args drive: an already connected Switch_Driver for the gateway. A new session is opened when this is not given
+    @args group: device group used when a new session is opened to a gateway that is not in devices
+    @args refresh: When true, the table is pulled again even if it is still fresh
+    '''
+    def table(self, gateway, drive = None, group = 'vss', refresh = False):
+        with self._lock:
+            lock = self._locks.setdefault(gateway, threading.Lock())
+        with lock:
+            loaded = self._tables.get(gateway)
+            if loaded != None and refresh == False and time() - loaded['time'] < self.ttl:
+                return loaded['index']
+            if drive != None:
+                arp_list = drive._parse('show ip arp')
+            else:
+                record = self.devices.get(gateway.lower(), {'group': group, 'os': 'ios'})
+                gateway_drive = Switch_Driver.Switch_Driver(gateway, self.user, self.password, record['group'], record['os'], pool = self.pool)
+                try:
+                    arp_list = gateway_drive._parse('show ip arp')
+                finally:
+                    gateway_drive.disconnect()
+            index = {}
+            for entry in arp_list:
+                if entry['mac'] != 'Incomplete':
+                    index[Switch_Records.mac_to_int(entry['mac'])] = entry['ip']
+            self._tables[gateway] = {'index': index, 'time': time()}
+            return index
+
+    '''
+    Returns a list of dictionaries with the MAC and its IP address, or N/A when the gateway has no ARP entry for it
+    @args drive: Switch_Driver of the device the MAC addresses were learned on
+    @args mac_addresses: list of MAC addresses in any format
+    '''
+    def resolve(self, drive, mac_addresses):
+        gateway = self.gateway_for(drive)
+        index = {}
+        if gateway == drive.host:
+            index = self.table(gateway, drive = drive)
+        elif gateway != None:
+            index = self.table(gateway, group = self.GATEWAYS[drive.device_group][1])
+        ip_list = []
+        for mac in mac_addresses:
+            try:
+                ip = index.get(Switch_Records.mac_to_int(mac), 'N/A')
+            except ValueError:
+                ip = 'N/A'
+            ip_list.append({'mac': mac, 'ip': ip})
+        return ip_list
+
+    '''
+    Forget the ARP table of one gateway, or of every gateway when none is given
+    '''
+    def invalidate(self, gateway = None):
+        with self._lock:
+            if gateway == None:
+                self._tables = {}
+            else:
+                self._tables.pop(gateway, None)
@@ -0,0 +1,181 @@
+from time import time
+import re
+import sqlite3
+import threading
+import Fleet_Executor
+
+'''
+Returns the hostname in a CDP Device ID, in lower case and without the domain or the serial number NX-OS adds in brackets
+'''
+def device_name(device_id):
+    return re.split(r'[.(]', device_id.strip())[0].lower()
+
+class Cdp_Crawler:
+
+    '''
+    Campus topology from CDP, kept in a SQLite file so uplink lookups are answered from memory instead of asking each
+    switch for its neighbors. A crawl starts at the core and walks CDP neighbors breadth first, one hop at a time,
+    polling every device of a hop at once through Fleet_Executor and never polling a device twice. Each edge is
+    (device, local port, neighbor, neighbor port). A device's edges are only rewritten where they differ from the
+    last crawl, so a refresh of a stable campus writes nothing but the crawl times.
+    @args username: username to log into the devices
+    @args password: password associated with the username
+    @args path: SQLite file the graph is kept in. Default is output/cdp_graph.db. Use ':memory:' for a graph that is not saved
+    @args max_sessions: devices polled at the same time during a crawl. Default is 100
+    @args pool: optional Connection_Pool for the device sessions
+    '''
+
+    ### Device os that answer 'show cdp neighbors'. Other devices are only seen from their neighbors
+    CDP_OS = ('ios', 'nx-os')
+
+    def __init__(self, username, password, path = 'output/cdp_graph.db', max_sessions = 100, pool = None):
+        self.user = username
+        self.password = password
+        self.max_sessions = max_sessions
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS edges (host TEXT, port TEXT, neighbor TEXT, remote_port TEXT, seen REAL, PRIMARY KEY (host, port, neighbor));
+            CREATE TABLE IF NOT EXISTS devices (host TEXT PRIMARY KEY, depth INTEGER, crawled REAL);
+            CREATE INDEX IF NOT EXISTS edges_neighbor ON edges (neighbor);
+        ''')
+        self._db.commit()
+        ### Edges of every crawled device, and the same edges keyed by the neighbor, as sets of (port, device, remote port)
+        self._graph = {}
+        self._reverse = {}
+        for (host,) in self._db.execute('SELECT host FROM devices').fetchall():
+            self._graph[host] = set()
+        for host, port, neighbor, remote_port in self._db.execute('SELECT host, port, neighbor, remote_port FROM edges').fetchall():
+            self._graph.setdefault(host, set()).add((port, neighbor, remote_port))
+            self._reverse.setdefault(neighbor, set()).add((remote_port, host, port))
+
+    '''
+    Poll one device. Runs inside a Fleet_Executor worker. Returns the set of its edges.
+    '''
+    def _poll(self, drive):
+        edges = set()
+        for neighbor in drive.iter_cdp_neighbors():
+            edges.add((neighbor['port'], device_name(neighbor['device']), neighbor.get('remote_port', '')))
+        return edges
+
+    '''
+    Replace the edges of one device, writing only the ones that were added or removed. Returns (added, removed).
+    '''
+    def _store(self, host, edges, depth):
+        now = time()
+        with self._lock:
+            old = self._graph.get(host, set())
+            added = edges - old
+            removed = old - edges
+            self._db.executemany('DELETE FROM edges WHERE host = ? AND port = ? AND neighbor = ?',
+                                 [(host, port, neighbor) for port, neighbor, remote_port in removed])
+            self._db.executemany('INSERT OR REPLACE INTO edges VALUES (?, ?, ?, ?, ?)',
+                                 [(host, port, neighbor, remote_port, now) for port, neighbor, remote_port in added])
+            self._db.execute('INSERT OR REPLACE INTO devices VALUES (?, ?, ?)', (host, depth, now))
+            self._db.commit()
+            for port, neighbor, remote_port in removed:
+                self._reverse[neighbor].discard((remote_port, host, port))
+            for port, neighbor, remote_port in added:
+                self._reverse.setdefault(neighbor, set()).add((remote_port, host, port))
+            self._graph[host] = set(edges)
+        return added, removed
+
+    '''
+    Crawl the campus breadth first from the seeds and bring the graph up to date. Only neighbors that are in devices
+    are polled. Returns a dictionary with the hosts crawled, the edges added and removed per changed host, the hosts
+    that had not changed, the hosts that failed, with their exception, and the neighbors that are not in devices.
+    @args devices: list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices)
+    @args seeds: list of hostnames to start from. Default is every core device
+    @args max_depth: hops from the seeds to crawl. Default is no limit
+    '''
+    def crawl(self, devices, seeds = None, max_depth = None):
+        inventory = {}
+        for device in devices:
+            inventory[device['hostname'].lower()] = device
+        if seeds == None:
+            seeds = [device['hostname'] for device in devices if device['group'] == 'core']
+        level = [inventory[seed.lower()] for seed in seeds if seed.lower() in inventory]
+        visited = set([device['hostname'].lower() for device in level])
+        report = {'crawled': [], 'changed': {}, 'unchanged': [], 'failed': [], 'unknown': []}
+        unknown = set()
+        executor = Fleet_Executor.Fleet_Executor(self.user, self.password, max_sessions = self.max_sessions, pool = self.pool)
+        depth = 0
+        while len(level) > 0 and (max_depth == None or depth <= max_depth):
+            found = []
+
+            def store(result):
+                host = result['host'].lower()
+                if result['error'] != None:
+                    report['failed'].append((result['host'], result['error']))
+                    return
+                report['crawled'].append(result['host'])
+                added, removed = self._store(host, result['result'], depth)
+                if len(added) > 0 or len(removed) > 0:
+                    report['changed'][result['host']] = {'added': sorted(added), 'removed': sorted(removed)}
+                else:
+                    report['unchanged'].append(result['host'])
+                for port, neighbor, remote_port in result['result']:
+                    found.append(neighbor)
+
+            executor.run([device for device in level if device['os'] in self.CDP_OS], self._poll, callback = store)
+            level = []
+            for neighbor in found:
+                if neighbor not in inventory:
+                    unknown.add(neighbor)
+                elif neighbor not in visited:
+                    visited.add(neighbor)
+                    level.append(inventory[neighbor])
+            depth += 1
+        report['unknown'] = sorted(unknown)
+        return report
+
+    '''
+    Returns true when the graph has edges from or to a host
+    '''
+    def known(self, host):
+        host = host.lower()
+        with self._lock:
+            return host in self._graph or len(self._reverse.get(host, ())) > 0
+
+    '''
+    Returns a list of dictionaries with the local port, neighbor and neighbor port of every edge of a host. Edges
+    seen only from the neighbor's side, such as from a switch that does not run CDP, are included.
+    '''
+    def neighbors(self, host):
+        host = host.lower()
+        with self._lock:
+            edges = set(self._graph.get(host, ()))
+            if host not in self._graph:
+                edges.update(self._reverse.get(host, ()))
+        return [{'port': port, 'device': neighbor, 'remote_port': remote_port} for port, neighbor, remote_port in sorted(edges)]
+
+    '''
+    Returns the hostname of the first neighbor of a host whose name contains keyword, such as the VSS an access
+    switch uplinks to, or None when there is none. Answered from memory.
+    '''
+    def find_neighbor(self, host, keyword):
+        for edge in self.neighbors(host):
+            if keyword in edge['device']:
+                return edge['device']
+        return None
+
+    '''
+    Returns a list of dictionaries with every edge in the graph
+    '''
+    def edges(self):
+        with self._lock:
+            rows = self._db.execute('SELECT host, port, neighbor, remote_port, seen FROM edges ORDER BY host, port').fetchall()
+        return [{'host': host, 'port': port, 'device': neighbor, 'remote_port': remote_port, 'seen': seen} for host, port, neighbor, remote_port, seen in rows]
+
+    '''
+    Returns the number of crawled devices and edges in the graph
+    '''
+    def stats(self):
+        with self._lock:
+            return {'devices': self._db.execute('SELECT COUNT(*) FROM devices').fetchone()[0],
+                    'edges': self._db.execute('SELECT COUNT(*) FROM edges').fetchone()[0]}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,170 @@
+from time import time
+import difflib
+import json
+import sqlite3
+import threading
+import zlib
+import Config_Backup
+
+class Config_Archive:
+
+    '''
+    Local archive of every version of every device config, addressed by the SHA-256 of the normalized config
+    (see Config_Backup.normalize_config). A config that is already in the archive, from an earlier run or from another
+    host, is stored once. A new version is stored as the changed lines against the host's previous version, with a
+    full copy every MAX_CHAIN versions so rebuilding a config never replays a long chain. Versions are only recorded
+    when the digest changes, so the version list of a host is its change history.
+    The archive has the same digest() and put() as Config_Store, so it can be given to Config_Backup as its store.
+    @args path: SQLite file the archive is kept in. Default is output/config_archive.db
+    '''
+
+    ### Deltas allowed between full copies
+    MAX_CHAIN = 20
+
+    def __init__(self, path = 'output/config_archive.db'):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, base TEXT, depth INTEGER, data BLOB);
+            CREATE TABLE IF NOT EXISTS versions (host TEXT, time REAL, digest TEXT, PRIMARY KEY (host, time));
+            CREATE INDEX IF NOT EXISTS versions_time ON versions (time);
+        ''')
+        self._db.commit()
+
+    '''
+    Returns the digest of the newest version of a host, or of the version in place at a time, or None when there is none
+    '''
+    def digest(self, hostname, when = None):
+        with self._lock:
+            if when == None:
+                row = self._db.execute('SELECT digest FROM versions WHERE host = ? ORDER BY time DESC LIMIT 1', (hostname,)).fetchone()
+            else:
+                row = self._db.execute('SELECT digest FROM versions WHERE host = ? AND time <= ? ORDER BY time DESC LIMIT 1', (hostname, when)).fetchone()
+        return row[0] if row != None else None
+
+    '''
+    Add a config to the archive. Returns true when it is a new version for the host.
+    @args when: time of the version in seconds since the epoch. Default is now
+    @args device_os: os of the device, as Config_Backup gives it to every store. Versions of every os are kept together
+    '''
+    def put(self, hostname, config, when = None, device_os = None):
+        if when == None:
+            when = time()
+        config = Config_Backup.normalize_config(config)
+        digest = Config_Backup.config_digest(config)
+        previous = self.digest(hostname)
+        if previous == digest:
+            return False
+        with self._lock:
+            known = self._db.execute('SELECT 1 FROM objects WHERE digest = ?', (digest,)).fetchone()
+        if known == None:
+            self._store_object(digest, config, previous)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO versions VALUES (?, ?, ?)', (hostname, when, digest))
+            self._db.commit()
+        return True
+
+    '''
+    Store one config, as the changed lines against the base config when the base is not too deep a chain already
+    '''
+    def _store_object(self, digest, config, base):
+        depth = None
+        if base != None:
+            with self._lock:
+                row = self._db.execute('SELECT depth FROM objects WHERE digest = ?', (base,)).fetchone()
+            if row != None and row[0] < self.MAX_CHAIN:
+                depth = row[0] + 1
+        if depth == None:
+            base = None
+            depth = 0
+            data = config
+        else:
+            data = json.dumps(self._delta(self._load(base).split('\n'), config.split('\n')))
+        with self._lock:
+            self._db.execute('INSERT OR IGNORE INTO objects VALUES (?, ?, ?, ?)', (digest, base, depth, zlib.compress(data.encode())))
+            self._db.commit()
+
+    '''
+    Returns a list of operations that turn the old lines into the new ones. ['=', start, end] copies old lines and
+    ['+', lines] adds new ones.
+    '''
+    def _delta(self, old_lines, new_lines):
+        ops = []
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk = False).get_opcodes():
+            if tag == 'equal':
+                ops.append(['=', i1, i2])
+            elif j2 > j1:
+                ops.append(['+', new_lines[j1:j2]])
+        return ops
+
+    '''
+    Returns the config stored under a digest, rebuilding it from its base when it was stored as a delta
+    '''
+    def _load(self, digest):
+        chain = []
+        while digest != None:
+            with self._lock:
+                row = self._db.execute('SELECT base, data FROM objects WHERE digest = ?', (digest,)).fetchone()
+            if row == None:
+                raise KeyError('No config with digest ' + digest)
+            chain.append(zlib.decompress(row[1]).decode())
+            digest = row[0]
+        lines = chain.pop().split('\n')
+        while len(chain) > 0:
+            new_lines = []
+            for op in json.loads(chain.pop()):
+                if op[0] == '=':
+                    new_lines.extend(lines[op[1]:op[2]])
+                else:
+                    new_lines.extend(op[1])
+            lines = new_lines
+        return '\n'.join(lines)
+
+    '''
+    Returns the normalized config of a host as it was at a time, or the newest one. Returns None when there is no version.
+    '''
+    def get(self, hostname, when = None):
+        digest = self.digest(hostname, when)
+        return self._load(digest) if digest != None else None
+
+    '''
+    Returns a list of unified diff lines between the config of a host at two times. An empty list means no change.
+    @args t1, t2: times in seconds since the epoch. None means the newest version
+    '''
+    def diff(self, hostname, t1, t2 = None):
+        digest1 = self.digest(hostname, t1)
+        digest2 = self.digest(hostname, t2)
+        if digest1 == digest2:
+            return []
+        old_lines = self._load(digest1).split('\n') if digest1 != None else []
+        new_lines = self._load(digest2).split('\n') if digest2 != None else []
+        return list(difflib.unified_diff(old_lines, new_lines, hostname + ' ' + str(t1), hostname + ' ' + str(t2), lineterm = ''))
+
+    '''
+    Returns a sorted list of hosts with a new config version after a time
+    '''
+    def changed_since(self, when):
+        with self._lock:
+            rows = self._db.execute('SELECT DISTINCT host FROM versions WHERE time > ? ORDER BY host', (when,)).fetchall()
+        return [row[0] for row in rows]
+
+    '''
+    Returns a list of (time, digest) of every version of a host, oldest first
+    '''
+    def history(self, hostname):
+        with self._lock:
+            return self._db.execute('SELECT time, digest FROM versions WHERE host = ? ORDER BY time', (hostname,)).fetchall()
+
+    '''
+    Returns the number of hosts, versions and stored configs, and how many of the stored configs are deltas
+    '''
+    def stats(self):
+        with self._lock:
+            return {'hosts': self._db.execute('SELECT COUNT(DISTINCT host) FROM versions').fetchone()[0],
+                    'versions': self._db.execute('SELECT COUNT(*) FROM versions').fetchone()[0],
+                    'objects': self._db.execute('SELECT COUNT(*) FROM objects').fetchone()[0],
+                    'deltas': self._db.execute('SELECT COUNT(*) FROM objects WHERE base IS NOT NULL').fetchone()[0]}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,198 @@
+from time import time
+import hashlib
+import json
+import os
+import re
+import threading
+import Dialogues
+import Fleet_Executor
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+### Lines that change on every 'show run' without the configuration changing
+VOLATILE_LINES = [
+    re.compile(r'^Building configuration'),
+    re.compile(r'^Current configuration\s*:'),
+    re.compile(r'^!\s*(Last configuration change|NVRAM config last updated|No configuration change since|Time:)'),
+    re.compile(r'^!\s*Command: show running-config'),
+    re.compile(r'^!\s*Running configuration last done at'),
+    re.compile(r'^ntp clock-period'),
+]
+
+'''
+Returns a config with line endings, trailing spaces and the lines that change on every read removed, so two reads
+of an unchanged config are equal
+'''
+def normalize_config(config):
+    lines = []
+    for line in config.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        line = line.rstrip()
+        volatile = False
+        for pattern in VOLATILE_LINES:
+            if pattern.match(line):
+                volatile = True
+                break
+        if not volatile:
+            lines.append(line)
+    while len(lines) > 0 and lines[-1] == '':
+        lines.pop()
+    return '\n'.join(lines) + '\n'
+
+'''
+Returns the SHA-256 of a normalized config
+'''
+def config_digest(config):
+    return hashlib.sha256(normalize_config(config).encode()).hexdigest()
+
+class Config_Store:
+
+    '''
+    Local directory of backed up configs, one <hostname>.cfg per device. The digest of every stored config is kept
+    in index.json so a backup can tell that a config has not changed without reading the old file.
+    @args root: directory the configs are written to. Default is output/configs
+    '''
+
+    def __init__(self, root = 'output/configs'):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok = True)
+        self._index_path = os.path.join(root, 'index.json')
+        self._index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as index_file:
+                self._index = json.load(index_file)
+
+    def digest(self, hostname):
+        with self._lock:
+            return self._index.get(hostname, {}).get('digest')
+
+    '''
+    Store a config unless it is the same as the stored one. Returns true when the config was written.
+    @args device_os: os of the device. Used by stores that keep the configs of each os apart
+    '''
+    def put(self, hostname, config, device_os = None):
+        digest = config_digest(config)
+        if self.digest(hostname) == digest:
+            return False
+        self._write_file(hostname, config, device_os)
+        with self._lock:
+            self._index[hostname] = {'digest': digest, 'time': time()}
+            temp_path = self._index_path + '.tmp'
+            with open(temp_path, 'w') as index_file:
+                json.dump(self._index, index_file)
+            os.replace(temp_path, self._index_path)
+        return True
+
+    '''
+    Writes the config file. The file is written under a temporary name first so a failed write never leaves half a config.
+    '''
+    def _write_file(self, hostname, config, device_os = None):
+        path = os.path.join(self.root, hostname + '.cfg')
+        with open(path + '.tmp', 'w') as config_file:
+            config_file.write(config)
+        os.replace(path + '.tmp', path)
+
+class Sftp_Store(Config_Store):
+
+    '''
+    Config_Store that uploads the configs to a server over SFTP, such as atconfig, instead of writing them locally.
+    The digest index is still kept in a local directory. Config_Store is the local stand-in for it.
+    Configs go to the same directories the SCP backup dialogues copy to: Dell configs to the Dell directory and the
+    rest to the Cisco one. The server's host key must already be in known_hosts, an unknown or changed key is refused.
+    @args server: hostname or IP address of the SFTP server
+    @args username: username used to log into the server
+    @args password: password associated with username
+    @args remote_dirs: dictionary of os to the directory on the server its configs are written to. Default is Dell to Dialogues.DELL_DIR
+    @args remote_dir: directory on the server for the configs of any other os. Default is Dialogues.CISCO_DIR
+    @args root: local directory for the digest index. Default is output/configs
+    @args known_hosts: known_hosts file with the server's host key. Default is ~/.ssh/known_hosts
+    '''
+
+    def __init__(self, server, username, password, remote_dirs = None, remote_dir = Dialogues.CISCO_DIR, root = 'output/configs', known_hosts = None):
+        if paramiko == None:
+            raise ImportError('Sftp_Store needs paramiko')
+        Config_Store.__init__(self, root)
+        self.remote_dirs = remote_dirs if remote_dirs != None else {'dell': Dialogues.DELL_DIR}
+        self.remote_dir = remote_dir
+        self._client = paramiko.SSHClient()
+        if known_hosts == None:
+            self._client.load_system_host_keys()
+        else:
+            self._client.load_host_keys(known_hosts)
+        self._client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        self._client.connect(server, port = 22, username = username, password = password, look_for_keys = False, allow_agent = False)
+        self._sftp = self._client.open_sftp()
+        self._sftp_lock = threading.Lock()
+
+    def _write_file(self, hostname, config, device_os = None):
+        path = self.remote_dirs.get(device_os, self.remote_dir) + '/' + hostname + '.cfg'
+        ### One SFTP channel is shared by every backup worker
+        with self._sftp_lock:
+            with self._sftp.open(path + '.tmp', 'w') as config_file:
+                config_file.write(config)
+            self._sftp.posix_rename(path + '.tmp', path)
+
+    def close(self):
+        self._sftp.close()
+        self._client.close()
+
+class Config_Backup:
+
+    '''
+    Backs up the running-config of many devices at the same time. Each config is read from the device (with
+    'show running-config', or pulled with SCP from devices that have the SCP server on) and given to a Config_Store.
+    Configs that are the same as the stored copy are skipped.
+    @args username: username to log into the devices
+    @args password: password associated with the username
+    @args store: Config_Store or Sftp_Store the configs are written to. Default is a Config_Store in output/configs
+    @args method: 'show' to read the config over the CLI or 'scp' to pull it with SCP. Default is 'show'
+    @args max_sessions: devices backed up at the same time. Default is 100
+    @args pool: optional Connection_Pool for the device sessions
+    '''
+
+    def __init__(self, username, password, store = None, method = 'show', max_sessions = 100, pool = None):
+        self.user = username
+        self.password = password
+        self.store = store if store != None else Config_Store()
+        self.method = method
+        self.max_sessions = max_sessions
+        self.pool = pool
+
+    '''
+    Read one config and store it. Runs inside a Fleet_Executor worker so the writes overlap with other devices.
+    Returns true when the stored config changed.
+    '''
+    def _backup_one(self, drive):
+        if self.method == 'scp':
+            config = drive.get_running_config(scp = True)
+        else:
+            config = drive.get_running_config()
+        if normalize_config(config).strip() == '':
+            raise IOError(drive.host + ' returned an empty config')
+        return self.store.put(drive.host, config, device_os = drive.device_os)
+
+    '''
+    Back up every device. Returns a dictionary with the hosts whose config changed, the hosts whose config had not
+    changed and the hosts that failed, with their exception.
+    @args devices: list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices)
+    @args callback: optional function called with each Fleet_Executor result as soon as it is available
+    '''
+    def run(self, devices, callback = None):
+        report = {'changed': [], 'unchanged': [], 'failed': []}
+
+        def collect(result):
+            if result['error'] != None:
+                report['failed'].append((result['host'], result['error']))
+            elif result['result'] == True:
+                report['changed'].append(result['host'])
+            else:
+                report['unchanged'].append(result['host'])
+            if callback != None:
+                callback(result)
+
+        executor = Fleet_Executor.Fleet_Executor(self.user, self.password, max_sessions = self.max_sessions, pool = self.pool)
+        executor.run(devices, self._backup_one, callback = collect)
+        return report
@@ -0,0 +1,181 @@
+from netmiko import ConnectHandler
+from time import time
+from time import sleep
+import hashlib
+import re
+import threading
+
+'''
+Opens a new SSH session to a device. This is the default factory used by Connection_Pool.
+@args device_os: not used. Every direct session is opened as cisco_ios, which the dialogues in Dialogues are timed against
+'''
+def open_connection(hostname, username, password, device_os = None):
+    return ConnectHandler(device_type='cisco_ios', ip=hostname + '.ilstu.net', username=username, password=password)
+
+class Connection_Pool:
+
+    '''
+    Keeps authenticated SSH sessions open between Switch_Driver objects so repeated jobs do not pay for a new login.
+    Sessions are keyed by hostname and credentials, health checked when they are checked out, kept warm with
+    keepalives while idle and closed once they have been idle for too long.
+    @args max_idle: seconds an unused session is kept before it is closed. Default is 300
+    @args keepalive: seconds between keepalives on an idle session. Default is 60
+    @args max_per_host: idle sessions kept per hostname and credentials. Default is 4
+    @args factory: function(hostname, username, password, device_os) that opens a session. Default is open_connection
+    '''
+
+    def __init__(self, max_idle = 300, keepalive = 60, max_per_host = 4, factory = open_connection):
+        self.max_idle = max_idle
+        self.keepalive = keepalive
+        self.max_per_host = max_per_host
+        self.factory = factory
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._maintainer = None
+        self._closed = False
+
+    '''
+    The password is hashed so it is not kept as part of the key
+    '''
+    def _key(self, hostname, username, password):
+        return (hostname.lower(), username, hashlib.sha256(password.encode()).hexdigest())
+
+    '''
+    Returns a tuple of a session and whether it was reused. A reused session has already been set up by an
+    earlier Switch_Driver, so paging is already off. Sessions that are dead or do not answer a return with the device
+    prompt, such as one left at a question, are thrown away and a new one is opened.
+    @args device_os: os of the device, given to the factory when a new session is opened
+    '''
+    def checkout(self, hostname, username, password, device_os = None):
+        key = self._key(hostname, username, password)
+        while True:
+            with self._lock:
+                sessions = self._idle.get(key, [])
+                if len(sessions) == 0:
+                    break
+                entry = sessions.pop()
+            net_connect = entry['connection']
+            try:
+                if net_connect.is_alive() and self._at_prompt(net_connect):
+                    return net_connect, True
+            except:
+                pass
+            self._close(net_connect)
+
+        return self.factory(hostname, username, password, device_os), False
+
+    '''
+    Give a session back to the pool once the Switch_Driver is done with it
+    '''
+    def checkin(self, hostname, username, password, net_connect):
+        key = self._key(hostname, username, password)
+        with self._lock:
+            sessions = self._idle.setdefault(key, [])
+            if self._closed or len(sessions) >= self.max_per_host:
+                extra = net_connect
+            else:
+                now = time()
+                sessions.append({'connection': net_connect, 'last_used': now, 'last_keepalive': now})
+                extra = None
+            if self._maintainer == None and not self._closed:
+                self._maintainer = threading.Thread(target = self._maintain, daemon = True)
+                self._maintainer.start()
+        if extra != None:
+            self._close(extra)
+
+    def _close(self, net_connect):
+        try:
+            net_connect.disconnect()
+        except:
+            pass
+
+    '''
+    Background loop that closes sessions idle for longer than max_idle and sends keepalives on the rest
+    '''
+    def _maintain(self):
+        while not self._closed:
+            sleep(min(self.keepalive, self.max_idle) / 2)
+            now = time()
+            expired = []
+            due = []
+            with self._lock:
+                for key in list(self._idle):
+                    keep = []
+                    for entry in self._idle[key]:
+                        if now - entry['last_used'] > self.max_idle:
+                            expired.append(entry['connection'])
+                        elif now - entry['last_keepalive'] > self.keepalive:
+                            ### Taken out of the pool while the keepalive runs so it cannot be checked out half way
+                            due.append((key, entry))
+                        else:
+                            keep.append(entry)
+                    if len(keep) > 0:
+                        self._idle[key] = keep
+                    else:
+                        del self._idle[key]
+            for net_connect in expired:
+                self._close(net_connect)
+            for key, entry in due:
+                if self._at_prompt(entry['connection']):
+                    entry['last_keepalive'] = time()
+                    with self._lock:
+                        if not self._closed:
+                            self._idle.setdefault(key, []).append(entry)
+                            continue
+                self._close(entry['connection'])
+
+    '''
+    A bare return only brings the prompt back. Waits for the device prompt, out of config mode, so nothing is left in
+    the channel for the next user. Returns false when the session did not answer with it within timeout seconds.
+    '''
+    def _at_prompt(self, net_connect, timeout = 5):
+        base = getattr(net_connect, 'base_prompt', None)
+        prompt_regex = re.compile((re.escape(base) if base else r'\S+') + r'[>#]\s*$')
+        try:
+            ### Drop anything left in the channel before asking
+            net_connect.read_channel()
+            net_connect.write_channel(net_connect.RETURN)
+            started = time()
+            output = ''
+            poll = 0.005
+            while time() - started < timeout:
+                sleep(poll)
+                poll = min(poll * 2, 0.1)
+                output += net_connect.read_channel()
+                if prompt_regex.search(output):
+                    return True
+        except:
+            pass
+        return False
+
+    '''
+    Close every idle session and stop the keepalive loop
+    '''
+    def close_all(self):
+        with self._lock:
+            self._closed = True
+            sessions = [entry['connection'] for key in self._idle for entry in self._idle[key]]
+            self._idle = {}
+        for net_connect in sessions:
+            self._close(net_connect)
+
+    '''
+    Returns the number of idle sessions per hostname
+    '''
+    def stats(self):
+        with self._lock:
+            idle = {}
+            for key in self._idle:
+                idle[key[0]] = idle.get(key[0], 0) + len(self._idle[key])
+            return idle
+
+### Process wide pool shared by every Switch_Driver created with pool = default_pool()
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def default_pool():
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool == None:
+            _default_pool = Connection_Pool()
+        return _default_pool
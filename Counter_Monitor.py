@@ -0,0 +1,245 @@
+from time import time
+from array import array
+from multiprocessing.dummy import Pool as ThreadPool
+import heapq
+import queue
+import threading
+import Switch_Driver
+
+class Counter_Ring:
+
+    '''
+    Fixed size history of one port's error counters. Times and counter values are kept in flat arrays that are
+    written round robin, so a port costs the same memory no matter how long the monitor runs.
+    @args size: number of samples kept
+    @args names: names of the counters kept for each sample
+    '''
+
+    def __init__(self, size, names):
+        self.size = size
+        self.names = names
+        self.times = array('d', [0.0] * size)
+        self.values = array('Q', [0] * (size * len(names)))
+        self.count = 0
+        self.next = 0
+
+    def append(self, when, counters):
+        self.times[self.next] = when
+        start = self.next * len(self.names)
+        for i in range(len(self.names)):
+            self.values[start + i] = counters.get(self.names[i], 0)
+        self.next = (self.next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    '''
+    Returns (time, counters dictionary) of a sample. 0 is the newest sample, 1 the one before it and so on
+    '''
+    def sample(self, back = 0):
+        if back >= self.count:
+            return None
+        slot = (self.next - 1 - back) % self.size
+        start = slot * len(self.names)
+        counters = {}
+        for i in range(len(self.names)):
+            counters[self.names[i]] = self.values[start + i]
+        return self.times[slot], counters
+
+    '''
+    Returns a dictionary of each counter's change and its rate per minute between the newest sample and the one back
+    samples before it, or None when there are not enough samples. A counter that went down was cleared, so its new
+    value is taken as the change.
+    '''
+    def delta(self, back = 1):
+        newest = self.sample(0)
+        oldest = self.sample(back)
+        if newest == None or oldest == None or newest[0] <= oldest[0]:
+            return None
+        minutes = (newest[0] - oldest[0]) / 60
+        deltas = {'seconds': newest[0] - oldest[0]}
+        for name in self.names:
+            change = newest[1][name] - oldest[1][name]
+            if change < 0:
+                change = newest[1][name]
+            deltas[name] = change
+            deltas[name + '_rate'] = change / minutes
+        return deltas
+
+class Counter_Monitor:
+
+    '''
+    Long running service that polls interface error counters on a schedule, keeps a short history of every port in
+    a Counter_Ring and raises an alert when an error rate goes over its threshold. Each device group has its own
+    polling interval. A device with alerts is polled more often until it has been quiet for a while, then it goes
+    back to its group's interval.
+    @args username: username to log into the devices
+    @args password: password associated with the username
+    @args devices: list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices)
+    @args intervals: dictionary of device group to seconds between polls. Groups not listed use INTERVALS
+    @args thresholds: dictionary of counter name to errors per minute that raise an alert. Default is THRESHOLDS
+    @args history: samples kept per port. Default is 60
+    @args uplinks_only: When true, only the uplinks of each device are kept. Default is True
+    @args alert: function called with each alert dictionary. Default prints the alert
+    @args max_sessions: devices polled at the same time. Default is 50
+    @args pool: optional Connection_Pool so each poll reuses the device's session
+    '''
+
+    ### Seconds between polls per device group. Groups not listed use the 'default' interval
+    INTERVALS = {'core': 30, 'vss': 60, 'dist': 120, 'access': 300, 'default': 300}
+    ### Errors per minute that raise an alert
+    THRESHOLDS = {'input_errors': 10, 'crc': 10, 'output_errors': 10}
+    ### A device with alerts is polled at its interval divided by this, but not more often than MIN_INTERVAL
+    ALERT_SPEEDUP = 4
+    MIN_INTERVAL = 15
+
+    def __init__(self, username, password, devices, intervals = None, thresholds = None, history = 60, uplinks_only = True,
+                 alert = None, max_sessions = 50, pool = None):
+        self.user = username
+        self.password = password
+        self.devices = devices
+        self.intervals = dict(self.INTERVALS)
+        if intervals != None:
+            self.intervals.update(intervals)
+        self.thresholds = thresholds if thresholds != None else dict(self.THRESHOLDS)
+        self.history = history
+        self.uplinks_only = uplinks_only
+        self.alert = alert if alert != None else self._print_alert
+        self.max_sessions = max_sessions
+        self.pool = pool
+        self.rings = {}
+        self.descriptions = {}
+        self.alerting = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _print_alert(self, alert):
+        print(alert['host'], alert['port'], alert['description'], alert['counter'], format(alert['rate'], '.1f') + '/min')
+
+    '''
+    Returns the seconds until a device should be polled again
+    '''
+    def interval(self, device):
+        interval = self.intervals['default']
+        for group in self.intervals:
+            if group in device['group']:
+                interval = self.intervals[group]
+                break
+        if self.alerting.get(device['hostname'], 0) > 0:
+            interval = max(interval / self.ALERT_SPEEDUP, self.MIN_INTERVAL)
+        return interval
+
+    '''
+    Poll one device, store a sample for each of its ports and return the alerts raised
+    '''
+    def poll(self, device):
+        hostname = device['hostname']
+        drive = Switch_Driver.Switch_Driver(hostname, self.user, self.password, device['group'], device['os'], cache_ttl = 0, pool = self.pool)
+        try:
+            counters = drive.get_interface_counters()
+            now = time()
+            if self.uplinks_only:
+                counters = dict([(port, entry) for port, entry in counters.items() if drive._is_uplink(entry)])
+        finally:
+            drive.disconnect()
+
+        alerts = []
+        with self._lock:
+            for port in counters:
+                key = (hostname, port)
+                if key not in self.rings:
+                    self.rings[key] = Counter_Ring(self.history, Switch_Driver.Switch_Driver.ERROR_COUNTERS)
+                self.rings[key].append(now, counters[port])
+                self.descriptions[key] = counters[port]['description']
+                deltas = self.rings[key].delta()
+                if deltas == None:
+                    continue
+                for name in self.thresholds:
+                    if deltas.get(name + '_rate', 0) > self.thresholds[name]:
+                        alerts.append({'host': hostname, 'port': port, 'description': counters[port]['description'], 'counter': name,
+                                       'delta': deltas[name], 'rate': deltas[name + '_rate'], 'seconds': deltas['seconds'], 'time': now})
+            ### Stay on the faster interval for a few polls after the last alert
+            if len(alerts) > 0:
+                self.alerting[hostname] = self.ALERT_SPEEDUP
+            elif self.alerting.get(hostname, 0) > 0:
+                self.alerting[hostname] -= 1
+        for alert in alerts:
+            self.alert(alert)
+        return alerts
+
+    '''
+    Returns a list of dictionaries with the latest change and rate per minute of each counter, for every port of a
+    host or of every host when none is given
+    @args back: number of samples to compare against. Default is 1, the previous poll
+    '''
+    def rates(self, hostname = None, back = 1):
+        rate_list = []
+        with self._lock:
+            for key in self.rings:
+                if hostname != None and key[0] != hostname:
+                    continue
+                deltas = self.rings[key].delta(back)
+                if deltas != None:
+                    deltas.update({'host': key[0], 'port': key[1], 'description': self.descriptions.get(key, '')})
+                    rate_list.append(deltas)
+        return rate_list
+
+    '''
+    Poll devices as they come due until stop() is called. Failed polls are kept in errors and retried on the next interval.
+    Polls run in the background and each device is put back on the schedule as soon as its own poll finishes, so a
+    slow device never holds up the others. Only max_sessions polls are handed to the workers at a time and the rest
+    wait on the schedule in due order, so a core device that comes due goes out on the next free worker instead of
+    queueing behind a batch of access switches.
+    '''
+    def run(self):
+        schedule = [(0, i) for i in range(len(self.devices))]
+        heapq.heapify(schedule)
+        threads = ThreadPool(self.max_sessions)
+        finished = queue.Queue()
+        in_flight = 0
+
+        def poll_one(i):
+            device = self.devices[i]
+            try:
+                self.poll(device)
+                self.errors.pop(device['hostname'], None)
+            except Exception as e:
+                self.errors[device['hostname']] = e
+            return i
+
+        try:
+            while not self._stop.is_set():
+                now = time()
+                while in_flight < self.max_sessions and len(schedule) > 0 and schedule[0][0] <= now:
+                    in_flight += 1
+                    threads.apply_async(poll_one, (heapq.heappop(schedule)[1],), callback = finished.put)
+                ### Sleep until the next device is due or a poll finishes, whichever comes first
+                wait = schedule[0][0] - now if len(schedule) > 0 and in_flight < self.max_sessions else 1
+                try:
+                    i = finished.get(timeout = min(max(wait, 0), 1))
+                except queue.Empty:
+                    continue
+                while True:
+                    in_flight -= 1
+                    heapq.heappush(schedule, (time() + self.interval(self.devices[i]), i))
+                    try:
+                        i = finished.get_nowait()
+                    except queue.Empty:
+                        break
+        finally:
+            threads.close()
+
+    '''
+    Run the polling loop in a background thread
+    '''
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target = self.run, daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread != None:
+            self._thread.join()
+            self._thread = None
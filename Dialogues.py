@@ -0,0 +1,97 @@
+'''
+Send/expect dialogues run by Switch_Driver._run_dialogue, per (device group, os). A dialogue is a list of steps:
+    name: label used in the step timings
+    send: text sent to the device followed by a return. {host}, {server}, {scp_user}, {scp_password}, {cisco_dir}
+          and {dell_dir} are filled in when the dialogue runs
+    expect: regex that ends the step. {prompt} is replaced with the device prompt pattern
+    when: optional regex. The step only runs when the output of the step before it matches
+    timeout: optional seconds to wait for expect. Default is STEP_TIMEOUT
+New platforms are added by adding their dialogue to DIALOGUES.
+'''
+
+### atconfig
+SCP_SERVER = '10.40.201.21'
+CISCO_DIR = '/ilstu/config/cisco/rtr'
+DELL_DIR = '/ilstu/config/dell'
+
+STEP_TIMEOUT = 30
+### Copies can take a while on a large config
+COPY_TIMEOUT = 120
+
+### Questions of the copy dialogues, matched on their text. A pattern that only looks at how a line ends, such as
+### [?:]\s*$, also matches the echo of 'copy run scp:' and would send the answer before the question is asked
+REMOTE_HOST = r'remote host[^\n]*\? *$'
+DESTINATION_USERNAME = r'[Uu]sername[^\n]*\? *$'
+DESTINATION_FILENAME = r'[Ff]ilename[^\n]*\? *$'
+NXOS_FILENAME = r'destination filename[^\n]*[:\]] *$'
+NXOS_VRF = r'Enter vrf[^\n]*: *$'
+NXOS_SERVER = r'hostname for the scp server: *$'
+NXOS_USERNAME = r'Enter username: *$'
+PASSWORD = r'[Pp]assword:\s*$'
+YES_NO = r'\((yes/no|y/n)\)\??\s*$'
+
+IOS_SAVE = [
+    {'name': 'copy run start', 'send': 'copy run start', 'expect': r'\?\s*$|\[confirm\]\s*$|{prompt}'},
+    {'name': 'confirm filename', 'send': '', 'when': r'\]\?\s*$', 'expect': r'\[confirm\]\s*$|{prompt}', 'timeout': COPY_TIMEOUT},
+    {'name': 'confirm overwrite', 'send': '', 'when': r'\[confirm\]\s*$', 'expect': '{prompt}', 'timeout': COPY_TIMEOUT},
+]
+
+IOS_SCP = [
+    {'name': 'copy run scp', 'send': 'copy run scp:', 'expect': REMOTE_HOST},
+    {'name': 'server', 'send': '{server}', 'expect': DESTINATION_USERNAME},
+    {'name': 'username', 'send': '{scp_user}', 'expect': DESTINATION_FILENAME},
+    {'name': 'filename', 'send': '{cisco_dir}/{host}.cfg', 'expect': PASSWORD},
+    {'name': 'password', 'send': '{scp_password}', 'expect': '{prompt}', 'timeout': COPY_TIMEOUT},
+]
+
+NXOS_SAVE = [
+    {'name': 'copy run start', 'send': 'copy run start', 'expect': '{prompt}', 'timeout': COPY_TIMEOUT},
+]
+
+NXOS_SCP = [
+    {'name': 'copy run scp', 'send': 'copy run scp:', 'expect': NXOS_FILENAME},
+    {'name': 'filename', 'send': '{cisco_dir}/{host}.cfg', 'expect': NXOS_VRF},
+    {'name': 'vrf', 'send': 'default', 'expect': NXOS_SERVER},
+    {'name': 'server', 'send': '{server}', 'expect': NXOS_USERNAME},
+    {'name': 'username', 'send': '{scp_user}', 'expect': PASSWORD + '|' + YES_NO},
+    {'name': 'accept host key', 'send': 'yes', 'when': YES_NO, 'expect': PASSWORD},
+    {'name': 'password', 'send': '{scp_password}', 'expect': '{prompt}', 'timeout': COPY_TIMEOUT},
+]
+
+DELL_SAVE = [
+    {'name': 'copy run start', 'send': 'copy run start', 'expect': YES_NO + '|{prompt}'},
+    {'name': 'confirm', 'send': 'y', 'when': YES_NO, 'expect': '{prompt}', 'timeout': COPY_TIMEOUT},
+]
+
+DELL_SCP = [
+    {'name': 'copy run scp', 'send': 'copy run scp://{scp_user}@{server}/{dell_dir}/{host}.cfg', 'expect': PASSWORD},
+    {'name': 'password', 'send': '{scp_password}', 'expect': YES_NO + '|{prompt}'},
+    {'name': 'confirm', 'send': 'y', 'when': YES_NO, 'expect': '{prompt}', 'timeout': COPY_TIMEOUT},
+]
+
+### Keyed by (group, os). The group matches any device group that contains it, os None matches any os
+DIALOGUES = {
+    'backup': {
+        ('access', 'ios'): IOS_SAVE + IOS_SCP,
+        ('access', 'dell'): DELL_SAVE + DELL_SCP,
+        ('cirbn', 'ios'): IOS_SAVE + IOS_SCP,
+        ('resnet-dist', 'ios'): IOS_SAVE + IOS_SCP,
+        ('vss', 'ios'): IOS_SAVE + IOS_SCP,
+        ('gw', 'ios'): IOS_SAVE + IOS_SCP,
+        ('core', None): NXOS_SAVE + NXOS_SCP,
+    },
+}
+
+'''
+Returns the steps of a dialogue for a device, or None when there is no dialogue for its group and os.
+An exact group match is used before a group that is only part of the device group, so 'voice-gw' does not need its own entry.
+'''
+def find_dialogue(name, group, os):
+    table = DIALOGUES.get(name, {})
+    for key in [(group, os), (group, None)]:
+        if key in table:
+            return table[key]
+    for key in table:
+        if key[0] in group and (key[1] == None or key[1] == os):
+            return table[key]
+    return None
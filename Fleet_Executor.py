@@ -0,0 +1,127 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+import Switch_Driver
+
+'''
+Open the sessions of many lazy Switch_Driver objects at the same time, so logins overlap with each other and with
+any other work the caller awaits. Returns a list of the drivers that could not connect, paired with the exception.
+@args drivers: list of Switch_Driver objects, normally created with lazy = True
+@args max_sessions: number of logins in flight at the same time. Default is 100
+'''
+async def connect_all(drivers, max_sessions = 100):
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(max_sessions)
+    failed = []
+
+    async def connect_one(pool, drive):
+        async with limit:
+            try:
+                await loop.run_in_executor(pool, drive.connect)
+            except Exception as e:
+                failed.append((drive, e))
+
+    with ThreadPoolExecutor(max_workers = min(max_sessions, max(len(drivers), 1))) as pool:
+        await asyncio.gather(*[connect_one(pool, drive) for drive in drivers])
+    return failed
+
+class Fleet_Executor:
+
+    '''
+    Runs a Switch_Driver method against many devices with a bounded thread pool. The SSH transport is not
+    asynchronous: Switch_Driver and netmiko block, so every session in flight holds one worker thread for as long as
+    it runs. An asyncio event loop only does the scheduling, the per-device and global limits and the results stream.
+    Reads return when the prompt comes back instead of sleeping, so the threads mostly wait on the network.
+    Raise max_sessions with care: each session is an OS thread, and most devices limit their vty lines. A
+    Connection_Pool with a Jump_Host factory carries every session as a channel of a few SSH connections, so a large
+    max_sessions does not also mean as many TCP connections and logins from this process.
+    @args username: username to log into the devices
+    @args password: password associated with the username
+    @args max_sessions: global limit of device sessions, and worker threads, in flight at the same time. Default is 100
+    @args per_device: limit of sessions in flight to a single hostname at the same time. Default is 1
+    @args pool: optional Connection_Pool so repeated runs reuse logged in sessions instead of logging in again
+    '''
+
+    def __init__(self, username, password, max_sessions = 100, per_device = 1, pool = None):
+        self.user = username
+        self.password = password
+        self.max_sessions = max_sessions
+        self.per_device = per_device
+        self.pool = pool
+
+    '''
+    Build the driver for one device, run the method and always disconnect. Runs inside a worker thread.
+    A method that raised may have left the session part way through a command, so its session is not pooled.
+    '''
+    def _run_one(self, device, method, args, kwargs):
+        drive = Switch_Driver.Switch_Driver(device['hostname'], self.user, self.password, device['group'], device['os'], pool = self.pool)
+        failed = True
+        try:
+            if callable(method):
+                result = method(drive, *args, **kwargs)
+            else:
+                result = getattr(drive, method)(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            try:
+                drive.disconnect(discard = failed)
+            except:
+                pass
+
+    '''
+    Run one device job once both the per-device and the global limits allow it. The per-device limit is taken first,
+    so jobs waiting on a busy host do not hold global slots. Errors are returned in the result instead of being raised
+    so a single bad device does not stop the sweep.
+    @args device_limits: per-device semaphores of this stream, keyed by hostname
+    '''
+    async def _job(self, loop, pool, global_limit, device_limits, device, method, args, kwargs):
+        hostname = device['hostname']
+        if hostname not in device_limits:
+            device_limits[hostname] = asyncio.Semaphore(self.per_device)
+        async with device_limits[hostname]:
+            async with global_limit:
+                starting_time = time()
+                try:
+                    result = await loop.run_in_executor(pool, self._run_one, device, method, args, kwargs)
+                    error = None
+                except Exception as e:
+                    result = None
+                    error = e
+                return {'host': hostname, 'result': result, 'error': error, 'elapsed': time() - starting_time}
+
+    '''
+    Async generator that yields one result dictionary per device as soon as that device finishes.
+    Each result has the host, the value returned by the method, the exception raised (or None) and the elapsed seconds.
+    @args devices: list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices)
+    @args method: name of the Switch_Driver method to run, or a callable that takes the driver as its first argument
+    @args args, kwargs: passed through to the method
+    '''
+    async def stream(self, devices, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        global_limit = asyncio.Semaphore(self.max_sessions)
+        ### Local to the stream so two streams on one executor keep their own limits
+        device_limits = {}
+        with ThreadPoolExecutor(max_workers = min(self.max_sessions, max(len(devices), 1))) as pool:
+            tasks = [asyncio.ensure_future(self._job(loop, pool, global_limit, device_limits, device, method, args, kwargs)) for device in devices]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    '''
+    Run the method against every device and return the list of result dictionaries in completion order.
+    @args callback: optional function called with each result dictionary as soon as it is available
+    '''
+    def run(self, devices, method, *args, callback = None, **kwargs):
+        async def collect():
+            results = []
+            async for result in self.stream(devices, method, *args, **kwargs):
+                if callback != None:
+                    callback(result)
+                results.append(result)
+            return results
+
+        return asyncio.run(collect())
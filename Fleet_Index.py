@@ -0,0 +1,162 @@
+from time import time
+import hashlib
+import sqlite3
+import threading
+import Fleet_Executor
+import Switch_Records
+
+class Fleet_Index:
+
+    '''
+    Campus wide index of where every MAC address is plugged in, kept in a SQLite file so lookups do not need a
+    sweep. MAC tables come from the access switches and ARP tables from the dist, VSS and core switches, and a
+    lookup joins the two on the MAC. A refresh first asks each device for a short summary of its table and only
+    pulls the whole table again from devices whose summary changed, or whose last pull is older than max_age.
+    The summaries are counts, so they miss changes that keep the counts the same, such as a MAC moving to another
+    port or one device swapped for another. max_age bounds how long the index can give the old port for those.
+    @args username: username to log into the devices
+    @args password: password associated with the username
+    @args path: SQLite file the index is kept in. Default is output/fleet_index.db. Use ':memory:' for an index that is not saved
+    @args max_sessions: devices polled at the same time during a refresh. Default is 100
+    @args pool: optional Connection_Pool for the device sessions
+    @args max_age: seconds after a full pull that a device is pulled in full again even if its summary has not changed. Default is 3600
+    '''
+
+    ### Cheap command whose output changes whenever the number of entries in the table it summarizes changes
+    SUMMARY_COMMANDS = {'mac': 'show mac address-table count', 'arp': 'show ip arp summary'}
+
+    def __init__(self, username, password, path = 'output/fleet_index.db', max_sessions = 100, pool = None, max_age = 3600):
+        self.user = username
+        self.password = password
+        self.max_sessions = max_sessions
+        self.pool = pool
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread = False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS macs (mac INTEGER, host TEXT, port TEXT, vlan INTEGER, seen REAL, PRIMARY KEY (mac, host, port));
+            CREATE TABLE IF NOT EXISTS arp (mac INTEGER, ip TEXT, gateway TEXT, seen REAL, PRIMARY KEY (mac, ip, gateway));
+            CREATE TABLE IF NOT EXISTS devices (host TEXT PRIMARY KEY, kind TEXT, summary TEXT, polled REAL);
+            CREATE INDEX IF NOT EXISTS arp_ip ON arp (ip);
+        ''')
+        self._db.commit()
+
+    '''
+    Returns 'mac' for devices whose MAC table is indexed, 'arp' for devices whose ARP table is indexed and None for the rest
+    '''
+    def _kind(self, device):
+        if 'access' in device['group']:
+            return 'mac'
+        if 'dist' in device['group'] or device['group'] == 'vss' or device['group'] == 'core':
+            return 'arp'
+        return None
+
+    '''
+    Poll one device. Runs inside a Fleet_Executor worker. Returns None when the summary has not changed and the last
+    full pull is younger than max_age.
+    @args summaries: dictionary of host to (summary, time of the last full pull) from the devices table
+    '''
+    def _poll(self, drive, kind, summaries, force):
+        summary = hashlib.sha256(drive.run_command(self.SUMMARY_COMMANDS[kind]).encode()).hexdigest()
+        previous, polled = summaries.get(drive.host, (None, 0))
+        if force == False and previous == summary and time() - polled < self.max_age:
+            return None
+        if kind == 'mac':
+            rows = list(drive.iter_mac_addresses(full = True))
+        else:
+            rows = drive._parse('show ip arp')
+        return {'kind': kind, 'summary': summary, 'rows': rows}
+
+    '''
+    Write the table of one device over its old rows
+    '''
+    def _store(self, host, polled):
+        now = time()
+        with self._lock:
+            if polled['kind'] == 'mac':
+                self._db.execute('DELETE FROM macs WHERE host = ?', (host,))
+                self._db.executemany('INSERT OR REPLACE INTO macs VALUES (?, ?, ?, ?, ?)',
+                                     [(Switch_Records.mac_to_int(row['mac']), host, row['port'],
+                                       int(row['vlan']) if row['vlan'].isdigit() else None, now) for row in polled['rows']])
+            else:
+                self._db.execute('DELETE FROM arp WHERE gateway = ?', (host,))
+                self._db.executemany('INSERT OR REPLACE INTO arp VALUES (?, ?, ?, ?)',
+                                     [(Switch_Records.mac_to_int(row['mac']), row['ip'], host, now) for row in polled['rows'] if row['mac'] != 'Incomplete'])
+            self._db.execute('INSERT OR REPLACE INTO devices VALUES (?, ?, ?, ?)', (host, polled['kind'], polled['summary'], now))
+            self._db.commit()
+
+    '''
+    Bring the index up to date. Returns a dictionary with the hosts that were pulled again, the hosts that had not
+    changed and the hosts that failed, with their exception.
+    @args devices: list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices)
+    @args force: When true, every table is pulled again even if its summary has not changed
+    '''
+    def refresh(self, devices, force = False):
+        summaries = {}
+        with self._lock:
+            for host, summary, polled in self._db.execute('SELECT host, summary, polled FROM devices').fetchall():
+                summaries[host] = (summary, polled)
+        kinds = {}
+        polled_devices = []
+        for device in devices:
+            kind = self._kind(device)
+            if kind != None:
+                kinds[device['hostname']] = kind
+                polled_devices.append(device)
+        report = {'updated': [], 'unchanged': [], 'failed': []}
+
+        def store(result):
+            if result['error'] != None:
+                report['failed'].append((result['host'], result['error']))
+            elif result['result'] == None:
+                report['unchanged'].append(result['host'])
+            else:
+                self._store(result['host'], result['result'])
+                report['updated'].append(result['host'])
+
+        def poll(drive):
+            return self._poll(drive, kinds[drive.host], summaries, force)
+
+        executor = Fleet_Executor.Fleet_Executor(self.user, self.password, max_sessions = self.max_sessions, pool = self.pool)
+        executor.run(polled_devices, poll, callback = store)
+        return report
+
+    '''
+    Returns a list of dictionaries with the switch, port, VLAN and IP address of every place a MAC address was seen
+    @args mac: MAC address in any format
+    '''
+    def locate(self, mac):
+        value = Switch_Records.mac_to_int(mac)
+        with self._lock:
+            rows = self._db.execute('SELECT macs.host, macs.port, macs.vlan, arp.ip FROM macs LEFT JOIN arp ON arp.mac = macs.mac '
+                                    'WHERE macs.mac = ? ORDER BY macs.host, macs.port', (value,)).fetchall()
+        found = []
+        for host, port, vlan, ip in rows:
+            found.append({'mac': Switch_Records.int_to_mac(value), 'switch': host, 'port': port,
+                          'vlan': str(vlan) if vlan != None else None, 'ip': ip if ip != None else 'N/A'})
+        return found
+
+    '''
+    Returns where the host with an IP address is plugged in, in the same format as locate()
+    @args ip: str IP address
+    '''
+    def locate_ip(self, ip):
+        with self._lock:
+            rows = self._db.execute('SELECT DISTINCT mac FROM arp WHERE ip = ?', (ip,)).fetchall()
+        found = []
+        for row in rows:
+            found.extend(self.locate(Switch_Records.int_to_mac(row[0])))
+        return found
+
+    '''
+    Returns the number of MAC and ARP entries and devices in the index
+    '''
+    def stats(self):
+        with self._lock:
+            return {'macs': self._db.execute('SELECT COUNT(*) FROM macs').fetchone()[0],
+                    'arp': self._db.execute('SELECT COUNT(*) FROM arp').fetchone()[0],
+                    'devices': self._db.execute('SELECT COUNT(*) FROM devices').fetchone()[0]}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
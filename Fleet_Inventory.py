@@ -0,0 +1,171 @@
+from time import time
+import datetime
+import json
+import os
+import Fleet_Executor
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+### Columns of the device and module tables and their types
+DEVICE_COLUMNS = [('snapshot', 'float'), ('hostname', 'str'), ('group', 'str'), ('os', 'str'), ('polled', 'bool'),
+                  ('serialNumber', 'str'), ('model', 'str'), ('iosVer', 'str'), ('iosFile', 'str'), ('lastReload', 'str'),
+                  ('configReg', 'str'), ('powerSupplies', 'str'), ('powerVoltage', 'str'), ('availableMod', 'int'), ('remainingPoE', 'str')]
+MODULE_COLUMNS = [('snapshot', 'float'), ('hostname', 'str'), ('slot', 'int'), ('module', 'str')]
+
+ARROW_TYPES = {'float': 'float64', 'str': 'string', 'int': 'int64', 'bool': 'bool_'}
+NUMPY_TYPES = {'float': 'f8', 'int': 'i8', 'bool': '?'}
+
+'''
+Write rows to a Parquet file, or to a numpy structured array (.npy) when pyarrow is not installed.
+Returns the path written.
+@args path: file path without the extension
+@args columns: list of (name, type) tuples
+@args rows: list of dictionaries with a value for every column
+'''
+def write_columns(path, columns, rows):
+    if pyarrow != None:
+        arrays = []
+        for name, kind in columns:
+            arrays.append(pyarrow.array([row[name] for row in rows], type = getattr(pyarrow, ARROW_TYPES[kind])()))
+        table = pyarrow.Table.from_arrays(arrays, names = [name for name, kind in columns])
+        pyarrow.parquet.write_table(table, path + '.parquet')
+        return path + '.parquet'
+    if numpy != None:
+        dtype = []
+        for name, kind in columns:
+            if kind == 'str':
+                ### Fixed width strings, as wide as the longest value
+                width = max([len(row[name]) for row in rows] + [1])
+                dtype.append((name, 'U' + str(width)))
+            else:
+                dtype.append((name, NUMPY_TYPES[kind]))
+        table = numpy.array([tuple(row[name] for name, kind in columns) for row in rows], dtype = dtype)
+        numpy.save(path + '.npy', table)
+        return path + '.npy'
+    raise ImportError('Fleet_Inventory needs pyarrow or numpy to write its tables')
+
+class Fleet_Inventory:
+
+    '''
+    Collects get_vitals from every device at the same time and writes one snapshot per run as two columnar tables:
+    one row per device and one row per module. Snapshots are Parquet files (numpy .npy files when pyarrow is not
+    installed) named by the snapshot time, so years of snapshots can be read back as one dataset without parsing CSV.
+    A run only collects all vitals from devices that reloaded or changed image since the last snapshot. The rest
+    answer a single show version and their last row is carried over.
+    @args username: username to log into the devices
+    @args password: password associated with the username
+    @args root: directory the snapshots are written to. Default is output/inventory
+    @args max_sessions: devices polled at the same time. Default is 100
+    @args pool: optional Connection_Pool for the device sessions
+    '''
+
+    ### Vitals that change when a device is reloaded or upgraded, compared to decide if a device is polled again
+    CHANGE_KEYS = ['lastReload', 'iosFile']
+
+    def __init__(self, username, password, root = 'output/inventory', max_sessions = 100, pool = None):
+        ### Checked before any device is polled, so a run cannot collect the whole fleet and then fail to write it
+        if pyarrow == None and numpy == None:
+            raise ImportError('Fleet_Inventory needs pyarrow or numpy to write its tables')
+        self.user = username
+        self.password = password
+        self.root = root
+        self.max_sessions = max_sessions
+        self.pool = pool
+        os.makedirs(root, exist_ok = True)
+        self._latest_path = os.path.join(root, 'latest.json')
+
+    '''
+    Returns the vitals of every device in the last snapshot, keyed by hostname
+    '''
+    def latest(self):
+        if not os.path.exists(self._latest_path):
+            return {}
+        with open(self._latest_path) as latest_file:
+            return json.load(latest_file)
+
+    '''
+    Poll one device. Runs inside a Fleet_Executor worker. Returns None when the device has not changed since the last snapshot.
+    '''
+    def _poll(self, drive, previous, full):
+        probe = drive.get_vitals(self.CHANGE_KEYS)
+        ### A device whose show version gives none of the keys could change without the probe seeing it
+        if full == False and drive.host in previous and probe != ['N/A'] * len(self.CHANGE_KEYS):
+            if probe == [previous[drive.host].get(key) for key in self.CHANGE_KEYS]:
+                return None
+        ### show version is still in the driver's cache, so only the other commands are sent
+        return drive.get_vitals()
+
+    '''
+    Take a snapshot of every device. Returns a dictionary with the files written, the hosts polled, the hosts carried
+    over from the last snapshot and the hosts that failed, with their exception.
+    @args devices: list of dictionaries with hostname, group, and os (the format returned by driver_test.read_devices)
+    @args full: When true, every device is polled even if it has not changed
+    '''
+    def run(self, devices, full = False):
+        snapshot = time()
+        previous = self.latest()
+        vitals = {}
+        report = {'files': [], 'polled': [], 'unchanged': [], 'failed': []}
+
+        def collect(result):
+            host = result['host']
+            if result['error'] != None:
+                report['failed'].append((host, result['error']))
+            elif result['result'] == None:
+                vitals[host] = previous[host]
+                report['unchanged'].append(host)
+            else:
+                vitals[host] = result['result']
+                report['polled'].append(host)
+
+        def poll(drive):
+            return self._poll(drive, previous, full)
+
+        executor = Fleet_Executor.Fleet_Executor(self.user, self.password, max_sessions = self.max_sessions, pool = self.pool)
+        executor.run(devices, poll, callback = collect)
+
+        device_rows = []
+        module_rows = []
+        for device in devices:
+            host = device['hostname']
+            if host not in vitals:
+                continue
+            value = vitals[host]
+            row = {'snapshot': snapshot, 'hostname': host, 'group': device['group'], 'os': device['os'], 'polled': host in report['polled']}
+            for name, kind in DEVICE_COLUMNS:
+                if name in row:
+                    continue
+                if kind == 'int':
+                    row[name] = value[name] if isinstance(value.get(name), int) else -1
+                elif name == 'powerVoltage':
+                    row[name] = ','.join(value.get(name, []))
+                else:
+                    row[name] = str(value.get(name, 'N/A'))
+            device_rows.append(row)
+            modules = value.get('ModulesInUse', [])
+            for i in range(len(modules)):
+                ### 1u switches list their fixed module as a list of fields
+                module = '/'.join(modules[i]) if isinstance(modules[i], list) else str(modules[i])
+                module_rows.append({'snapshot': snapshot, 'hostname': host, 'slot': i + 1, 'module': module})
+
+        stamp = datetime.datetime.fromtimestamp(snapshot).strftime('%Y%m%d-%H%M%S')
+        if len(device_rows) > 0:
+            report['files'].append(write_columns(os.path.join(self.root, 'devices-' + stamp), DEVICE_COLUMNS, device_rows))
+        if len(module_rows) > 0:
+            report['files'].append(write_columns(os.path.join(self.root, 'modules-' + stamp), MODULE_COLUMNS, module_rows))
+
+        ### Devices missing from this run keep their last vitals for the next one
+        previous.update(vitals)
+        with open(self._latest_path + '.tmp', 'w') as latest_file:
+            json.dump(previous, latest_file)
+        os.replace(self._latest_path + '.tmp', self._latest_path)
+        return report
@@ -0,0 +1,112 @@
+from netmiko import ConnectHandler
+import itertools
+import threading
+import paramiko
+
+### netmiko device_type of each device_os for sessions opened through the bastion
+DEVICE_TYPES = {'ios': 'cisco_ios', 'nx-os': 'cisco_nxos', 'dell': 'dell_os6'}
+
+class Jump_Host:
+
+    '''
+    Reaches devices through a bastion over a few long lived SSH connections. Each device session is a direct-tcpip
+    channel on one of those connections, handed to netmiko as its socket, so hundreds of device sessions share one
+    TCP connection and one bastion login instead of each logging into the bastion, or typing ssh into another
+    switch, on its own. Use factory as the factory of a Connection_Pool so the device sessions are pooled as well:
+
+        jump = Jump_Host.Jump_Host('bastion', user, password)
+        pool = Connection_Pool.Connection_Pool(factory = jump.factory)
+
+    @args hostname: hostname or address of the bastion
+    @args username: username to log into the bastion
+    @args password: password associated with the username
+    @args port: SSH port of the bastion. Default is 22
+    @args transports: SSH connections to the bastion that the channels are spread over. Default is 1
+    @args domain: added to device hostnames that have no domain. Default is .ilstu.net
+    @args device_type: netmiko device_type of device sessions whose os is not known. Default is cisco_ios
+    @args keepalive: seconds between keepalives on the bastion connections. Default is 30
+    @args known_hosts: known_hosts file with the bastion's host key, loaded after ~/.ssh/known_hosts. The bastion carries
+    every device password, so a bastion whose key is in neither file, or does not match, is refused
+    '''
+
+    def __init__(self, hostname, username, password, port = 22, transports = 1, domain = '.ilstu.net', device_type = 'cisco_ios', keepalive = 30,
+                 known_hosts = None):
+        self.hostname = hostname
+        self.user = username
+        self.password = password
+        self.port = port
+        self.domain = domain
+        self.device_type = device_type
+        self.keepalive = keepalive
+        self.known_hosts = known_hosts
+        self._clients = [None] * transports
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self.logins = 0
+        self.channels = 0
+
+    def _connect(self):
+        client = paramiko.SSHClient()
+        client.load_system_host_keys()
+        if self.known_hosts != None:
+            client.load_host_keys(self.known_hosts)
+        client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        client.connect(self.hostname, port = self.port, username = self.user, password = self.password, look_for_keys = False, allow_agent = False)
+        client.get_transport().set_keepalive(self.keepalive)
+        self.logins += 1
+        return client
+
+    '''
+    Returns the next bastion connection in turn, logging in again first when it was never opened or has dropped.
+    Only one thread logs in at a time, the rest wait for the connection.
+    '''
+    def _transport(self):
+        with self._lock:
+            slot = next(self._next) % len(self._clients)
+            client = self._clients[slot]
+            if client == None or not client.get_transport().is_active():
+                if client != None:
+                    client.close()
+                client = self._connect()
+                self._clients[slot] = client
+            self.channels += 1
+            return client.get_transport()
+
+    '''
+    Returns the address a device hostname is opened to from the bastion
+    '''
+    def address(self, hostname):
+        return hostname if '.' in hostname else hostname + self.domain
+
+    '''
+    Open a direct-tcpip channel from the bastion to a device. The channel can be used as a socket.
+    @args port: TCP port on the device. Default is 22
+    '''
+    def open_channel(self, hostname, port = 22):
+        return self._transport().open_channel('direct-tcpip', (self.address(hostname), port), ('127.0.0.1', 0))
+
+    '''
+    Opens a netmiko session to a device through the bastion
+    @args device_type: netmiko device_type. Default is the device_type of the Jump_Host
+    '''
+    def connect(self, hostname, username, password, device_type = None):
+        channel = self.open_channel(hostname)
+        return ConnectHandler(device_type = device_type if device_type != None else self.device_type, ip = self.address(hostname),
+                              username = username, password = password, sock = channel)
+
+    '''
+    Opens a session to a device through the bastion. Use as the factory of a Connection_Pool.
+    @args device_os: os of the device, picks the netmiko device_type so NX-OS and Dell sessions are set up for their os
+    '''
+    def factory(self, hostname, username, password, device_os = None):
+        return self.connect(hostname, username, password, DEVICE_TYPES.get(device_os))
+
+    '''
+    Close the bastion connections. Sessions still open through them are closed with them.
+    '''
+    def close(self):
+        with self._lock:
+            for client in self._clients:
+                if client != None:
+                    client.close()
+            self._clients = [None] * len(self._clients)
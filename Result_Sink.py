@@ -0,0 +1,252 @@
+from time import time
+import csv
+import json
+import os
+import queue
+import threading
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+'''
+One output file for a whole fleet job. Switch_Driver getters given a Result_Sink as their file put their records on
+its queue instead of opening a file of their own, and a single writer thread takes them off in batches, so a
+Fleet_Executor run over thousands of devices writes one file with one header, one open and a write per batch rather
+than per row. The format comes from the file extension: .csv, .jsonl or .parquet (needs pyarrow).
+
+    sink = Result_Sink.Result_Sink('output/errdisabled.csv')
+    executor.run(devices, 'get_errdisabled', file = sink)
+    sink.close()
+'''
+
+### Formats by file extension
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.parquet': 'parquet'}
+
+### Put on the queue to stop the writer. A flush is asked for with (_FLUSH, sequence number of the request)
+_FLUSH = 'flush'
+_CLOSE = 'close'
+
+### Parquet column types of the Python types a schema can declare. Columns of any other type are written as strings
+if pyarrow != None:
+    PARQUET_TYPES = {str: pyarrow.string(), int: pyarrow.int64(), float: pyarrow.float64(), bool: pyarrow.bool_()}
+
+class Result_Sink:
+
+    '''
+    Buffered, thread safe writer of records from many devices to one CSV, JSON lines or Parquet file.
+    Every record gets a host column with the device it came from. Records are Mappings, so dictionaries and the
+    Switch_Records types both work.
+    @args path: file to write. This will overwrite an existing file of the same name
+    @args format: csv, jsonl or parquet. Default is taken from the extension of path
+    @args columns: list of column names in order. Default is host followed by the schema of the first put_many that
+                   declares one, or else the keys of the first record. Keys of later records that are not a column are
+                   left out of CSV and Parquet files
+    @args batch_size: records written at a time. Default is 1000
+    @args flush_interval: most seconds a record waits in the buffer before it is written. Default is 1
+    '''
+
+    def __init__(self, path, format = None, columns = None, batch_size = 1000, flush_interval = 1.0):
+        if format == None:
+            format = FORMATS.get(os.path.splitext(path)[1].lower())
+        if format not in FORMATS.values():
+            raise ValueError('Result_Sink cannot tell the format of ' + path + ', use one of ' + ', '.join(FORMATS))
+        if format == 'parquet' and pyarrow == None:
+            raise ImportError('Result_Sink needs pyarrow to write Parquet files')
+        self.path = path
+        self.format = format
+        self.columns = list(columns) if columns != None else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.closed = False
+        self.error = None
+        directory = os.path.dirname(path)
+        if directory != '':
+            os.makedirs(directory, exist_ok = True)
+        self._file = None
+        self._writer = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._types = None
+        self._schema = None
+        self._flushed = threading.Condition()
+        self._requests = 0
+        self._flushes = 0
+        self._thread = threading.Thread(target = self._run, name = 'Result_Sink ' + path, daemon = True)
+        self._thread.start()
+
+    '''
+    Add one record. Safe to call from any thread.
+    @args host: host the record came from. Used when the record has no host of its own
+    '''
+    def put(self, record, host = None):
+        self.put_many([record], host)
+
+    '''
+    Add a list of records from one device. Safe to call from any thread.
+    @args host: host the records came from. Used when a record has no host of its own
+    @args schema: list of (key, type) tuples the records have, such as [('port', str)]. The first schema given sets the
+                  columns and the Parquet column types of the file, so a column that is empty or missing in the first
+                  records still gets its type. Later ones are ignored. Default is to take them from the first records
+    '''
+    def put_many(self, records, host = None, schema = None):
+        if self.closed:
+            raise ValueError('Result_Sink ' + self.path + ' is closed')
+        if schema != None and self._types == None:
+            self._declare(schema)
+        rows = []
+        for record in records:
+            row = {'host': host}
+            row.update(record)
+            rows.append(row)
+        if len(rows) > 0:
+            self._queue.put(rows)
+
+    '''
+    Set the column types of the file, and its columns when none were given, unless records were written already
+    '''
+    def _declare(self, schema):
+        with self._lock:
+            if self._types != None or self._schema != None:
+                return
+            self._types = {'host': str}
+            for key, kind in schema:
+                self._types[key] = kind
+            if self.columns == None:
+                self.columns = ['host'] + [key for key, kind in schema if key != 'host']
+            if self.format == 'parquet':
+                self._schema = pyarrow.schema([(name, PARQUET_TYPES.get(self._types.get(name, str), pyarrow.string())) for name in self.columns])
+
+    '''
+    Wait until every record put so far has been written to the file.
+    Each call waits for its own request, not for a write the writer made on its own because flush_interval went by.
+    '''
+    def flush(self):
+        with self._flushed:
+            self._requests += 1
+            request = self._requests
+            self._queue.put((_FLUSH, request))
+            while self._flushes < request and self._thread.is_alive():
+                self._flushed.wait(0.5)
+        self._raise_error()
+
+    '''
+    Write what is left and close the file. Returns the path written.
+    '''
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        self._raise_error()
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _raise_error(self):
+        if self.error != None:
+            raise self.error
+
+    '''
+    Writer thread. Takes lists of rows off the queue and writes them once batch_size rows are waiting,
+    flush_interval has gone by since the oldest one arrived, or a flush or close is asked for.
+    '''
+    def _run(self):
+        batch = []
+        oldest = None
+        running = True
+        while running:
+            timeout = None if oldest == None else max(0, oldest + self.flush_interval - time())
+            request = None
+            try:
+                item = self._queue.get(timeout = timeout)
+            except queue.Empty:
+                item = None
+            if item == _CLOSE:
+                running = False
+            elif isinstance(item, tuple):
+                request = item[1]
+            elif item != None:
+                batch.extend(item)
+                if oldest == None:
+                    oldest = time()
+                if len(batch) < self.batch_size:
+                    continue
+            if len(batch) > 0 and self.error == None:
+                try:
+                    self._write(batch)
+                    self.count += len(batch)
+                except Exception as error:
+                    ### Kept and raised in the thread calling flush or close
+                    self.error = error
+            batch = []
+            oldest = None
+            ### Only a flush request is counted, so flush() cannot mistake a write made on the interval for its own
+            if request != None or not running:
+                with self._flushed:
+                    if request != None:
+                        self._flushes = max(self._flushes, request)
+                    self._flushed.notify_all()
+        try:
+            self._close_file()
+        except Exception as error:
+            if self.error == None:
+                self.error = error
+
+    def _write(self, batch):
+        with self._lock:
+            if self.columns == None:
+                self.columns = ['host'] + [key for key in batch[0] if key != 'host']
+            types = self._types if self._types != None else {}
+        if self.format == 'csv':
+            if self._writer == None:
+                self._file = open(self.path, 'w', newline = '')
+                self._writer = csv.DictWriter(self._file, self.columns, extrasaction = 'ignore')
+                self._writer.writeheader()
+            self._writer.writerows(batch)
+        elif self.format == 'jsonl':
+            if self._file == None:
+                self._file = open(self.path, 'w')
+            self._file.write(''.join([json.dumps(row, default = str) + '\n' for row in batch]))
+        else:
+            ### Nested values such as the counters of monitor_uplinks differ per row, so they are stored as JSON text
+            rows = []
+            for row in batch:
+                values = {}
+                for name in self.columns:
+                    value = row.get(name)
+                    if isinstance(value, (dict, list)):
+                        value = json.dumps(value, default = str)
+                    elif value != None and types.get(name) == str and not isinstance(value, str):
+                        value = str(value)
+                    values[name] = value
+                rows.append(values)
+            if self._writer == None:
+                with self._lock:
+                    if self._schema == None:
+                        ### Nothing was declared, so the types come from these records. A column with no values yet is a string
+                        fields = []
+                        for field in pyarrow.Table.from_pylist(rows).schema:
+                            fields.append(pyarrow.field(field.name, pyarrow.string()) if pyarrow.types.is_null(field.type) else field)
+                        self._schema = pyarrow.schema(fields)
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(pyarrow.Table.from_pylist(rows, schema = self._schema))
+        if self._file != None:
+            self._file.flush()
+
+    def _close_file(self):
+        if self.format == 'parquet':
+            if self._writer != None:
+                self._writer.close()
+        elif self._file != None:
+            self._file.close()
+        else:
+            ### Nothing was put, still leave an empty file behind so the job's output exists
+            open(self.path, 'w').close()
@@ -1,9 +1,134 @@
-from netmiko import ConnectHandler
 from time import time
 from time import sleep
 import datetime
 from multiprocessing.dummy import Pool as ThreadPool
 import threading
+import queue
+import re
+from collections import OrderedDict
+import os
+import tempfile
+import csv
+from netmiko import SCPConn
+import Connection_Pool
+import Switch_Parsers
+import Switch_Records
+import Arp_Resolver
+import Dialogues
+import Switch_Metrics
+import Result_Sink
+
+### Prompt patterns per device_os. {base} is replaced with the base prompt netmiko found at login
+PROMPT_PATTERNS = {
+    'ios': r'{base}(\([\w.\-]+\))?[>#]',
+    'nx-os': r'{base}(\([\w.\-]+\))?#',
+    'dell': r'{base}(\([\w.\-]+\))?[>#]',
+}
+### Used when the base prompt is not known yet
+GENERIC_BASE_PROMPT = r'[\w.\-:/]+'
+
+### Adaptive timeout settings. The timeout is how long to wait with no new bytes before giving up,
+### learned from each host's observed time to first byte
+DEFAULT_TIMEOUT = 30
+MIN_TIMEOUT = 5
+MAX_TIMEOUT = 120
+LATENCY_FACTOR = 20
+### Shared by every Switch_Driver in the process so a host's latency carries over between objects
+host_latency = {}
+host_latency_lock = threading.Lock()
+
+'''
+Record a time to first byte for a host. Keeps an exponentially weighted moving average.
+'''
+def record_latency(host, seconds):
+    with host_latency_lock:
+        if host in host_latency:
+            host_latency[host] = 0.7 * host_latency[host] + 0.3 * seconds
+        else:
+            host_latency[host] = seconds
+
+'''
+Returns the inactivity timeout in seconds for a host based on its observed latency
+'''
+def adaptive_timeout(host):
+    with host_latency_lock:
+        latency = host_latency.get(host)
+    if latency == None:
+        return DEFAULT_TIMEOUT
+    return min(max(LATENCY_FACTOR * latency, MIN_TIMEOUT), MAX_TIMEOUT)
+
+class Command_Cache:
+
+    '''
+    Show command output cache keyed by (host, command normalized by Switch_Parsers.normalize_command). Entries expire after ttl seconds and the least
+    recently used entry is evicted once max_entries is reached.
+    @args ttl: seconds an output stays valid. 0 turns the cache off
+    @args max_entries: number of outputs kept before evicting
+    '''
+
+    def __init__(self, ttl = 60, max_entries = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    '''
+    Returns the cached output or None when the command is not cached or has expired
+    '''
+    def get(self, host, command):
+        key = (host, Switch_Parsers.normalize_command(command))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry != None and time() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry != None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    '''
+    Returns true when the command is cached and has not expired. Unlike get, the hit and miss counts are left alone
+    '''
+    def contains(self, host, command):
+        key = (host, Switch_Parsers.normalize_command(command))
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry != None and time() - entry[0] <= self.ttl
+
+    '''
+    Cache the output of a command. Entries expire ttl seconds after when
+    @args when: time the output was read from the device. Default is now
+    '''
+    def put(self, host, command, output, when = None):
+        if self.ttl <= 0:
+            return
+        key = (host, Switch_Parsers.normalize_command(command))
+        with self._lock:
+            self._entries[key] = (when if when != None else time(), output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last = False)
+                self.evictions += 1
+
+    '''
+    Drop every cached output for a host, or everything when host is None
+    '''
+    def invalidate(self, host = None):
+        with self._lock:
+            if host == None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == host]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self._entries)}
 
 class Switch_Driver:
     
@@ -14,467 +139,749 @@ class Switch_Driver:
     @args sw_password: password associated with the hostname
     @args group: device group the device is a member of
     @args os: the operating system running on the device
+    @args cache_ttl: seconds show command output is reused before going back to the device. 0 turns the cache off
+    @args cache_size: number of show command outputs kept in the cache
+    @args pool: Connection_Pool to take an already logged in session from. disconnect() gives the session back to the pool
+    @args lazy: When true, the session is not opened until the first command. Turning paging off is sent in the same write as that command
+    @args channels: sessions to the device used at the same time for per-port and per-target commands. Default is 1, which runs them one after another
+    @args metrics: Switch_Metrics every command is recorded in. Default is the process wide Switch_Metrics.default_metrics()
     Possible device groups: access, cirbn-dist, cirbn-access, vpn-access, vss, resnet-dist, resnet-access, core, gw, voice-gw, special-access, dc-access
 	Possible OS: ios, nx-os, dell
     '''
     
-    def __init__(self, hostname, sw_username, sw_password, group, os):
+    def __init__(self, hostname, sw_username, sw_password, group, os, cache_ttl = 60, cache_size = 256, pool = None, lazy = False, channels = 1, metrics = None):
         self.host = hostname
         self.user = sw_username
         self.password = sw_password
         self.device_group = group
         self.device_os = os
-        self.net_connect = ConnectHandler(device_type='cisco_ios', ip=self.host + '.ilstu.net', username=self.user, password=self.password)
-        output = self.net_connect.send_command('terminal length 0')
+        self.pool = pool
+        self._net_connect = None
+        ### Set when a command timed out or failed part way, so the session may not be at the prompt
+        self._dirty = False
+        self._setup_pending = False
+        self._connect_lock = threading.Lock()
+        self._prompt_regex = None
+        self._marker_regex = None
+        self._prefetched = {}
+        self._interfaces = None
+        self.channels = channels
+        self._siblings = []
+        self._first_byte = None
+        self.metrics = metrics if metrics != None else Switch_Metrics.default_metrics()
+        self.cache = Command_Cache(cache_ttl, cache_size)
+        if not lazy:
+            self._turn_off_paging()
+
+    ### Port-channel, management and VLAN interfaces are left out of the port lists
+    LOGICAL_PORTS = ('Po', 'Ma', 'Vl')
+    ### get_poe_ports states and the show power inline column and value they match
+    POE_STATES = {'admin_auto': ('admin_status', 'auto'), 'admin_on': ('admin_status', 'on'), 'admin_off': ('admin_status', 'off'),
+                  'oper_on': ('oper_status', 'on'), 'oper_off': ('oper_status', 'off'), 'faulty': ('oper_status', 'faulty')}
+    ### Words in a port description that mark it as an uplink for monitor_uplinks
+    UPLINK_KEYWORDS = {'access': ['vss', 'uplink', 'dist'], 'vss': ['core', 'as0', 'dist', 'vsl']}
+    ### Counters read from show interfaces by get_interface_counters and monitor_uplinks
+    ERROR_COUNTERS = ('input_errors', 'crc', 'output_errors', 'input_drops', 'output_drops')
+
+    ### Show commands each getter runs. prefetch() sends the union of these in one batch
+    COMMAND_SETS = {
+        'get_connected_ports': ['show int status', 'show int description'],
+        'get_active_ports': ['show int status', 'show int description'],
+        'interface_index': ['show int status', 'show int description'],
+        'get_vitals': ['show version', 'show power', 'show module', 'show inventory', 'show power inline', 'show run | i power red'],
+    }
+
+    ### Commands each get_vitals key needs. Only the commands of the requested keys are sent
+    VITALS_COMMANDS = {
+        'hostname': [],
+        'serialNumber': ['show inventory'],
+        'model': ['show version'],
+        'iosVer': ['show version'],
+        'iosFile': ['show version'],
+        'lastReload': ['show version'],
+        'configReg': ['show version'],
+        'powerSupplies': ['show run | i power red'],
+        'powerVoltage': ['show power'],
+        'ModulesInUse': ['show version', 'show module'],
+        'availableMod': ['show version', 'show module'],
+        'remainingPoE': ['show power inline'],
+    }
+
+    '''
+    Opens the session if it is not open yet and returns it. Paging is left for the first command to turn off.
+    '''
+    def _connection(self):
+        if self._net_connect == None:
+            with self._connect_lock:
+                if self._net_connect == None:
+                    started = time()
+                    if self.pool != None:
+                        net_connect, reused = self.pool.checkout(self.host, self.user, self.password, self.device_os)
+                    else:
+                        net_connect, reused = Connection_Pool.open_connection(self.host, self.user, self.password, self.device_os), False
+                    self.metrics.record_connect(self, time() - started, reused)
+                    ### Sessions reused from the pool already have paging turned off
+                    self._setup_pending = not reused
+                    self._dirty = False
+                    self._net_connect = net_connect
+        return self._net_connect
+
+    '''
+    Opens the session if needed and turns paging off on its own round trip when no command has done it yet
+    '''
+    def _turn_off_paging(self):
+        connection = self._connection()
+        if self._setup_pending:
+            self._setup_pending = False
+            connection.send_command('terminal length 0')
+        return connection
+
+    '''
+    The netmiko session. Opens it on first use and makes sure paging is off before anything else uses it directly
+    '''
+    @property
+    def net_connect(self):
+        return self._turn_off_paging()
+
+    '''
+    Open the session now instead of on the first command. Turning paging off is still left to the first command.
+    Returns the driver so it can be chained.
+    '''
+    def connect(self):
+        self._connection()
+        return self
+
+    '''
+    Returns the compiled prompt pattern for this device_os, anchored on the base prompt found at login.
+    Matches only when the prompt ends the output.
+    '''
+    def _get_prompt_regex(self):
+        if self._prompt_regex == None:
+            base = getattr(self._connection(), 'base_prompt', None)
+            base = re.escape(base) if base else GENERIC_BASE_PROMPT
+            pattern = PROMPT_PATTERNS.get(self.device_os, PROMPT_PATTERNS['ios'])
+            self._prompt_regex = re.compile(pattern.format(base = base) + r'\s*$')
+            ### Marks every prompt at the start of a line. Used to split batched output back per command
+            self._marker_regex = re.compile('^' + pattern.format(base = base), re.MULTILINE)
+        return self._prompt_regex
+
+    '''
+    Read from the channel until the device prompt comes back. Returns as soon as the prompt is seen instead of
+    waiting out a fixed delay. The timeout restarts every time bytes arrive, so long outputs are not cut off.
+    @args started: time the command was written, used to learn the host's latency
+    @args raise_on_timeout: when false, returns whatever was read when the timeout is hit
+    @args prompts: number of prompts to wait for. A batch of commands returns one prompt per command
+    @args expect: compiled regex to wait for instead of the prompt, such as a confirmation question
+    @args timeout: seconds with no new bytes before giving up. Default is the host's adaptive timeout
+    '''
+    def _read_until_prompt(self, started, raise_on_timeout = True, prompts = 1, expect = None, timeout = None):
+        prompt_regex = expect if expect != None else self._get_prompt_regex()
+        if timeout == None:
+            timeout = adaptive_timeout(self.host)
+        output = ''
+        first_byte = None
+        last_byte = started
+        poll = 0.005
+        self._first_byte = None
+        while True:
+            data = self._net_connect.read_channel()
+            now = time()
+            if data:
+                if first_byte == None:
+                    first_byte = now
+                    self._first_byte = first_byte - started
+                    record_latency(self.host, first_byte - started)
+                output += data
+                last_byte = now
+                poll = 0.005
+                ### Only the end of the output can hold the prompt
+                if prompt_regex.search(output[-256:]):
+                    ### Each command's output ends at the next prompt, so a batch of N commands is done after N prompts
+                    if prompts == 1 or len(self._marker_regex.findall(output)) >= prompts:
+                        return output
+            elif now - last_byte > timeout:
+                self._dirty = True
+                if raise_on_timeout:
+                    if expect != None:
+                        raise IOError(self.host + ' did not send ' + expect.pattern + ' within ' + str(timeout) + ' seconds')
+                    raise IOError(self.host + ' did not return to the prompt within ' + str(timeout) + ' seconds')
+                return output
+            else:
+                sleep(poll)
+                poll = min(poll * 2, 0.1)
+
+    '''
+    Removes the echoed command and the trailing prompt from raw channel output, like send_command does
+    '''
+    def _strip_output(self, output, command):
+        output = output.replace('\r\r\n', '\n').replace('\r\n', '\n').replace('\r', '\n')
+        output_lines = output.split('\n')
+        if len(output_lines) > 0 and command.strip() != '' and command.strip() in output_lines[0]:
+            del output_lines[0]
+        if len(output_lines) > 0 and self._get_prompt_regex().search(output_lines[-1]):
+            del output_lines[-1]
+        ### Batched output ends with the newline before the next command's prompt
+        elif len(output_lines) > 0 and output_lines[-1].strip() == '':
+            del output_lines[-1]
+        return '\n'.join(output_lines)
+
+    '''
+    Send a show command and return its output as soon as the prompt comes back. Output already collected by
+    prefetch() or still valid in the cache is used instead of going back to the device.
+    @args command: str command that needs to be run.
+    @args raise_on_timeout: when false, returns the partial output if the prompt never comes back
+    '''
+    def _send(self, command, raise_on_timeout = True):
+        output = self._take_prefetched(command)
+        if output != None:
+            return output
+        output = self.cache.get(self.host, command)
+        if output != None:
+            self.metrics.record_cache(self, command, 'hit')
+            return output
+        self.metrics.record_cache(self, command, 'miss')
+        connection = self._connection()
+        if self._setup_pending:
+            output = self.run_batch([command], raise_on_timeout)[0]
+        else:
+            started = time()
+            connection.write_channel(command + connection.RETURN)
+            output = self._read_until_prompt(started, raise_on_timeout)
+            self.metrics.record_command(self, command, time() - started, self._first_byte, len(output))
+            output = self._strip_output(output, command)
+        self.cache.put(self.host, command, output)
+        return output
+
+    '''
+    Run several show commands with a single round trip. All commands are written at once and the combined
+    output is split back per command on the prompt that comes before each echoed command.
+    Returns a list of outputs in the same order as the commands. Each command is recorded in the metrics with its
+    share of the round trip, in proportion to its output, so the times of a batch add up to the batch.
+    @args commands: list of str commands
+    @args raise_on_timeout: when false, returns the partial output if the prompt never comes back
+    '''
+    def run_batch(self, commands, raise_on_timeout = True):
+        if len(commands) == 0:
+            return []
+        connection = self._connection()
+        ### A lazy session turns paging off in the same write as its first commands
+        setup = []
+        if self._setup_pending:
+            setup = ['terminal length 0']
+            self._setup_pending = False
+        all_commands = setup + commands
+        started = time()
+        connection.write_channel(connection.RETURN.join(all_commands) + connection.RETURN)
+        output = self._read_until_prompt(started, raise_on_timeout, prompts = len(all_commands))
+        seconds = time() - started
+        pieces = self._marker_regex.split(output)
+        ### split() also returns the optional config mode group, keep only the text between prompts
+        pieces = pieces[::self._marker_regex.groups + 1]
+        for i in range(len(all_commands)):
+            size = len(pieces[i]) if i < len(pieces) else 0
+            self.metrics.record_command(self, all_commands[i], seconds * size / max(len(output), 1), self._first_byte if i == 0 else None, size)
+        output_list = []
+        for i in range(len(setup), len(all_commands)):
+            if i < len(pieces):
+                output_list.append(self._strip_output(pieces[i], all_commands[i]))
+            else:
+                output_list.append('')
+        return output_list
+
+    '''
+    Generator that sends a show command and yields its output one line at a time as the lines arrive from the
+    channel, so a large table can be worked on before the device has finished printing it. Output already collected
+    by prefetch() or still valid in the cache is yielded from memory instead. If the caller stops early, the rest of
+    the output is still read so the session is left at the prompt.
+    @args command: str command that needs to be run.
+    @args keep: When true, the lines are also kept and put in the cache once the prompt comes back
+    '''
+    def _iter_lines(self, command, keep = False):
+        output = self._take_prefetched(command)
+        if output == None:
+            output = self.cache.get(self.host, command)
+            if output != None:
+                self.metrics.record_cache(self, command, 'hit')
+        if output != None:
+            for line in output.splitlines():
+                yield line
+            return
+
+        self.metrics.record_cache(self, command, 'miss')
+        connection = self._connection()
+        prompt_regex = self._get_prompt_regex()
+        ### A lazy session turns paging off in the same write as its first command
+        if self._setup_pending:
+            self._setup_pending = False
+            connection.write_channel('terminal length 0' + connection.RETURN + command + connection.RETURN)
+        else:
+            connection.write_channel(command + connection.RETURN)
+        started = time()
+        timeout = adaptive_timeout(self.host)
+        first_byte = None
+        last_byte = started
+        poll = 0.005
+        received = 0
+        partial = ''
+        lines = []
+        done = 0
+        echo_seen = False
+        finished = False
+        kept = []
+        try:
+            while not finished:
+                data = connection.read_channel()
+                now = time()
+                if not data:
+                    if now - last_byte > timeout:
+                        self._dirty = True
+                        raise IOError(self.host + ' did not return to the prompt within ' + str(timeout) + ' seconds')
+                    sleep(poll)
+                    poll = min(poll * 2, 0.1)
+                    continue
+                if first_byte == None:
+                    first_byte = now
+                    record_latency(self.host, first_byte - started)
+                last_byte = now
+                poll = 0.005
+                received += len(data)
+                lines = (partial + data).split('\n')
+                ### The last piece has no newline yet. It is either the start of a line or the prompt
+                partial = lines.pop()
+                done = 0
+                for line in lines:
+                    done += 1
+                    line = line.rstrip('\r')
+                    ### Everything up to the echoed command is paging setup or the echo itself
+                    if not echo_seen:
+                        echo_seen = command.strip() in line
+                        continue
+                    if keep:
+                        kept.append(line)
+                    yield line
+                if echo_seen and prompt_regex.search(partial):
+                    finished = True
+        except GeneratorExit:
+            ### The caller stopped early. Read the rest of the output so the session is left at the prompt
+            rest = '\n'.join(lines[done:] + [partial])
+            if not prompt_regex.search(partial):
+                drained = self._read_until_prompt(started, raise_on_timeout = False)
+                received += len(drained)
+                rest += drained
+            self.metrics.record_command(self, command, time() - started, first_byte - started if first_byte != None else None, received)
+            if keep and prompt_regex.search(rest):
+                rest = self._strip_output(rest, '')
+                if rest != '':
+                    kept.extend(rest.split('\n'))
+                self.cache.put(self.host, command, '\n'.join(kept))
+            raise
+        self.metrics.record_command(self, command, time() - started, first_byte - started if first_byte != None else None, received)
+        if keep:
+            self.cache.put(self.host, command, '\n'.join(kept))
+
+    '''
+    Run a show command and return the records from its parser in Switch_Parsers
+    @args view: name of a view registered for the command, such as the PoE budget of show power inline. Default is the rows
+    '''
+    def _parse(self, command, view = None):
+        output = self._send(command)
+        started = time()
+        records = Switch_Parsers.parse(self.device_os, command, output, view)
+        self.metrics.record_parse(self, command, time() - started)
+        return records
+
+    '''
+    Generator that runs a show command and yields the records from its parser as the lines arrive. The parse time
+    recorded in the metrics leaves out the time spent waiting on the device for the next line.
+    @args keep: When true, the output is also put in the cache for later calls
+    '''
+    def _iter_parse(self, command, keep = False):
+        waited = [0.0]
+
+        def timed_lines():
+            lines = self._iter_lines(command, keep)
+            try:
+                while True:
+                    started = time()
+                    try:
+                        line = next(lines)
+                    except StopIteration:
+                        return
+                    finally:
+                        waited[0] += time() - started
+                    yield line
+            finally:
+                lines.close()
+
+        lines = timed_lines()
+        records = Switch_Parsers.iter_parse(self.device_os, command, lines)
+        parsing = 0.0
+        try:
+            while True:
+                started = time()
+                try:
+                    record = next(records)
+                except StopIteration:
+                    return
+                finally:
+                    parsing += time() - started
+                yield record
+        finally:
+            records.close()
+            lines.close()
+            self.metrics.record_parse(self, command, max(parsing - waited[0], 0))
+
+    '''
+    Run the show commands of one or more getters in a single batch so the getters can be called afterwards
+    without going back to the device. Commands that are still valid in the cache are not sent again.
+    @args getters: names of methods listed in COMMAND_SETS
+    '''
+    def prefetch(self, *getters):
+        commands = []
+        for getter in getters:
+            commands.extend(self.COMMAND_SETS.get(getter, []))
+        self._prefetch_commands(commands)
+
+    '''
+    Run a list of show commands in a single batch and keep their output for _send. Commands that are still valid in
+    the cache are not sent again.
+    '''
+    def _prefetch_commands(self, commands):
+        missing = []
+        for command in commands:
+            if command not in missing and not self.cache.contains(self.host, command) and not self._fresh_prefetch(command):
+                missing.append(command)
+        commands = missing
+        started = time()
+        output_list = self.run_batch(commands)
+        for i in range(len(commands)):
+            self._prefetched[commands[i]] = (started, output_list[i])
+
+    '''
+    Returns the output prefetch() collected for a command and moves it to the cache with the time it was read, or
+    None when there is none. Prefetched output expires under the cache's ttl like cached output does. With the
+    cache turned off it is still used once, by the getter it was collected for.
+    '''
+    def _take_prefetched(self, command):
+        if not self._fresh_prefetch(command):
+            self._prefetched.pop(command, None)
+            return None
+        when, output = self._prefetched.pop(command)
+        self.cache.put(self.host, command, output, when)
+        self.metrics.record_cache(self, command, 'prefetch')
+        return output
+
+    '''
+    Returns true when prefetch() collected the command and its output has not expired
+    '''
+    def _fresh_prefetch(self, command):
+        entry = self._prefetched.get(command)
+        return entry != None and (self.cache.ttl <= 0 or time() - entry[0] <= self.cache.ttl)
+
+    '''
+    Returns a dictionary of every interface on the device keyed by its short port name (see Switch_Parsers.normalize_port).
+    Each entry joins the show int status row with the show int description row of the same port, so a port can be
+    looked up in constant time under any of its names. The index is built once per session and rebuilt after a
+    command that may have changed the device.
+    @args refresh: When true, the index is built again from the device
+    '''
+    def interface_index(self, refresh = False):
+        if self._interfaces != None and refresh == False:
+            return self._interfaces
+        if refresh == True:
+            self.cache.invalidate(self.host)
+        self.prefetch('interface_index')
+        interfaces = {}
+        for status in self._parse('show int status'):
+            entry = {'port': status['port'], 'name': status['name'], 'status': status['status'], 'vlan': status['vlan'],
+                     'duplex': status['duplex'], 'speed': status['speed'], 'media': status['media'],
+                     'description': '', 'line_status': None, 'protocol': None}
+            interfaces[Switch_Parsers.normalize_port(status['port'])] = entry
+        for description in self._parse('show int description'):
+            key = Switch_Parsers.normalize_port(description['port'])
+            ### Ports such as VLAN and loopback interfaces only show up in the description table
+            if key not in interfaces:
+                interfaces[key] = {'port': description['port'], 'name': '', 'status': None, 'vlan': None, 'duplex': None,
+                                   'speed': None, 'media': None, 'description': '', 'line_status': None, 'protocol': None}
+            interfaces[key]['description'] = description['description']
+            interfaces[key]['line_status'] = description['status']
+            interfaces[key]['protocol'] = description['protocol']
+        self._interfaces = interfaces
+        return interfaces
+
+    '''
+    Returns the interface index entry of a port given under any of its names, or None when the device has no such port
+    @args port: str port name such as 'Gi1/0/1', 'GigabitEthernet1/0/1' or 'Ethernet1/1'
+    '''
+    def get_interface(self, port):
+        return self.interface_index().get(Switch_Parsers.normalize_port(port))
+
+    '''
+    Forget cached output and the interface index after a command that may have changed the device
+    '''
+    def _invalidate(self):
+        self.cache.invalidate(self.host)
+        self._prefetched = {}
+        self._interfaces = None
+
+    '''
+    Opens extra sessions to the same device until there are count of them. The extra sessions share this driver's
+    cache. Sessions that fail to open are left out, so fewer may be returned.
+    '''
+    def _open_siblings(self, count):
+        missing = count - len(self._siblings)
+        if missing > 0:
+            def open_sibling(i):
+                sibling = Switch_Driver(self.host, self.user, self.password, self.device_group, self.device_os, pool = self.pool, lazy = True,
+                                        metrics = self.metrics)
+                sibling.cache = self.cache
+                try:
+                    return sibling.connect()
+                except:
+                    return None
+            threads = ThreadPool(missing)
+            try:
+                opened = threads.map(open_sibling, range(missing))
+            finally:
+                threads.close()
+            self._siblings.extend([sibling for sibling in opened if sibling != None])
+        return self._siblings[:count]
+
+    '''
+    Run work(driver, item) for every item and return the results in the same order as the items. When channels is
+    above 1, extra sessions to the device are opened and the items are spread over them and this driver's session.
+    @args work: function that takes a Switch_Driver and one item
+    @args items: list of independent items, such as ports or IP addresses
+    '''
+    def _fan_out(self, work, items):
+        if self.channels <= 1 or len(items) <= 1:
+            return [work(self, item) for item in items]
+        drivers = [self] + self._open_siblings(min(self.channels, len(items)) - 1)
+        free = queue.Queue()
+        for drive in drivers:
+            free.put(drive)
+
+        def run(item):
+            drive = free.get()
+            try:
+                return work(drive, item)
+            finally:
+                free.put(drive)
+
+        threads = ThreadPool(len(drivers))
+        try:
+            return threads.map(run, items)
+        finally:
+            threads.close()
+
+    '''
+    Run a netmiko send method, such as send_command_timing, and record the command in the metrics.
+    Used for commands that stop at a question or a custom expect string instead of the prompt.
+    '''
+    def _send_netmiko(self, send, command, **kwargs):
+        started = time()
+        try:
+            output = getattr(self.net_connect, send)(command, **kwargs)
+        except:
+            self._dirty = True
+            raise
+        self.metrics.record_command(self, command, time() - started, None, len(output))
+        return output
+
+    '''
+    Write the records of a getter. A Result_Sink gets the records tagged with this host, so a fleet job writes one
+    file. A str is the name of a CSV file of this device only in output/.
+    @args file: Result_Sink or str name of the file
+    @args columns: list of (header, key) tuples for the CSV file
+    @args extension: added to the name of the CSV file. Default is .csv
+    @args schema: list of (key, type) tuples of the records, declared to a Result_Sink so its columns and Parquet types
+                  do not depend on which device answers first. Default is every key of columns as a str
+    '''
+    def _write_rows(self, file, rows, columns, extension = '.csv', schema = None):
+        if isinstance(file, Result_Sink.Result_Sink):
+            if schema == None:
+                schema = [(key, str) for header, key in columns]
+            file.put_many(rows, host = self.host, schema = schema)
+            return
+        with open('output/' + file + extension, 'w', newline = '') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow([header for header, key in columns])
+            for row in rows:
+                writer.writerow([row.get(key, '') for header, key in columns])
 
     '''
     Send custom command to the device.
     @args command: str command that needs to be run.
+    @args timing: When true, uses netmiko's timing based read. Use this for commands that stop at a confirmation prompt
     '''
-    def run_command(self, command):
-        output = self.net_connect.send_command_timing(command)
+    def run_command(self, command, timing = False):
+        ### Anything other than a show command may change what the cached output says
+        if Switch_Parsers.normalize_command(command).split(' ')[0] != 'show':
+            self._invalidate()
+        if timing == True:
+            output = self._send_netmiko('send_command_timing', command)
+        else:
+            output = self._send(command, raise_on_timeout = False)
         return output
     '''
-    Disconnect from the network device
+    Disconnect from the network device. When the driver was created with a pool, the session is given back to the pool instead,
+    unless a command timed out or failed part way on it. Those sessions are closed so the next driver does not get one
+    that is stuck at a question.
+    @args discard: When true, the session is closed instead of given back to the pool. Use after an exception
     ''' 
-    def disconnect(self):
-        self.net_connect.disconnect()
+    def disconnect(self, discard = False):
+        for sibling in self._siblings:
+            sibling.disconnect(discard)
+        self._siblings = []
+        if self._net_connect == None:
+            return self.host + ' was never connected.'
+        net_connect = self._net_connect
+        self._net_connect = None
+        if self.pool != None and not discard and not self._dirty:
+            self.pool.checkin(self.host, self.user, self.password, net_connect)
+            return self.host + ' has been returned to the connection pool.'
+        net_connect.disconnect()
         return self.host + ' has disconnected.'
 
     '''
     Save running-config to local storage
     '''
     def save(self):
-        output = self.net_connect.send_command_timing('copy run start')
+        output = self._send_netmiko('send_command_timing', 'copy run start')
+        self._invalidate()
         return output
 
     '''
-    Save running-config to atconfig
+    Returns the running-config of the device as text
+    @args scp: When true, the config is pulled with SCP instead of read from 'show running-config'. The device needs 'ip scp server enable'
+    '''
+    def get_running_config(self, scp = False):
+        if scp != True:
+            return self._send('show running-config')
+        temp_file, temp_path = tempfile.mkstemp(suffix = '.cfg')
+        os.close(temp_file)
+        try:
+            scp_conn = SCPConn(self.net_connect)
+            try:
+                scp_conn.scp_get_file('running-config', temp_path)
+            finally:
+                scp_conn.close()
+            with open(temp_path) as config_file:
+                return config_file.read()
+        finally:
+            os.remove(temp_path)
+
+    '''
+    Run a send/expect dialogue from Dialogues. Each step is sent and the reply is read until the step's expect regex
+    matches, so no step waits longer than the device takes. Returns a list of dictionaries with each step's name and
+    seconds. Raises IOError when a step does not get its reply.
+    @args steps: list of dialogue steps
+    @args values: dictionary used to fill in the send text of the steps
+    @args timings: optional list the step timings are added to, so the steps that finished are kept when a later step fails
+    '''
+    def _run_dialogue(self, steps, values, timings = None):
+        connection = self.net_connect
+        prompt = self._get_prompt_regex().pattern
+        if timings == None:
+            timings = []
+        output = ''
+        try:
+            for step in steps:
+                if 'when' in step and not re.search(step['when'], output):
+                    continue
+                expect = re.compile(step['expect'].replace('{prompt}', prompt))
+                started = time()
+                connection.write_channel(step['send'].format(**values) + connection.RETURN)
+                output = self._read_until_prompt(started, expect = expect, timeout = step.get('timeout', Dialogues.STEP_TIMEOUT))
+                timings.append({'step': step['name'], 'seconds': time() - started})
+                ### Recorded by step name, the sent text can hold a password
+                self.metrics.record_command(self, 'dialogue ' + step['name'], time() - started, self._first_byte, len(output))
+        except:
+            ### A dialogue that stops part way leaves the session at one of its questions
+            self._dirty = True
+            raise
+        return timings
+
+    '''
+    Save running-config locally and to atconfig using the backup dialogue for the device's group and os.
+    Returns a dictionary with the host, whether the backup completed and the step timings.
     @args username: username used to log into atconfig
     @args password: password associated with username
     '''
     def backup(self, username, password):
-        scp_username = username
-        scp_password = password
+        result = {'host': self.host, 'complete': False, 'steps': []}
+        steps = Dialogues.find_dialogue('backup', self.device_group, self.device_os)
+        if steps == None:
+            print('**********', self.host, 'has no backup dialogue for', self.device_group, self.device_os)
+            return result
+        values = {'host': self.host, 'server': Dialogues.SCP_SERVER, 'scp_user': username, 'scp_password': password,
+                  'cisco_dir': Dialogues.CISCO_DIR, 'dell_dir': Dialogues.DELL_DIR}
         try:
-            if ('access' or 'cirbn') in self.device_group:
-                if self.device_os == 'ios':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('') # Confirm
-                    self.net_connect.send_command_expect('', expect_string = r'\#') # Confirm again
-                    ### Save to atconfig
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    try:
-                        self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                        self.net_connect.send_command_timing(scp_password)
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-                
-                elif self.device_os == 'dell':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('y') # Confirm
-                    ### Save to atconfig
-                    try:
-                        self.net_connect.send_command_timing('copy run scp://' + scp_username + '@10.40.201.21//ilstu/config/dell/' + self.host + '.cfg')
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command('y')
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'resnet-dist':
-                ### Turn off paging so no spacebar is needed
-                self.net_connect.send_command('terminal length 0')
-                ### Save locally
-                self.net_connect.send_command_timing('copy run start')
-                self.net_connect.send_command_expect('', expect_string = r'\#') ### Confirm
-                ### Save to atconfig
-                try:
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                    self.net_connect.send_command_timing(scp_password)
-                    self.net_connect.send_command_expect('', expect_string = r'\#')
-                    print(self.host, 'backup is complete')
-                except:
-                    print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'core':
-                self.net_connect.send_command('terminal length 0')
-                ### Lists of commands 
-                conf_list = ['exit','copy run start', '', ''] # Exit is to go to exec mode. Last 2 items are for enter key presses
-                ### Save locally
-                self.net_connect.send_config_set(conf_list)
-                self.net_connect.send_command_expect('', expect_string = r'\#')
-                ### Save to atconfig
-                try:
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('/ilstu/config/cisco/rtr/' + self.host + '.cfg')
-                    self.net_connect.send_command_timing('default')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    output = self.net_connect.send_command_expect(scp_username, expect_string = r'(password:|yes/no)') # Waiting for either the password of add RSA key prompt
-                    if 'password' in output: # If password prompt
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command_expect('', expect_string = r'\#')
-                        print(self.host, 'backup is complete')
-                    else: # If RSA key prompt
-                        self.net_connect.send_command_timing('yes')
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command_expect('', expect_string = r'\#')
-                        print(self.host, 'backup is complete')	
-                except:
-                    print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'vss':
-                ### Turn off paging so no spacebar is needed
-                self.net_connect.send_command('terminal length 0')
-                ### Save locally and remotely
-                self.net_connect.send_command_timing('copy run start')
-                self.net_connect.send_command_expect('', expect_string = r'\#')
-                try:
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:') # Waiting for the password prompt
-                    self.net_connect.send_command_timing(scp_password)
-                    self.net_connect.send_command_expect('', expect_string = r'\#')
-                    print(self.host, 'backup is complete')
-                except:
-                    print('**********', self.host, 'could not back up to atconfig')
-            elif self.device_group == 'gw':
-                if self.device_os == 'ios':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('') # Confirm
-                    self.net_connect.send_command_expect('', expect_string = r'\#') # Confirm again
-                    ### Save to atconfig
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    try:
-                        self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                        self.net_connect.send_command_timing(scp_password)
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'voice-gw':
-                if self.device_os == 'ios':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('') # Confirm
-                    self.net_connect.send_command_expect('', expect_string = r'\#') # Confirm again
-                    ### Save to atconfig
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    try:
-                        self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                        self.net_connect.send_command_timing(scp_password)
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
+            self._run_dialogue(steps, values, result['steps'])
+            result['complete'] = True
+            print(self.host, 'backup is complete')
+        except IOError as e:
+            print('**********', self.host, 'could not back up to atconfig:', e)
         except:
             print('**********', self.host, 'was not able to run')
 
-        return
+        self._invalidate()
+        return result
 
     '''
-    Save running-config locally and to atconfig
+    Save running-config locally and to atconfig. Runs the same dialogue as backup
     @args username: username used to log into atconfig
     @args password: password associated with username
     '''
     def save_and_backup(self, username, password):
-        scp_username = username
-        scp_password = password
-        try:
-            if ('access' or 'cirbn') in self.device_group:
-                if self.device_os == 'ios':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('') # Confirm
-                    self.net_connect.send_command_expect('', expect_string = r'\#') # Confirm again
-                    ### Save to atconfig
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    try:
-                        self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command_expect('', expect_string = r'\#')
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-                
-                elif self.device_os == 'dell':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('y') # Confirm
-                    ### Save to atconfig
-                    try:
-                        self.net_connect.send_command_timing('copy run scp://' + scp_username + '@10.40.201.21//ilstu/config/dell/' + self.host + '.cfg')
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command('y')
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'resnet-dist':
-                ### Turn off paging so no spacebar is needed
-                self.net_connect.send_command('terminal length 0')
-                ### Save locally
-                self.net_connect.send_command_timing('copy run start')
-                self.net_connect.send_command_expect('', expect_string = r'\#') ### Confirm
-                ### Save to atconfig
-                try:
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                    self.net_connect.send_command_timing(scp_password)
-                    self.net_connect.send_command_expect('', expect_string = r'\#')
-                    print(self.host, 'backup is complete')
-                except:
-                    print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'core':
-                self.net_connect.send_command('terminal length 0')
-                ### Lists of commands 
-                conf_list = ['exit','copy run start', '', ''] # Exit is to go to exec mode. Last 2 items are for enter key presses
-                ### Save locally
-                self.net_connect.send_config_set(conf_list)
-                self.net_connect.send_command_expect('', expect_string = r'\#')
-                ### Save to atconfig
-                try:
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('/ilstu/config/cisco/rtr/' + self.host + '.cfg')
-                    self.net_connect.send_command_timing('default')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    output = self.net_connect.send_command_expect(scp_username, expect_string = r'(password:|yes/no)') # Waiting for either the password of add RSA key prompt
-                    if 'password' in output: # If password prompt
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command_expect('', expect_string = r'\#')
-                        print(self.host, 'backup is complete')
-                    else: # If RSA key prompt
-                        self.net_connect.send_command_timing('yes')
-                        self.net_connect.send_command_timing(scp_password)
-                        self.net_connect.send_command_expect('', expect_string = r'\#')
-                        print(self.host, 'backup is complete')	
-                except:
-                    print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'vss':
-                ### Turn off paging so no spacebar is needed
-                self.net_connect.send_command('terminal length 0')
-                ### Save locally and remotely
-                self.net_connect.send_command_timing('copy run start')
-                self.net_connect.send_command_expect('', expect_string = r'\#')
-                try:
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:') # Waiting for the password prompt
-                    self.net_connect.send_command_timing(scp_password)
-                    self.net_connect.send_command_expect('', expect_string = r'\#')
-                    print(self.host, 'backup is complete')
-                except:
-                    print('**********', self.host, 'could not back up to atconfig')
-            elif self.device_group == 'gw':
-                if self.device_os == 'ios':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('') # Confirm
-                    self.net_connect.send_command_expect('', expect_string = r'\#') # Confirm again
-                    ### Save to atconfig
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    try:
-                        self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                        self.net_connect.send_command_timing(scp_password)
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-
-            elif self.device_group == 'voice-gw':
-                if self.device_os == 'ios':
-                    ### Turn off paging so no spacebar is needed
-                    self.net_connect.send_command('terminal length 0')
-                    ### Save locally
-                    self.net_connect.send_command_timing('copy run start')
-                    self.net_connect.send_command_timing('') # Confirm
-                    self.net_connect.send_command_expect('', expect_string = r'\#') # Confirm again
-                    ### Save to atconfig
-                    self.net_connect.send_command_timing('copy run scp:')
-                    self.net_connect.send_command_timing('10.40.201.21')
-                    self.net_connect.send_command_timing(scp_username)
-                    try:
-                        self.net_connect.send_command_expect('/ilstu/config/cisco/rtr/' + self.host + '.cfg', expect_string = r'Password:')
-                        self.net_connect.send_command_timing(scp_password)
-                        print(self.host, 'backup is complete')
-                    except:
-                        print('**********', self.host, 'could not back up to atconfig')
-        except:
-            print('**********', self.host, 'was not able to run')
-
-        return
+        return self.backup(username, password)
 
     '''
-    Find CDP neighbors on the device. Returns a list of dictionaries with Device ID and local port
-    @args file: name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV.
+    Find CDP neighbors on the device. Returns a list of dictionaries with Device ID, local port and the neighbor's port (Port ID)
+    @args file: name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
     def get_cdp_neighbors(self, file = None):
-        if self.device_os == 'ios':
-            output = self.net_connect.send_command_timing('show cdp neighbors')
-            output = output.splitlines()
-            index = 0
-            cdp_list = []
-            for i in range(len(output)):
-                ### Saving to a str then list with split removes empty space items
-                temp_str = output[i]
-                temp_list = temp_str.split()
-                if len(temp_list) > 1:
-                    if temp_list[0] == 'Device':
-                        index = i + 1
-                        break
-            for i in range(index, len(output)):
-                ### Saving to a str then list with split removes empty space items
-                temp_str = output[i]
-                temp_list = temp_str.split()
-                if len(temp_list) > 1:
-                    ### Some neighbors are on multiple lines. This makes sure the line is not used twice
-                    if temp_list[0] == ('Gig' or 'Ten'):
-                        continue
-                    ### If 'Total' is in the line, all neighbors have been added to the list
-                    if temp_list[0] == 'Total':
-                        break
-                    if temp_list[1] == 'Gig':
-                        temp_list[1] = 'Gi'
-                    elif temp_list[1] == 'Ten':
-                        temp_list[1] = 'Te'
-                    temp_dict = {'port': temp_list[1] + temp_list[2], 'device': temp_list[0]}
-                    cdp_list.append(temp_dict)
-                elif len(temp_list) == 1:
-                    temp_host = temp_list[0]
-                    temp_str = output[i + 1]
-                    temp_list = temp_str.split()
-                    if temp_list[0] == 'Gig':
-                        temp_list[0] = 'Gi'
-                    elif temp_list[0] == 'Ten':
-                        temp_list[0] = 'Te'
-                    temp_dict = {'port':temp_list[0] + temp_list[1], 'device': temp_host}
-                    cdp_list.append(temp_dict)
-                ### If line is empty, go to the next iteration
-                else:
-                    continue
+        cdp_list = list(self.iter_cdp_neighbors(keep = True))
         if file != None:
-            file = open('output/' + file + '.csv', 'w')
-            file.write('Port,Device ID\n')
-            for i in range(len(cdp_list)):
-                file.write(cdp_list[i]['port'] + ',' + cdp_list[i]['device'] + '\n')
-            file.close()        
+            self._write_rows(file, cdp_list, [('Port', 'port'), ('Device ID', 'device'), ('Port ID', 'remote_port')])
 
         return cdp_list
 
+    '''
+    Generator version of get_cdp_neighbors. Yields each neighbor as soon as its line comes back from the device.
+    @args keep: When true, the output is also put in the cache for later calls
+    '''
+    def iter_cdp_neighbors(self, keep = False):
+        if self.device_os == 'ios' or self.device_os == 'nx-os':
+            for record in self._iter_parse('show cdp neighbors', keep):
+                yield Switch_Records.Cdp_Record(**record)
+
     '''
     Find conected ports on the device. Command used 'show int status | include connected' By default, it returns just the ports that show connected.
     @args full: When true, returns a list of dictionaries with port number, description, VLAN, duplex, speed, and media type
     @args vlan: Returns only connected ports on a specified VLAN. Can only be used when full = True
-    @args file: name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV.
+    @args file: name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
     def get_connected_ports(self, full = False, vlan = None, file = None):
+        connected_list = []
         if full == True:
-            output_status = self.net_connect.send_command_timing('show int status | include connected')
-            output_desc = self.net_connect.send_command_timing('show int desc | include up')
-            desc_list = output_desc.splitlines()
-            status_list = output_status.splitlines()
-            connected_list = []
-            if vlan == None:
-                for i in range(len(status_list)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str1 = status_list[i]
-                    temp_list1 = temp_str1.split()
-                    temp_str2 = desc_list[i]
-                    temp_list2 = temp_str2.split()
-                    desc = ''
-                
-                    if ('Po' and 'Ma' and 'Vl') not in temp_list1[0]:
-                        for j in range(len(desc_list)):
-                            ### Check to see that port numbers match
-                            if temp_list1[0] == temp_list2[0]:
-                                ### Checking for a description
-                                if temp_list2[-1] != ('up' and 'down'):
-                                    desc = temp_list2[-1]
-                                    break
-                                else:
-                                    desc = 'No description'
-                                    break
-                        temp_dict = {'port': temp_list1[0], 'description': desc, 'vlan': temp_list1[-4], 'duplex': temp_list1[-3],
-                                     'speed': temp_list1[-2], 'media': temp_list1[-1]}
-                        connected_list.append(temp_dict)
-            else:
-                for i in range(len(status_list)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str1 = status_list[i]
-                    temp_list1 = temp_str1.split()
-                    temp_str2 = desc_list[i]
-                    temp_list2 = temp_str2.split()
-                    desc = ''
-
-                if ('Po' and 'Ma' and 'Vl') not in temp_list1[0] and temp_list1[-4] == vlan:
-                    for j in range(len(desc_list)):
-                        ### Check to see that port numbers match
-                        if temp_list1[0] == temp_list2[0]:
-                            ### Checking for a description
-                            if temp_list2[-1] != ('up' and 'down'):
-                                desc = temp_list2[-1]
-                                break
-                            else:
-                                desc = 'No description'
-                                break
-                    temp_dict = {'port': temp_list1[0], 'description': desc, 'vlan': temp_list1[-4], 'duplex': temp_list1[-3],
-                                    'speed': temp_list1[-2], 'media': temp_list1[-1]}
-                    connected_list.append(temp_dict)
+            for entry in self.interface_index().values():
+                if entry['status'] != 'connected' or entry['port'][:2] in self.LOGICAL_PORTS:
+                    continue
+                if vlan != None and entry['vlan'] != str(vlan):
+                    continue
+                connected_list.append(self._port_details(entry))
         else:
-            output_status = self.net_connect.send_command_timing('show int status | include connected')
-            status_list = output_status.splitlines()
-            connected_list = []
-            for i in range(len(status_list)):
-                if ('Po' and 'Ma' and 'Vl') not in status_list[0]:
-                    temp_str = status_list[i]
-                    connected_list.append(temp_str.split()[0])
+            status_list = self._parse('show int status | include connected')
+            for status in status_list:
+                if status['port'][:2] not in self.LOGICAL_PORTS:
+                    connected_list.append(status['port'])
         if file != None:
-            file = open('output/' + file + '.csv', 'w')
             if full == True:
-                file.write('Port,Description,VLAN,Duplex,Speed,Media\n')
-                for i in range(len(connected_list)):
-                    file.write(connected_list[i]['port'] + ',' + connected_list[i]['description'] + ',' + str(connected_list[i]['vlan']) + ',' +
-                               connected_list[i]['duplex'] + ',' + connected_list[i]['speed'] + ',' + connected_list[i]['media'] + '\n')
+                self._write_rows(file, connected_list, [('Port', 'port'), ('Description', 'description'), ('VLAN', 'vlan'), ('Duplex', 'duplex'), ('Speed', 'speed'), ('Media', 'media')])
             else:
-                file.write('Port,Description\n')
-                for i in range(len(connected_list)):
-                    file.write(connected_list[i]['port'] + ',' + connected_list[i]['description'] + '\n')
-            file.close()
+                ### The short result is a list of port names
+                self._write_rows(file, [{'port': port} for port in connected_list], [('Port', 'port')])
 
         return connected_list
 
@@ -482,350 +889,156 @@ class Switch_Driver:
     Find available ports. Command used 'show int status | include disabled'. Returns a list of disabled ports.
     '''
     def get_open_ports(self):
-        output_status = self.net_connect.send_command_timing('show int status | include disabled')
-        status_list = output_status.splitlines()
         disabled_list = []
-        for i in range(len(status_list)):
-           if (('Po' and 'Ma' and 'Vl') not in status_list[0]) and status_list[0] != 'Fa0':
-                temp_str = status_list[i]
-                disabled_list.append(temp_str.split()[0])
+        for status in self._parse('show int status | include disabled'):
+            if status['port'][:2] not in self.LOGICAL_PORTS and status['port'] != 'Fa0':
+                disabled_list.append(status['port'])
 
         return disabled_list
-    
+
     '''
     Find enabled ports. Command used 'show int status | exclude disabled'. By default, it returns just a list of enabled ports
     @args full: When true, returns a list of dictionaries with port number, description, VLAN, duplex, speed, and media type
     @args vlan: Returns only enabled ports on a specified VLAN. Can only be used when full = True
-    @args file: name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV.
+    @args file: name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
     def get_active_ports(self, full = False, vlan = None, file = None):
+        active_list = []
         if full == True:
-            output_status = self.net_connect.send_command_timing('show int status | exclude disabled')
-            output_desc = self.net_connect.send_command_timing('show int desc | exclude admin')
-            desc_list = output_desc.splitlines()
-            status_list = output_status.splitlines()
-            active_list = []
-            if vlan == None:
-                for i in range(2, len(status_list)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str1 = status_list[i]
-                    temp_list1 = temp_str1.split()
-                    temp_str2 = desc_list[i]
-                    temp_list2 = temp_str2.split()
-                    desc = ''
-                
-                    if ('Po' and 'Ma' and 'Vl') not in temp_list1[0]:
-                        for j in range(len(desc_list)):
-                            ### Check to see that port numbers match
-                            if temp_list1[0] == temp_list2[0]:
-                                ### Checking for a description
-                                if temp_list2[-1] != ('up' and 'down'):
-                                    desc = temp_list2[-1]
-                                    break
-                                else:
-                                    desc = 'No description'
-                                    break
-                        temp_dict = {'port': temp_list1[0], 'description': desc, 'vlan': temp_list1[-4], 'duplex': temp_list1[-3],
-                                     'speed': temp_list1[-2], 'media': temp_list1[-1]}
-                        active_list.append(temp_dict)
-            else:
-                for i in range(2, len(status_list)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str1 = status_list[i]
-                    temp_list1 = temp_str1.split()
-                    temp_str2 = desc_list[i]
-                    temp_list2 = temp_str2.split()
-                    desc = ''
-
-                    if ('Po' and 'Ma' and 'Vl') not in temp_list1[0] and temp_list1[-4] == str(vlan):
-                        for j in range(len(desc_list)):
-                            ### Check to see that port numbers match
-                            if temp_list1[0] == temp_list2[0]:
-                                ### Checking for a description
-                                if temp_list2[-1] != ('up' and 'down'):
-                                    desc = temp_list2[-1]
-                                    break
-                                else:
-                                    desc = 'No description'
-                                    break
-                        temp_dict = {'port': temp_list1[0], 'description': desc, 'vlan': temp_list1[-4], 'duplex': temp_list1[-3],
-                                        'speed': temp_list1[-2], 'media': temp_list1[-1]}
-                        active_list.append(temp_dict)
+            for entry in self.interface_index().values():
+                if entry['status'] == None or 'disabled' in entry['status'] or entry['port'][:2] in self.LOGICAL_PORTS:
+                    continue
+                if vlan != None and entry['vlan'] != str(vlan):
+                    continue
+                active_list.append(self._port_details(entry))
         else:
-            output_status = self.net_connect.send_command_timing('show int status | exclude disabled')
-            status_list = output_status.splitlines()
-            active_list = []
-            for i in range(2, len(status_list)):
-                if ('Po' and 'Ma' and 'Vl') not in status_list[0]:
-                    temp_str = status_list[i]
-                    active_list.append(temp_str.split()[0])
+            status_list = self._parse('show int status | exclude disabled')
+            for status in status_list:
+                if status['port'][:2] not in self.LOGICAL_PORTS:
+                    active_list.append(status['port'])
 
         if file != None:
-            file = open('output/' + file + '.csv', 'w')
             if full == True:
-                file.write('Port,Description,VLAN,Duplex,Speed,Media\n')
-                for i in range(len(active_list)):
-                    file.write(active_list[i]['port'] + ',' + active_list[i]['description'] + ',' + str(active_list[i]['vlan']) + ',' +
-                               active_list[i]['duplex'] + ',' + active_list[i]['speed'] + ',' + active_list[i]['media'] + '\n')
+                self._write_rows(file, active_list, [('Port', 'port'), ('Description', 'description'), ('VLAN', 'vlan'), ('Duplex', 'duplex'), ('Speed', 'speed'), ('Media', 'media')])
             else:
-                file.write('Port,Description\n')
-                for i in range(len(active_list)):
-                    file.write(active_list[i]['port'] + ',' + active_list[i]['description'] + '\n')
-            file.close()
+                ### The short result is a list of port names
+                self._write_rows(file, [{'port': port} for port in active_list], [('Port', 'port')])
 
         return active_list
 
+    '''
+    Builds the full port dictionary from an interface index entry
+    '''
+    def _port_details(self, entry):
+        desc = entry['description'] if entry['description'] != '' else 'No description'
+        return Switch_Records.Port_Record(port = entry['port'], description = desc, vlan = entry['vlan'], duplex = entry['duplex'],
+                                          speed = entry['speed'], media = entry['media'])
+
     '''
     Returns a list of dictionaries containing the MAC addresses on the device. Command varies depending on device type and os.
     @args full: When true, returns a list of dictionaries with MAC address, port, and VLAN
     @args vlan: Returns only MAC addresses on a specified VLAN. Can only be used when full = True
-    @args file: str name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV.
+    @args file: str name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
     def get_mac_addresses(self, full = False, vlan = None, file = None):
-        if full == True:
-            if vlan == None:
-                if 'access' in self.device_group and self.device_os == 'ios':
-                    output = self.net_connect.send_command_timing('show mac address-table secure')
-                    mac_output = output.splitlines()
-                    mac_list = []
-                    for i in range(3, len(mac_output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = mac_output[i]
-                        temp_list = temp_str.split()
-                        mac_add = temp_list[1]
-                        mac_port = temp_list[-1]
-                        mac_vlan = temp_list[0]
-                        temp_dict = {'mac': mac_add, 'port': mac_port, 'vlan': mac_vlan}
-                        mac_list.append(temp_dict)
-                elif self.device_group == 'vss' or 'dist' in self.device_group:
-                    output = self.net_connect.send_command_timing('show mac address-table | include dynamic')
-                    mac_output = output.splitlines()
-                    mac_list = []
-                    for i in range(len(mac_output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = mac_output[i]
-                        temp_list = temp_str.split()
-                        mac_add = temp_list[2]
-                        mac_port = temp_list[-1]
-                        mac_vlan = temp_list[1]
-                        temp_dict = {'mac': mac_add, 'port': mac_port, 'vlan': mac_vlan}
-                        mac_list.append(temp_dict)
-                elif self.device_os == 'dell':
-                    output = self.net_connect.send_command_timing('show mac address-table | include Te')
-                    mac_output = output.splitlines()
-                    mac_list = []
-                    for i in range(3, len(mac_output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = mac_output[i]
-                        temp_list = temp_str.split()
-                        mac_add = temp_list[1]
-                        mac_port = temp_list[-1]
-                        mac_vlan = temp_list[0]
-                        temp_dict = {'mac': mac_add, 'port': mac_port, 'vlan': mac_vlan}
-                        mac_list.append(temp_dict)
-            else:
-                if 'access' in self.device_group and self.device_os == 'ios':
-                    output = self.net_connect.send_command_timing('show mac address-table secure vlan ' + str(vlan))
-                    mac_output = output.splitlines()
-                    mac_list = []
-                    for i in range(3, len(mac_output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = mac_output[i]
-                        temp_list = temp_str.split()
-                        mac_add = temp_list[1]
-                        mac_port = temp_list[-1]
-                        mac_vlan = temp_list[0]
-                        temp_dict = {'mac': mac_add, 'port': mac_port, 'vlan': mac_vlan}
-                        mac_list.append(temp_dict)
-                elif self.device_group == 'vss' or 'dist' in self.device_group:
-                    output = self.net_connect.send_command_timing('show mac address-table vlan ' + str(vlan) + ' | include dynamic')
-                    mac_output = output.splitlines()
-                    mac_list = []
-                    for i in range(len(mac_output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = mac_output[i]
-                        temp_list = temp_str.split()
-                        mac_add = temp_list[2]
-                        mac_port = temp_list[-1]
-                        mac_vlan = temp_list[1]
-                        temp_dict = {'mac': mac_add, 'port': mac_port, 'vlan': mac_vlan}
-                        mac_list.append(temp_dict)
-                elif self.device_os == 'dell':
-                    output = self.net_connect.send_command_timing('show mac address-table | include Te')
-                    mac_output = output.splitlines()
-                    mac_list = []
-                    for i in range(3, len(mac_output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = mac_output[i]
-                        temp_list = temp_str.split()
-                        mac_add = temp_list[1]
-                        mac_port = temp_list[-1]
-                        mac_vlan = temp_list[0]
-                        temp_dict = {'mac': mac_add, 'port': mac_port, 'vlan': mac_vlan}
-                        mac_list.append(temp_dict)
-        else:
-            if 'access' in self.device_group and self.device_os == 'ios':
-                output = self.net_connect.send_command_timing('show mac address-table secure')
-                mac_output = output.splitlines()
-                mac_list = []
-                for i in range(3, len(mac_output)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = mac_output[i]
-                    temp_list = temp_str.split()
-                    mac_add = temp_list[1]
-                    mac_port = temp_list[-1]
-                    mac_vlan = temp_list[0]
-                    temp_dict = {'mac': mac_add, 'port': mac_port}
-                    mac_list.append(temp_dict)
-            elif self.device_group == 'vss' or 'dist' in self.device_group:
-                output = self.net_connect.send_command_timing('show mac address-table | include dynamic')
-                mac_output = output.splitlines()
-                mac_list = []
-                for i in range(len(mac_output)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = mac_output[i]
-                    temp_list = temp_str.split()
-                    mac_add = temp_list[2]
-                    mac_port = temp_list[-1]
-                    mac_vlan = temp_list[1]
-                    temp_dict = {'mac': mac_add, 'port': mac_port}
-                    mac_list.append(temp_dict)
-            elif self.device_os == 'dell':
-                output = self.net_connect.send_command_timing('show mac address-table | include Te')
-                mac_output = output.splitlines()
-                mac_list = []
-                for i in range(3, len(mac_output)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = mac_output[i]
-                    temp_list = temp_str.split()
-                    mac_add = temp_list[1]
-                    mac_port = temp_list[-1]
-                    mac_vlan = temp_list[0]
-                    temp_dict = {'mac': mac_add, 'port': mac_port}
-                    mac_list.append(temp_dict)
+        mac_list = list(self.iter_mac_addresses(full, vlan, keep = True))
 
         if file != None:
-            file = open('output/' + file, 'w')
+            columns = [('MAC Address', 'mac'), ('Port', 'port')] + ([('VLAN', 'vlan')] if full == True else [])
+            self._write_rows(file, mac_list, columns)
+
+        return mac_list
+
+    '''
+    Generator version of get_mac_addresses. Yields each MAC address as soon as its line comes back from the device,
+    so a large distribution table can be written out while it is still printing.
+    @args full: When true, the records also have the VLAN
+    @args vlan: Yields only MAC addresses on a specified VLAN. Can only be used when full = True
+    @args keep: When true, the output is also put in the cache for later calls
+    '''
+    def iter_mac_addresses(self, full = False, vlan = None, keep = False):
+        ### The VLAN filter only applies to the full output
+        if full != True:
+            vlan = None
+        command = self._mac_command(vlan)
+        if command == None:
+            return
+        for record in self._iter_parse(command, keep):
+            ### The dell command does not filter by VLAN on the device
+            if vlan != None and record['vlan'] != str(vlan):
+                continue
             if full == True:
-                file.write('MAC Address,Port,VLAN\n')
-                for i in range(len(mac_list)):
-                    file.write(mac_list[i]['mac'] + ',' + mac_list[i]['port'] + ',' + str(mac_list[i]['vlan']) + '\n')
+                yield Switch_Records.Mac_Record(mac = record['mac'], port = record['port'], vlan = record['vlan'])
             else:
-                for i in range(len(mac_list)):
-                    file.write('MAC Address,Port\n')
-                    file.write(mac_list[i]['mac'] + ',' + mac_list[i]['port'] + '\n')
-            file.close()   
+                yield Switch_Records.Mac_Record(mac = record['mac'], port = record['port'])
 
-        return mac_list
+    '''
+    Adds the MAC address table of the device to a Switch_Records.Mac_Table and returns the table. Use one table
+    for many devices to keep a campus wide MAC table in compact columns instead of a dictionary per entry.
+    @args vlan: Adds only MAC addresses on a specified VLAN
+    @args table: Mac_Table to add to. A new table is made when this is not given
+    '''
+    def get_mac_table(self, vlan = None, table = None):
+        if table == None:
+            table = Switch_Records.Mac_Table()
+        table.extend(self.get_mac_addresses(full = True, vlan = vlan), self.host)
+        return table
 
     '''
-    Returns an IP address for the given MAC address(es).
-    @args mac_address: Accepted input is a single MAC address string or a list of MAC addresses of any length
-    @args file: str name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV.
+    Returns the MAC address table command for this device group and os, or None when the device has no MAC table command
     '''
-    def get_ip_address(self, mac_address, file = None):
-        ip_address = ''
+    def _mac_command(self, vlan = None):
+        if 'access' in self.device_group and self.device_os == 'ios':
+            if vlan != None:
+                return 'show mac address-table secure vlan ' + str(vlan)
+            return 'show mac address-table secure'
+        elif self.device_group == 'vss' or 'dist' in self.device_group:
+            if vlan != None:
+                return 'show mac address-table vlan ' + str(vlan) + ' | include dynamic'
+            return 'show mac address-table | include dynamic'
+        elif self.device_os == 'dell':
+            return 'show mac address-table | include Te'
+        return None
+
+    '''
+    Returns an IP address for the given MAC address(es). The ARP table of the gateway is pulled once and every MAC is
+    looked up in memory. Access switches use the gateway found in their CDP neighbors.
+    @args mac_address: Accepted input is a single MAC address string or a list of MAC addresses of any length.
+    A single MAC returns its IP address as a str, a list returns a list of dictionaries with the MAC and IP address
+    @args file: str name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
+    @args resolver: Arp_Resolver to share ARP tables with other drivers. A resolver for this call only is used when this is not given
+    '''
+    def get_ip_address(self, mac_address, file = None, resolver = None):
+        if resolver == None:
+            resolver = Arp_Resolver.Arp_Resolver(self.user, self.password, pool = self.pool)
         if isinstance(mac_address, str):
-            if self.device_group == 'access':
-                output = self.net_connect.send_command_timing('show cdp neighbor | include VSS|vss')
-                uplink = output.splitlines()[0]
-                self.net_connect.send_command_timing('ssh ' + uplink)
-                self.net_connect.send_command_timing(self.password)
-                output = self.net_connect.send_command_timing('show ip arp | include ' + mac_address)
-                ### Saving to a str then list with split removes empty space items
-                temp_str = output.splitlines()[0]
-                temp_list = temp_str.split()
-                ip_address = temp_list[1]
-            elif self.device_group == 'resnet-access':
-                output = self.net_connect.send_command_timing('show cdp neighbor | include dist')
-                uplink = output.splitlines()[0]
-                self.net_connect.send_command_timing('ssh ' + uplink)
-                self.net_connect.send_command_timing(self.password)
-                output = self.net_connect.send_command_timing('show ip arp | include ' + mac_address)
-                ### Saving to a str then list with split removes empty space items
-                temp_str = output.splitlines()[0]
-                temp_list = temp_str.split()
-                ip_address = temp_list[1]
-            elif ('dist' or 'cirbn') in self.device_group or self.device_group == 'vss':
-                output = self.net_connect.send_command_timing('show ip arp | include ' + mac_address)
-                ### Saving to a str then list with split removes empty space items
-                temp_str = output.splitlines()[0]
-                temp_list = temp_str.split()
-                ip_address = temp_list[1]
-        elif isinstance(mac_address, list):
-            ip_address = []
-            if self.device_group == 'access':
-                output = self.net_connect.send_command_timing('show cdp neighbor | include VSS|vss')
-                uplink = output.splitlines()[0]
-                self.net_connect.send_command_timing('ssh ' + uplink)
-                self.net_connect.send_command_timing(self.password)
-                for i in range(len(mac_address)):
-                    output = self.net_connect.send_command_timing('show ip arp | include ' + mac_address[i])
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = output.splitlines()[0]
-                    temp_list = temp_str.split()
-                    ip_address.append(temp_list[1])
-            elif self.device_group == 'resnet-access':
-                output = self.net_connect.send_command_timing('show cdp neighbor | include dist')
-                uplink = output.splitlines()[0]
-                self.net_connect.send_command_timing('ssh ' + uplink)
-                self.net_connect.send_command_timing(self.password)
-                for i in range(len(mac_address)):
-                    output = self.net_connect.send_command_timing('show ip arp | include ' + mac_address[i])
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = output.splitlines()[0]
-                    temp_list = temp_str.split()
-                    ip_address.append(temp_list[1])
-            elif ('dist' or 'cirbn') in self.device_group or self.device_group == 'vss':
-                ### Saving to a str then list with split removes empty space items
-                for i in range(len(mac_address)):
-                    output = self.net_connect.send_command_timing('show ip arp | include ' + mac_address[i])
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = output.splitlines()[0]
-                    temp_list = temp_str.split()
-                    temp_dict = {'mac': mac_address[i], 'ip': temp_list[1]}
-                    ip_address.append(temp_dict)
-
-        if file != None and isinstance(mac_address, list):
-            file = open('output/' + file + '.csv', 'w')
-            file.write('MAC Address,IP Address,\n')
-            for i in range(len(ip_address)):
-                file.write(ip_address[i]['mac'] + ',' + ip_address[i]['ip'] + '\n')
-            file.close()   
-        elif file != None and isinstance(mac_address, str):
-            file = open('output/' + file + '.csv', 'w')
-            file.write('MAC Address,IP Address,\n')
-            file.write(ip_address)
-        
+            ip_list = resolver.resolve(self, [mac_address])
+            ip_address = ip_list[0]['ip']
+        else:
+            ip_list = resolver.resolve(self, mac_address)
+            ip_address = ip_list
+
+        if file != None:
+            self._write_rows(file, ip_list, [('MAC Address', 'mac'), ('IP Address', 'ip')])
+
         return ip_address
 
     '''
     Returns the running-config of a given port(s). Command used is 'show run interface [port]'
     @args port: Accepted input is a single port string or a list of ports of any length. port needs to include speed type, not just the number
-    @args file: str name of a file for the output to be written. This is formatted like a show run. This is will overwrite an existing file of the same name. File type is TXT.
+    @args file: str name of a file for the output to be written. This is formatted like a show run. This is will overwrite an existing file of the same name. File type is TXT. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''  
     def get_config_port(self, port, file = None):
         config_dict = {}
         if isinstance(port, str):
-            output = self.net_connect.send_command_timing('show run int ' + port)
-            config_output = output.splitlines()
-            temp_list = []
-            for i in range(4, (len(config_output) - 1)):
-                temp_str = config_output[i].strip()
-                temp_list.append(temp_str)
-
-            config_dict = {port: temp_list}
-        if isinstance(port, list):
-            for i in range(len(port)):
-                output = self.net_connect.send_command_timing('show run int ' + port[i])
-                config_output = output.splitlines()
-                temp_list = []
-                for j in range(4, (len(config_output) - 1)):
-                    temp_str = config_output[j].strip()
-                    temp_list.append(temp_str)
-                config_dict.update({port[i]: temp_list})
+            port = [port]
+        config_list = self._fan_out(lambda drive, name: drive._parse('show run int ' + name), port)
+        for i in range(len(port)):
+            config_dict[port[i]] = config_list[i]
         
-        if file != None:
+        if isinstance(file, Result_Sink.Result_Sink):
+            file.put_many([{'port': name, 'config': config_dict[name]} for name in port], host = self.host, schema = [('port', str), ('config', list)])
+        elif file != None:
             file = open('output/' + file + '.txt', 'w')
             for i in range(len(port)):
                 file.write(config_dict[port[i]][0] + '\n')
@@ -840,438 +1053,140 @@ class Switch_Driver:
     @args full: When true, returns a list of dictionaries with port number, admin status, operational status, PoE from PS, PoE to device, device, and class
     @args state: Returns only ports that match the given state. Acceptable states are: all, admin_auto, admin_on, admin_off, oper_on, oper_off, and faulty. By default, it is set to all
     @args device: accepts any str and returns only the items that have the device string in Device ID
-    @args file: name of a file for the output to be written. This will overwrite an existing file of the same name. File type is CSV.
+    @args file: name of a file for the output to be written. This will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
     def get_poe_ports(self, full = False, state = 'all', device = 'all', file = None):
-        poe_list = []
-        if full == True:
-            output = self.net_connect.send_command_timing('show power inline')
-            output = output.splitlines()
-            if state == 'all' and device == 'all':
-                for i in range(len(output)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = output[i]
-                    temp_list = temp_str.split()              
-                    if len(temp_list) == 0:
-                        continue
-                    if len(temp_list) > 1 and '/' in temp_list[0]:
-                        temp_device = ''
-                        for j in range(5, len(temp_list) - 1):
-                            if j == 5:
-                                temp_device += temp_list[j]
-                            else:
-                                temp_device += ' ' + temp_list[j]
-                        temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                     'device': temp_device, 'class': temp_list[-1]}
-                        poe_list.append(temp_dict)
-            elif 'admin' in state:
-                if 'auto' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'auto' in temp_list[1]:                       
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                         'device': temp_device, 'class': temp_list[-1]}
-                            poe_list.append(temp_dict)
-                elif 'on' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()              
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[1]:                     
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                         'device': temp_device, 'class': temp_list[-1]}
-                            poe_list.append(temp_dict)
-                elif 'off' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()              
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'off' in temp_list[1]:                      
-                            devtemp_deviceice = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j] + 'here'
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                         'device': temp_device, 'class': temp_list[-1]}
-                            poe_list.append(temp_dict)
-                if device != 'all':
-                    temp_list = []
-                    for i in range(len(poe_list)):
-                        if device.lower() in poe_list[i]['device'].lower():
-                            temp_list.append(poe_list[i])
-                    poe_list = temp_list
-            elif 'oper' in state and device == 'all':
-                if 'on' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[2]:                       
-                            device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                         'device': temp_device, 'class': temp_list[-1]}
-                            poe_list.append(temp_dict)
-                elif 'off' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[2]:                       
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                         'device': temp_device, 'class': temp_list[-1]}
-                            poe_list.append(temp_dict)
-                elif 'faulty' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[2]:                       
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'admin_status': temp_list[1], 'oper_status': temp_list[2], 'poe_ps': temp_list[3], 'poe_device': temp_list[4],
-                                         'device': temp_device, 'class': temp_list[-1]}
-                            poe_list.append(temp_dict)
-                if device != 'all':
-                    temp_list = []
-                    for i in range(len(poe_list)):
-                        if device.lower() in poe_list[i]['device'].lower():
-                            temp_list.append(poe_list[i])
-                    poe_list = temp_list
-        else:
-            output = self.net_connect.send_command_timing('show power inline')
-            output = output.splitlines()
-            if state == 'all' and device == 'all':
-                for i in range(len(output)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = output[i]
-                    temp_list = temp_str.split()              
-                    if len(temp_list) == 0:
-                        continue
-                    if len(temp_list) > 1 and '/' in temp_list[0]:
-                        temp_device = ''
-                        for j in range(5, len(temp_list) - 1):
-                            if j == 5:
-                                temp_device += temp_list[j]
-                            else:
-                                temp_device += ' ' + temp_list[j]
-                        temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                        poe_list.append(temp_dict)
-            elif 'admin' in state:
-                if 'auto' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'auto' in temp_list[1]:                       
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                            poe_list.append(temp_dict)
-                elif 'on' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()              
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[1]:                     
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                            poe_list.append(temp_dict)
-                elif 'off' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()              
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'off' in temp_list[1]:                      
-                            devtemp_deviceice = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j] + 'here'
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                            poe_list.append(temp_dict)
-                if device != 'all':
-                    temp_list = []
-                    for i in range(len(poe_list)):
-                        if device.lower() in poe_list[i]['device'].lower():
-                            temp_list.append(poe_list[i])
-                    poe_list = temp_list
-            elif 'oper' in state and device == 'all':
-                if 'on' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[2]:                       
-                            device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                            poe_list.append(temp_dict)
-                elif 'off' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[2]:                       
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                            poe_list.append(temp_dict)
-                elif 'faulty' in state:
-                    for i in range(len(output)):
-                        ### Saving to a str then list with split removes empty space items
-                        temp_str = output[i]
-                        temp_list = temp_str.split()          
-                        if len(temp_list) == 0:
-                            continue
-                        elif len(temp_list) > 1 and '/' in temp_list[0] and 'on' in temp_list[2]:                       
-                            temp_device = ''
-                            for j in range(5, len(temp_list) - 1):
-                                if j == 5:
-                                    temp_device += temp_list[j]
-                                else:
-                                    temp_device += ' ' + temp_list[j]
-                            temp_dict = {'port': temp_list[0], 'oper_status': temp_list[2], 'poe_device': temp_list[4],'device': temp_device}
-                            poe_list.append(temp_dict)
-                if device != 'all':
-                    temp_list = []
-                    for i in range(len(poe_list)):
-                        if device.lower() in poe_list[i]['device'].lower():
-                            temp_list.append(poe_list[i])
-                    poe_list = temp_list  
+        poe_list = list(self.iter_poe_ports(full, state, device, keep = True))
         if file != None:
-            file = open('output/' + file + '.csv', 'w')
             if full == True:
-                file.write('Port,Admin Status,Oper Status,PoE from PS,PoE to Device,Device ID,Class\n')
-                for i in range(len(poe_list)):
-                    file.write(poe_list[i]['port'] + ',' + poe_list[i]['admin_status'] + ',' + poe_list[i]['oper_status'] + ',' + str(poe_list[i]['poe_ps']) + ',' +
-                               str(poe_list[i]['poe_device']) + ',' + poe_list[i]['device'] + ',' + str(poe_list[i]['class']) + '\n')
+                columns = [('Port', 'port'), ('Admin Status', 'admin_status'), ('Oper Status', 'oper_status'), ('PoE from PS', 'poe_ps'),
+                           ('PoE to Device', 'poe_device'), ('Device ID', 'device'), ('Class', 'class')]
             else:
-                file.write('Port,Oper Status\n')
-                for i in range(len(poe_list)):
-                    file.write(poe_list[i]['port'] + ',' + poe_list[i]['oper_status'] + str(poe_list[i]['poe_device']) + '\n')
-            file.close()
+                columns = [('Port', 'port'), ('Oper Status', 'oper_status'), ('PoE to Device', 'poe_device'), ('Device ID', 'device')]
+            self._write_rows(file, poe_list, columns)
 
         return poe_list
 
-    #Gets the vitals on a switch - Use a single key or a list of keys to return multiple values. If field is left blank then it returns all values.
-    #Keys avalable to use - 'hostname,'serialNumber','model',"iosVer",'iosFile','lastReload',"configReg","powerSupplies",'powerVoltage','ModulesInUse','availableMod','remainingPoE'}
+    '''
+    Generator version of get_poe_ports. Yields each PoE port as soon as its line comes back from the device.
+    @args full, state, device: same as get_poe_ports
+    @args keep: When true, the output is also put in the cache for later calls
+    '''
+    def iter_poe_ports(self, full = False, state = 'all', device = 'all', keep = False):
+        if state == 'all':
+            field, value = None, None
+        elif state in self.POE_STATES:
+            field, value = self.POE_STATES[state]
+        else:
+            return
+        for record in self._iter_parse('show power inline', keep):
+            if field != None and record[field] != value:
+                continue
+            if device != 'all' and device.lower() not in record['device'].lower():
+                continue
+            if full == True:
+                yield Switch_Records.Poe_Record(**record)
+            else:
+                yield Switch_Records.Poe_Record(port = record['port'], oper_status = record['oper_status'], poe_device = record['poe_device'], device = record['device'])
+
+    '''
+    Gets the vitals on a switch. show version, show power, show module and show inventory are each run at most once,
+    in one batch, and only when a requested key needs them.
+    @args key: a single key or a list of keys to return. If key is left blank then it returns a dictionary of all values.
+    Keys available to use - 'hostname', 'serialNumber', 'model', 'iosVer', 'iosFile', 'lastReload', 'configReg', 'powerSupplies',
+    'powerVoltage', 'ModulesInUse', 'availableMod', 'remainingPoE'
+    '''
     def get_vitals(self, key = 'None'):
-        hostname = self.host
-        serialNumber = 'N/A'
-        model = 'N/A'
-        iosVer = 'N/A'
-        iosFile = 'N/A'
-        lastReload = 'N/A'
-        configReg = 'N/A'
-        powerSupplies = 'N/A'
-        ModulesInUse = 'N/A'
-        availableMod = 'N/A' 
-        remainingPoE = 'N/A'
-
-        #---get IoSversion---#
-        iosVer = self.net_connect.send_command_timing('sh ver | i Version')
-        iosVer = iosVer.split('Version')
-        iosVer = iosVer[1].split(',')
-        iosVer = iosVer[0]
-        print('ios')
-        #--get PowerSuppliesVolt--#
-        PowerVolt = self.net_connect.send_command_timing('sh power | i PWR')
-        PowerVolt = PowerVolt.splitlines()
-        PowerVolts = []
-        for line in PowerVolt:
-            PowerVolts.append(line.split()[3])
-        
-        print('power')
-        #---PowrSupplies---#
-        powerSupplies = self.net_connect.send_command_timing('sh run | i power red')
-        powerSupplies = powerSupplies.split()
-        powerSupplies = powerSupplies[-1]
-
-        # config reg - sh ver | configuration register
-        #---configReg---#
-        configReg = self.net_connect.send_command_timing('sh ver | i Configuration register')
-        configReg = configReg.split()
-        configReg = configReg[-1]
-        print('config reg')
-        # iOS file - sh ver | i system image file is
-        #---get iOSfile---#
-        iosFile = self.net_connect.send_command_timing('sh ver | i System image file is')
-        iosFile = iosFile.split()[-1]
-
-        # last reload - sh ver | system restarted at
-        #---Last Reload---#
-        lastReload = self.net_connect.send_command_timing('sh ver | i System restarted')
-        lastReload = lastReload.split('at')
-        lastReload = lastReload[1]
-        #---Gets remainingPoE----#
-        try: 
-            power_output = self.net_connect.send_command_timing('sh power in | i Remaining:') 
-            power =  power_output.split("  ") 
-            remainingPoE = str(power[2].split(":")[1]) 
-        except: 
-            remainingPoE = "Non Poe" 
-
-    #---Gets model----#
-        Model_Get = self.net_connect.send_command('sh ver | i processor') 
-        model = Model_Get.split(' ')[1] 
-    #---Gets SN----#
-        try: 
-            serialNumber = self.net_connect.send_command_expect('sh snmp chassis') 
-        except: 
-            serialNumber = 'N/a' 
-
-        #---Gets SlotAmount---#
-        SlotAmount = '0'
-        #Gives us how many slots and indirectly tells me if it is a 1u switch. 
-        if("4506" in model): 
-            SlotAmount = 6 
-        elif("4503" in model): 
-            SlotAmount = 3 
-        elif("2960" in model): 
-            SlotAmount = 1 
-        elif("3560" in model): 
-            SlotAmount = 1 
-        elif("3650" in model): 
-            SlotAmount = 1 
-        elif("9410" in model or "C9410R" in Model_Get): 
-            model = "C9410R" 
-            SlotAmount = 10 
-        elif('for' in model): 
-            try: 
-                Model_Get = self.net_connect.send_command('sh ver | i WS') 
-                model = Model_Get.split(' ')[1] 
-                SlotAmount = 1 
-            except: 
-                pass 
-            try: 
-                Model_Get = self.net_connect.send_command('sh ver | i cisco C') 
-                model = Model_Get.split(' ')[1] 
-                SlotAmount = 1 
-            except: 
-                pass 
-        else: 
-            SlotAmount = 1 
-
-        #---List of mods---#
-        sh_mod_output = self.net_connect.send_command('sh mod') 
-        sh_mod_output = sh_mod_output.split('\n') 
-        mod_list = [] 
-        if(SlotAmount != 1): 
-            while('--+' not in sh_mod_output[0]): 
-                del sh_mod_output[0] 
-            del sh_mod_output[0] 
-            #list format [mod_num, port_num,serial_num,mod_model] 
-            i = 0 
-            #we get an index out of bound error so this allows us to not crash our program. 
-            try: 
-                while('MAC address' not in sh_mod_output[i]): 
-                    test = sh_mod_output[i].split()
-                    test = test[-2]
-                    mod_list.append(test)
-                    i = i + 1
-            except: 
-                pass 
-        else: 
-            #left to rigt 
-            #For 1u Switches 
-            if("2960" in model): 
-                mod_list.append(['1','24/48','NA','1u']) 
-            elif("3560" in model): 
-                mod_list.append(['1','8/12/24/48','NA','1u']) 
-            elif("3650" in model): 
-                mod_list.append(['1','24/48','NA','1u']) 
-            else: 
-                mod_list.append(['1','Unknown','NA','1u']) 
-        ModulesInUse = mod_list
-
-        #--avalible mods---#
-
-        availableMod = SlotAmount - len(mod_list)
-        #--Return Values--#
-        value = {'hostname': hostname,'serialNumber': serialNumber ,'model':model,"iosVer" : iosVer,'iosFile': iosFile,'lastReload':lastReload,"configReg":configReg,"powerSupplies":powerSupplies, 'powerVoltage': PowerVolts, 'ModulesInUse':ModulesInUse,'availableMod':availableMod,'remainingPoE':remainingPoE}
+        if key == 'None':
+            keys = list(self.VITALS_COMMANDS)
+        elif type(key) is list:
+            keys = [str(item) for item in key]
+        else:
+            keys = [str(key)]
+        commands = []
+        for name in keys:
+            for command in self.VITALS_COMMANDS[name]:
+                if command not in commands:
+                    commands.append(command)
+        ### One round trip for every command the keys need
+        self._prefetch_commands(commands)
+
+        value = {'hostname': self.host}
+        #---Fields from show version---#
+        version = {}
+        if 'show version' in commands:
+            version = self._parse('show version')[0]
+            for name in ['iosVer', 'iosFile', 'lastReload', 'configReg']:
+                value[name] = version.get(name, 'N/A')
+
+        #---Serial number of the chassis, the first inventory entry---#
+        if 'show inventory' in commands:
+            inventory = self._parse('show inventory')
+            if len(inventory) > 0 and inventory[0]['serial'] != '':
+                value['serialNumber'] = inventory[0]['serial']
+            else:
+                value['serialNumber'] = version.get('serialNumber', 'N/a')
+
+        #---PowerSupplies---#
+        if 'show run | i power red' in commands:
+            power_redundancy = self._send('show run | i power red').split()
+            value['powerSupplies'] = power_redundancy[-1] if len(power_redundancy) > 0 else 'N/A'
+
+        #---PowerSuppliesVolt---#
+        if 'show power' in commands:
+            value['powerVoltage'] = [supply['capacity'] for supply in self._parse('show power')]
+
+        #---remainingPoE---#
+        if 'show power inline' in commands:
+            budget = self._parse('show power inline', view = 'budget')
+            value['remainingPoE'] = budget[0]['remaining'] if len(budget) > 0 else 'Non Poe'
+
+        #---Model, slots and modules---#
+        if 'show version' in commands:
+            model = version.get('model', 'N/A')
+            processor = version.get('processor', '')
+            slot_amount = 1
+            #Gives us how many slots and indirectly tells me if it is a 1u switch.
+            if '4506' in model:
+                slot_amount = 6
+            elif '4503' in model:
+                slot_amount = 3
+            elif '9410' in model or 'C9410R' in processor:
+                model = 'C9410R'
+                slot_amount = 10
+            elif 'for' in model and 'modelNumber' in version:
+                model = version['modelNumber']
+            value['model'] = model
+
+            if 'show module' in commands:
+                mod_list = []
+                if slot_amount != 1:
+                    for module in self._parse('show module'):
+                        mod_list.append(module['model'])
+                #For 1u Switches
+                elif '2960' in model:
+                    mod_list.append(['1', '24/48', 'NA', '1u'])
+                elif '3560' in model:
+                    mod_list.append(['1', '8/12/24/48', 'NA', '1u'])
+                elif '3650' in model:
+                    mod_list.append(['1', '24/48', 'NA', '1u'])
+                else:
+                    mod_list.append(['1', 'Unknown', 'NA', '1u'])
+                value['ModulesInUse'] = mod_list
+                value['availableMod'] = slot_amount - len(mod_list)
+
         #return all if no key is used
-        if(key == 'None'):
-            return value
+        if key == 'None':
+            all_values = {}
+            for name in self.VITALS_COMMANDS:
+                all_values[name] = value[name]
+            return all_values
         #Return multiple values based on list
-        elif(type(key) is list):
-            valuesReturn = []
-            for item in key:
-                valuesReturn.append(value[str(item)])
-            return valuesReturn
+        elif type(key) is list:
+            return [value[name] for name in keys]
         #return the single key used.
         else:
-            return value[str(key)]
+            return value[keys[0]]
 
     '''
     Deletes all archive config files that are over one month old. This will also look for config files that equal the hostname. 
@@ -1280,137 +1195,50 @@ class Switch_Driver:
     def erase_old_configs(self):
         month_list = ['Jan-', 'Feb-', 'Mar-', 'Apr-', 'May-', 'Jun-', 'Jul-', 'Aug-', 'Sep-', 'Oct-', 'Nov-', 'Dec-']
         file_list = []
-        file_system = ''
-        output = self.net_connect.send_command_expect('dir all', expect_string = r'\#')
-        output = output.splitlines()
-        for i in range(len(output)):
-            ### Saving to a str then list with split removes empty space items
-            temp_str = output[i]
-            temp_list = temp_str.split()
-            if len(temp_list) > 0 and temp_list[0] == 'Directory':
-                file_system = temp_list[-1]
-                continue
-            ### Config files are in lines with 9 items
-            if len(temp_list) == 9:
-                for j in range(len(month_list)):
-                    ### Check to see if the date string is in the filepath
-                    if month_list[j] in temp_list[-1]:
-                        filepath = file_system + temp_list[-1]
-                        ### Determine if file is older than 30 days
-                        month = temp_list[3]
-                        ### Convert month str into an int
-                        for k in range(len(month_list)):
-                            if month in month_list[k]:
-                                month = k + 1
-                                break
-                        day = int(temp_list[4])
-                        year = int(temp_list[5])
-                        file_date = datetime.date(year, month, day)
-                        today = datetime.date.today()
-                        time_diff = today - file_date
-                        time_list = str(time_diff).split()
-                        try:
-                            time_diff = int(time_list[0])
-                            if time_diff > 30:
-                                file_list.append(filepath)
-                                break
-                        except:
-                            pass
-                    elif temp_list[-1].lower() == self.host.lower() + '.cfg':
-                        filepath = file_system + temp_list[-1]
-                        file_list.append(filepath)
-                        break
-
-    '''
-    Deletes all config files that are over one month old. This function will find all config files
-    '''
-    def erase_old_configs(self):
-        month_list = ['Jan-', 'Feb-', 'Mar-', 'Apr-', 'May-', 'Jun-', 'Jul-', 'Aug-', 'Sep-', 'Oct-', 'Nov-', 'Dec-']
-        file_list = []
-        file_system = ''
-        output = self.net_connect.send_command_expect('dir all', expect_string = r'\#')
-        output = output.splitlines()
-        for i in range(len(output)):
-            ### Saving to a str then list with split removes empty space items
-            temp_str = output[i]
-            temp_list = temp_str.split()
-            if len(temp_list) > 0 and temp_list[0] == 'Directory':
-                file_system = temp_list[-1]
-                continue
-            ### Config files are in lines with 9 items
-            if len(temp_list) == 9:
-                for j in range(len(month_list)):
-                    ### Check to see if the date string is in the filepath
-                    if month_list[j] in temp_list[-1]:
-                        filepath = file_system + temp_list[-1]
-                        ### Determine if file is older than 30 days
-                        month = temp_list[3]
-                        ### Convert month str into an int
-                        for k in range(len(month_list)):
-                            if month in month_list[k]:
-                                month = k + 1
-                                break
-                        day = int(temp_list[4])
-                        year = int(temp_list[5])
-                        file_date = datetime.date(year, month, day)
-                        today = datetime.date.today()
-                        time_diff = today - file_date
-                        time_list = str(time_diff).split()
-                        try:
-                            time_diff = int(time_list[0])
-                            if time_diff > 30:
-                                file_list.append(filepath)
-                                break
-                        except:
-                            pass
-                    elif temp_list[-1].lower() == self.host.lower() + '.cfg':
-                        filepath = file_system + temp_list[-1]
-                        file_list.append(filepath)
-                        break
+        today = datetime.date.today()
+        for record in self._parse('dir all'):
+            filepath = record['directory'] + record['name']
+            ### Archive configs have the date in the filename
+            is_archive = False
+            for month in month_list:
+                if month in record['name']:
+                    is_archive = True
+            ### Determine if file is older than 30 days
+            if is_archive and (today - record['date']).days > 30:
+                file_list.append(filepath)
+            elif not is_archive and record['name'].lower() == self.host.lower() + '.cfg':
+                file_list.append(filepath)
         ### Delete the old config files
         for i in range(len(file_list)):
-            self.net_connect.send_command_timing('delete ' + file_list[i])
-            self.net_connect.send_command_timing('')
-            self.net_connect.send_command_expect('', expect_string = r'\#')
+            self._send_netmiko('send_command_timing', 'delete ' + file_list[i])
+            self._send_netmiko('send_command_timing', '')
+            self._send_netmiko('send_command_expect', '', expect_string = r'\#')
+        self._invalidate()
         
         return self.host + ' deleted ' + str(len(file_list)) + ' files.'
 
     '''
     Finds any ports in err-disabled state. Returns a list of dictionaries.
-    @args file: str name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. Only the switches with err-disabled ports will be written
+    @args file: str name of a file for the output to be written. This is will overwrite an existing file of the same name. File type is CSV. Only the switches with err-disabled ports will be written. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
     def get_errdisabled(self, file = None):
+        err_list = []
         if (self.device_os == 'ios' or self.device_group == 'nx-os') and 'dc' not in self.device_group:
-            output = self.net_connect.send_command_timing('show int status | i err-disabled')
-            err_list = []
-            if len(output) > 0:
-                err_output = output.splitlines()
-                for i in range(len(err_output)):
-                    ### Saving to a str then list with split removes empty space items
-                    temp_str = err_output[i]
-                    temp_list = temp_str.split()
-                    temp_dict = {'switch': self.host, 'port': temp_list[0], 'description': temp_list[1]}
+            status_list = self._parse('show int status | i err-disabled')
+            if len(status_list) > 0:
+                ### Reasons for every port come from one run of the command
+                reasons = {}
+                for recovery in self._parse('show errdisable recovery'):
+                    reasons[recovery['port']] = recovery['reason']
+                for status in status_list:
                     ### Find the reason for the port being in errdisable state
-                    output = self.net_connect.send_command_timing('show errdisable recovery')
-                    recov_out = output.splitlines()
-                    for j in range(len(recov_out)):
-                        if temp_dict['port'] in recov_out[j]:
-                            ### Saving to a str then list with split removes empty space items
-                            temp_str = recov_out[j]
-                            temp_list = temp_str.split()
-                            temp_dict['reason'] = temp_list[1]
-                        else:
-                            temp_dict['reason'] = 'Unknown'
+                    temp_dict = {'switch': self.host, 'port': status['port'], 'description': status['name'], 'reason': reasons.get(status['port'], 'Unknown')}
                     err_list.append(temp_dict)
-                    if file != None:
-                        file = open('output/' + file + '.csv', 'w')
-                        file.write('Switch,Port,Description,Reason\n')
-                        for i in range(len(err_list)):
-                            file.write(err_list[i]['switch'] + ',' + err_list[i]['port'] + ',' + err_list[i]['description'] + ',' + err_list[i]['reason'])
-            else:
-                temp_dict = {'switch': self.host, 'port': 'None', 'description': 'None', 'reason': 'N/A'}  
+                if file != None:
+                    self._write_rows(file, err_list, [('Switch', 'switch'), ('Port', 'port'), ('Description', 'description'), ('Reason', 'reason')])
 
         return err_list if len(err_list) > 0 else self.host + ' has no err-disabled ports.' 
+
     '''
     Pings the given IP address(es) and returns a list of dictionaries with all of the diagnostic values.
     @args ip: The IP address(es) to be pinged. Can be a str for a single IP or a list for any amount.
@@ -1421,57 +1249,16 @@ class Switch_Driver:
     def ping(self, ip, num_pings = 5, size = 100):
         ping_list = []
         if isinstance(ip, str):
-            output = self.net_connect.send_command_expect('ping ' + ip + ' repeat ' + str(num_pings) + ' size ' + str(size), expect_string = r'\#')
-            out_list = output.splitlines()
-            for i in range(len(out_list)):
-                if 'Success' in out_list[i]:
-                    ### Saving to a str then list with split removes empty space items
-                    temp_dict = {}
-                    ping_out = out_list[i]
-                    temp_list1 = ping_out.split()
-                    temp_dict['ip'] = ip
-                    temp_dict['percent'] = temp_list1[3]
-                    ### Parse successful/total
-                    temp_list2 = temp_list1[5].split('/')
-                    temp_dict['successful'] = temp_list2[0][1:]
-                    temp_dict['total'] = num_pings
-                    ### Parse min/avg/max
-                    temp_list3 = temp_list1[9].split('/')
-                    temp_dict['minimum'] = temp_list3[0]
-                    temp_dict['average'] = temp_list3[1]
-                    temp_dict['maximum'] = temp_list3[2]
-                    ping_list.append(temp_dict)  
-                    break
-        elif isinstance(ip, list):
-            for i in range(len(ip)):
-                output = self.net_connect.send_command_expect('ping ' + ip[i] + ' repeat ' + str(num_pings) + ' size ' + str(size), expect_string = r'\#')
-                out_list = output.splitlines()
-                for j in range(len(out_list)):
-                    if 'Success' in out_list[j]:
-                        ### Saving to a str then list with split removes empty space items
-                        temp_dict = {}
-                        ping_out = out_list[j]
-                        temp_list1 = ping_out.split()
-                        temp_dict['ip'] = ip[i]
-                        temp_dict['percent'] = temp_list1[3]
-                        ### Parse successful/total
-                        temp_list2 = temp_list1[5].split('/')
-                        temp_dict['successful'] = temp_list2[0][1:]
-                        temp_dict['total'] = num_pings
-                        ### Parse min/avg/max
-                        if temp_dict['percent'] != '0':
-                            temp_list3 = temp_list1[9].split('/')
-                            temp_dict['minimum'] = temp_list3[0]
-                            temp_dict['average'] = temp_list3[1]
-                            temp_dict['maximum'] = temp_list3[2]
-                            ping_list.append(temp_dict)
-                            break
-                        else:
-                            temp_dict['minimum'] = 'N/A'
-                            temp_dict['average'] = 'N/A'
-                            temp_dict['maximum'] = 'N/A'
-                            ping_list.append(temp_dict)
-                            break
+            ip = [ip]
+        command = ' repeat ' + str(num_pings) + ' size ' + str(size)
+        output_list = self._fan_out(lambda drive, target: drive._send_netmiko('send_command_expect', 'ping ' + target + command, expect_string = r'\#'), ip)
+        for i in range(len(ip)):
+            for result in Switch_Parsers.parse(self.device_os, 'ping', output_list[i]):
+                temp_dict = {'ip': ip[i], 'percent': result['percent'], 'successful': result['successful'], 'total': num_pings}
+                ### Parse min/avg/max
+                for name in ['minimum', 'average', 'maximum']:
+                    temp_dict[name] = result[name] if result[name] != None else 'N/A'
+                ping_list.append(temp_dict)
         
         return ping_list
 
@@ -1482,121 +1269,82 @@ class Switch_Driver:
     def is_pingable(self, ip):
         pingable_list = []
         if isinstance(ip, str):
-            output = self.net_connect.send_command_expect('ping ' + ip + ' repeat 3', expect_string = r'\#')
-            out_list = output.splitlines()
-            for i in range(len(out_list)):
-                if 'Success' in out_list[i]:
-                    temp_dict = {}
-                    ping_out = out_list[i]
-                    temp_list = ping_out.split()
-                    temp_dict['ip'] = ip
-                    percent = int(temp_list[3])
-                    if percent > 0:
-                        temp_dict['pingable'] = True
-                    else:
-                        temp_dict['pingable'] = False
-                    pingable_list.append(temp_dict)
-
-        elif isinstance(ip, list):
-            for i in range(len(ip)):
-                output = self.net_connect.send_command_expect('ping ' + ip[i], expect_string = r'\#')
-                out_list = output.splitlines()
-                print(out_list)
-                for j in range(len(out_list)):
-                    if 'Success' in out_list[j]:
-                        temp_dict = {}
-                        ping_out = out_list[j]
-                        temp_list = ping_out.split()
-                        temp_dict['ip'] = ip[i]
-                        percent = int(temp_list[3])
-                        if percent > 0:
-                            temp_dict['pingable'] = True
-                        else:
-                            temp_dict['pingable'] = False
-                        pingable_list.append(temp_dict)
+            ip = [ip]
+        output_list = self._fan_out(lambda drive, target: drive._send_netmiko('send_command_expect', 'ping ' + target + ' repeat 3', expect_string = r'\#'), ip)
+        for i in range(len(ip)):
+            for result in Switch_Parsers.parse(self.device_os, 'ping', output_list[i]):
+                pingable_list.append({'ip': ip[i], 'pingable': int(result['percent']) > 0})
         
         return pingable_list
 
     '''
-    Returns a dictionary of lists of uplinks with input errors
+    Returns a dictionary of the error and drop counters of every interface, keyed by short port name, from a single
+    'show interfaces'. Each entry has the port, description, status, protocol, line_status ('admin down' for ports
+    that are shut), input_errors, crc, output_errors, input_drops and output_drops.
+    '''
+    def get_interface_counters(self):
+        counters = {}
+        for record in self._parse('show interfaces'):
+            if record['port'] == None:
+                continue
+            port = Switch_Parsers.normalize_port(record['port'])
+            entry = {'port': port, 'description': record['description'], 'status': record['status'], 'protocol': record['protocol'],
+                     'line_status': 'admin down' if 'administratively' in record['status'].lower() else record['status']}
+            for name in self.ERROR_COUNTERS:
+                entry[name] = record.get(name, 0)
+            counters[port] = entry
+        return counters
+
+    '''
+    Returns a list of dictionaries of uplinks with input errors. Each has the host, port, description, input errors and
+    a counters dictionary with the error and drop counters that were read for the port.
+    @args single_pass: When true, the counters of every interface come from one 'show interfaces' and the uplinks are
+    picked out locally, instead of one 'show int [port]' per uplink
+    @args file: name of a file for the output to be written. This will overwrite an existing file of the same name. File type is CSV. A Result_Sink can be given instead to add the records to one file for the whole fleet.
     '''
-    def monitor_uplinks(self, file = None):
+    def monitor_uplinks(self, file = None, single_pass = False):
         error_list = []
         uplink_list = []
-        if 'access' in self.device_group or '':
-            output = self.net_connect.send_command_timing('show int description')
-            output = output.splitlines()
-            for i in range(len(output)):
-                temp_str = output[i]
-                temp_list = temp_str.split()
-                #print(temp_list)
-                if len(temp_list) >= 4 and temp_list[1] != 'admin' and temp_list[0] != 'Interface':
-                    if ('vss' or 'uplink' or 'dist') in temp_list[3].lower() and 'po' not in temp_list[0].lower():
-                        temp_list = [temp_list[0], temp_list[3:]]
-                        uplink_list.append(temp_list)
-            for i in range(len(uplink_list)):
-                port = uplink_list[i][0]
-                desc = str(uplink_list[i][1])
-                output = self.net_connect.send_command_timing('show int ' + port + ' | include input error')
-                output = output.splitlines()
-                temp_str = output[0]
-                temp_list = temp_str.split()
-                errors = temp_list[0]
-                if int(errors):
-                    if errors != 0:
-                        temp_dict = {'host': self.host, 'port': port, 'description': desc, 'errors': errors}
-                        error_list.append(temp_dict)
-
-        if self.device_group == 'vss':
-            output = self.net_connect.send_command_timing('show int description')
-            output = output.splitlines()
-            for i in range(len(output)):
-                temp_str = output[i]
-                temp_list = temp_str.split()
-                #print(temp_list)
-                if len(temp_list) >= 4 and temp_list[1] != 'admin' and temp_list[0] != 'Interface':
-                    if ('core' or 'as0' or 'dist' or 'VSL') in temp_list[3].lower() and 'po' not in temp_list[0].lower():
-                        temp_list = [temp_list[0], temp_list[3:]]
-                        uplink_list.append(temp_list)
-            for i in range(len(uplink_list)):
-                port = uplink_list[i][0]
-                desc = str(uplink_list[i][1])
-                output = self.net_connect.send_command_timing('show int ' + port + ' | include input error')
-                output = output.splitlines()
-                temp_str = output[0]
-                temp_list = temp_str.split()
-                errors = temp_list[0]
-                if int(errors):
-                    if int(errors) != 0:
-                        temp_dict = {'host': self.host, 'port': port, 'description': desc, 'errors': errors}
-                        error_list.append(temp_dict)
-        if self.device_group == 'core':
-            output = self.net_connect.send_command_timing('show int description')
-            output = output.splitlines()
-            for i in range(len(output)):
-                temp_str = output[i]
-                temp_list = temp_str.split()
-                #print(temp_list)
-                if len(temp_list) >= 4 and 'Eth' in temp_list[0] and temp_list[3] != '--':
-                    temp_list = [temp_list[0], temp_list[3:]]
-                    uplink_list.append(temp_list)
+        if single_pass == True and ('access' in self.device_group or self.device_group == 'vss' or self.device_group == 'core'):
+            for entry in self.get_interface_counters().values():
+                if self._is_uplink(entry) and entry['input_errors'] != 0:
+                    counters = {}
+                    for name in self.ERROR_COUNTERS:
+                        counters[name] = entry[name]
+                    temp_dict = {'host': self.host, 'port': entry['port'], 'description': entry['description'], 'errors': str(entry['input_errors']), 'counters': counters}
+                    error_list.append(temp_dict)
+        elif 'access' in self.device_group or self.device_group == 'vss' or self.device_group == 'core':
+            for entry in self.interface_index().values():
+                if self._is_uplink(entry):
+                    uplink_list.append(entry)
+            if self.device_group == 'core':
+                counters_list = self._fan_out(lambda drive, uplink: drive._parse('show int ' + uplink['port'] + ' | include \"input error\"'), uplink_list)
+            else:
+                counters_list = self._fan_out(lambda drive, uplink: drive._parse('show int ' + uplink['port'] + ' | include input error'), uplink_list)
             for i in range(len(uplink_list)):
-                port = uplink_list[i][0]
-                desc = str(uplink_list[i][1])
-                output = self.net_connect.send_command_timing('show int ' + port + ' | include \"input error\"')
-                output = output.splitlines()
-                temp_str = output[0]
-                temp_list = temp_str.split()
-                errors = temp_list[0]
-                if int(errors):
-                    if int(errors) != 0:
-                        temp_dict = {'host': self.host, 'port': port, 'description': desc, 'errors': errors}
-                        uplink_list.append(temp_list)
+                counters = counters_list[i]
+                if len(counters) > 0 and counters[0].get('input_errors', 0) != 0:
+                    found = {}
+                    for name in self.ERROR_COUNTERS:
+                        if name in counters[0]:
+                            found[name] = counters[0][name]
+                    temp_dict = {'host': self.host, 'port': uplink_list[i]['port'], 'description': uplink_list[i]['description'], 'errors': str(counters[0]['input_errors']), 'counters': found}
+                    error_list.append(temp_dict)
         if file != None:
-                    file = open('output/' + file + '.csv', 'w')
-                    file.write('Host,Port,Description,Errors\n')
-                    for i in range(len(error_list)):
-                        file.write(error_list[i]['host'] + ',' + error_list[i]['port'] + ',' + error_list[i]['description'] + ',' + error_list[i]['errors'])
+            self._write_rows(file, error_list, [('Host', 'host'), ('Port', 'port'), ('Description', 'description'), ('Errors', 'errors')],
+                             schema = [('port', str), ('description', str), ('errors', str), ('counters', dict)])
 
         return error_list
 
+    '''
+    Returns true when an interface index entry is an uplink for this device group
+    '''
+    def _is_uplink(self, entry):
+        if self.device_group == 'core':
+            return 'Eth' in entry['port'] and entry['description'] != ''
+        if entry['line_status'] == 'admin down' or 'po' in entry['port'].lower():
+            return False
+        for keyword in self.UPLINK_KEYWORDS.get('vss' if self.device_group == 'vss' else 'access'):
+            if keyword in entry['description'].lower():
+                return True
+        return False
@@ -0,0 +1,284 @@
+from time import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bisect
+import json
+import os
+import re
+import threading
+import Switch_Parsers
+
+### Upper bounds of the histogram buckets. Anything larger goes in the last (+Inf) bucket
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+'''
+Returns the label a command is counted under: the normalized command with every word that holds a digit (ports,
+VLANs, IP addresses, file names) replaced by *, so 'sh int Te1/1/1 | i input error' and the same command on another
+port share one histogram. A bare return, such as the confirm of a delete, is counted as <return>.
+'''
+def command_label(command):
+    if command.strip() == '':
+        return '<return>'
+    words = []
+    for word in Switch_Parsers.normalize_command(command).split(' '):
+        words.append('*' if re.search(r'\d', word) else word)
+    return ' '.join(words)
+
+class Histogram:
+
+    '''
+    Count of samples per bucket, with the sample count and sum, in the Prometheus histogram layout.
+    The counts are kept in a flat array so thousands of hosts each with their own histogram stay small.
+    @args buckets: sorted upper bounds of the buckets
+    '''
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = array('Q', [0] * (len(buckets) + 1))
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for i in range(len(self.counts)):
+            self.counts[i] += other.counts[i]
+        self.count += other.count
+        self.sum += other.sum
+
+    '''
+    Returns an estimate of a quantile (0.5 is the median), interpolated inside the bucket it falls in
+    '''
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i in range(len(self.counts)):
+            if seen + self.counts[i] >= rank and self.counts[i] > 0:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return low
+                return low + (self.buckets[i] - low) * (rank - seen) / self.counts[i]
+            seen += self.counts[i]
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts)),
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+class Switch_Metrics:
+
+    '''
+    Measurements of every command Switch_Driver sends: the time to open or check out the session, the time from
+    sending to the first byte back, the total time, the bytes received, the time spent parsing and whether the
+    output came from the cache. Every sample goes into a histogram per host (labelled with its group) and a
+    histogram per command (labelled with the os), so a sweep shows both which devices and which commands take the
+    time. Export with to_prometheus() or to_json(), write() at the end of a run, or serve() to scrape it live.
+    '''
+
+    ### Histograms kept, with their buckets and help text
+    HISTOGRAMS = {
+        'connect_seconds': (SECONDS_BUCKETS, 'Seconds to open a session or check one out of the pool'),
+        'first_byte_seconds': (SECONDS_BUCKETS, 'Seconds from sending a command to the first byte of its output'),
+        'command_seconds': (SECONDS_BUCKETS, 'Seconds from sending a command to its prompt'),
+        'response_bytes': (BYTES_BUCKETS, 'Characters of output received per command'),
+        'parse_seconds': (SECONDS_BUCKETS, 'Seconds spent in the parser of a command'),
+    }
+    ### Counters kept, with their help text
+    COUNTERS = {
+        'commands_total': 'Commands sent to a device',
+        'cache_total': 'Outputs asked for, by where they came from: miss, hit or prefetch',
+    }
+    ### Prefix of every exported metric name
+    PREFIX = 'switchdriver_'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self.started = time()
+
+    '''
+    Add a sample to the histogram of a metric and labels
+    @args labels: label names and values, such as host = 'sw1', group = 'access'
+    '''
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram == None:
+                histogram = Histogram(self.HISTOGRAMS[name][0])
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def increment(self, name, amount = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    '''
+    Record one command sent by a driver
+    @args drive: the Switch_Driver that sent it
+    @args seconds: seconds from sending to the prompt
+    @args first_byte: seconds to the first byte, or None when it is not known
+    @args size: characters received
+    '''
+    def record_command(self, drive, command, seconds, first_byte, size):
+        label = command_label(command)
+        for labels in ({'host': drive.host, 'group': drive.device_group}, {'command': label, 'os': drive.device_os}):
+            self.observe('command_seconds', seconds, **labels)
+            self.observe('response_bytes', size, **labels)
+            if first_byte != None:
+                self.observe('first_byte_seconds', first_byte, **labels)
+            self.increment('commands_total', **labels)
+
+    def record_connect(self, drive, seconds, reused):
+        self.observe('connect_seconds', seconds, host = drive.host, group = drive.device_group, reused = str(reused).lower())
+
+    def record_parse(self, drive, command, seconds):
+        self.observe('parse_seconds', seconds, command = command_label(command), os = drive.device_os)
+
+    def record_cache(self, drive, command, result):
+        self.increment('cache_total', command = command_label(command), os = drive.device_os, result = result)
+
+    '''
+    Returns a list of dictionaries with the count, total, mean, p50 and p95 of one histogram for every value of one
+    label, the largest total first. Hosts are added together when grouping by group.
+    @args metric: histogram name. Default is command_seconds
+    @args by: label to group by, such as command, host or group. Default is command
+    '''
+    def summary(self, metric = 'command_seconds', by = 'command'):
+        merged = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                labels = dict(labels)
+                if name != metric or by not in labels:
+                    continue
+                if labels[by] not in merged:
+                    merged[labels[by]] = Histogram(histogram.buckets)
+                merged[labels[by]].merge(histogram)
+        rows = []
+        for value, histogram in merged.items():
+            rows.append({by: value, 'count': histogram.count, 'total': histogram.sum, 'mean': histogram.sum / histogram.count if histogram.count > 0 else 0,
+                         'p50': histogram.quantile(0.5), 'p95': histogram.quantile(0.95)})
+        rows.sort(key = lambda row: row['total'], reverse = True)
+        return rows
+
+    def _label_text(self, labels, extra = None):
+        pairs = list(labels) + ([extra] if extra != None else [])
+        if len(pairs) == 0:
+            return ''
+        escaped = [name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"' for name, value in pairs]
+        return '{' + ','.join(escaped) + '}'
+
+    '''
+    Returns every metric in the Prometheus text exposition format
+    '''
+    def to_prometheus(self):
+        with self._lock:
+            histograms = []
+            for key, histogram in self._histograms.items():
+                copy = Histogram(histogram.buckets)
+                copy.merge(histogram)
+                histograms.append((key, copy))
+            counters = dict(self._counters)
+        lines = []
+        for name in self.HISTOGRAMS:
+            lines.append('# HELP ' + self.PREFIX + name + ' ' + self.HISTOGRAMS[name][1])
+            lines.append('# TYPE ' + self.PREFIX + name + ' histogram')
+            for (metric, labels), histogram in histograms:
+                if metric != name:
+                    continue
+                cumulative = 0
+                for i in range(len(histogram.counts)):
+                    cumulative += histogram.counts[i]
+                    bound = str(histogram.buckets[i]) if i < len(histogram.buckets) else '+Inf'
+                    lines.append(self.PREFIX + name + '_bucket' + self._label_text(labels, ('le', bound)) + ' ' + str(cumulative))
+                lines.append(self.PREFIX + name + '_sum' + self._label_text(labels) + ' ' + repr(histogram.sum))
+                lines.append(self.PREFIX + name + '_count' + self._label_text(labels) + ' ' + str(histogram.count))
+        for name in self.COUNTERS:
+            lines.append('# HELP ' + self.PREFIX + name + ' ' + self.COUNTERS[name])
+            lines.append('# TYPE ' + self.PREFIX + name + ' counter')
+            for (metric, labels), value in counters.items():
+                if metric == name:
+                    lines.append(self.PREFIX + name + self._label_text(labels) + ' ' + str(value))
+        return '\n'.join(lines) + '\n'
+
+    '''
+    Returns every metric as a dictionary that can be written with json.dump
+    '''
+    def to_json(self):
+        with self._lock:
+            histograms = [{'name': name, 'labels': dict(labels), 'value': histogram.to_dict()} for (name, labels), histogram in self._histograms.items()]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in self._counters.items()]
+        return {'started': self.started, 'time': time(), 'histograms': histograms, 'counters': counters}
+
+    '''
+    Write the metrics to a file, as JSON when the path ends in .json and as Prometheus text otherwise.
+    The file is written under a temporary name first so a scraper never reads half a file.
+    '''
+    def write(self, path):
+        with open(path + '.tmp', 'w') as metrics_file:
+            if path.endswith('.json'):
+                json.dump(self.to_json(), metrics_file)
+            else:
+                metrics_file.write(self.to_prometheus())
+        os.replace(path + '.tmp', path)
+        return path
+
+    '''
+    Serve the metrics over HTTP in a background thread while a run is going: /metrics in Prometheus text and
+    /metrics.json as JSON. Returns the server, call shutdown() on it to stop.
+    @args port: TCP port. Default is 9108
+    @args address: address to listen on. Default is every address
+    '''
+    def serve(self, port = 9108, address = ''):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = metrics.to_prometheus().encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = json.dumps(metrics.to_json()).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((address, port), Handler)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        return server
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self.started = time()
+
+### Process wide metrics used by every Switch_Driver created without its own
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+def default_metrics():
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics == None:
+            _default_metrics = Switch_Metrics()
+        return _default_metrics
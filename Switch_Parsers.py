@@ -0,0 +1,379 @@
+import re
+import datetime
+
+'''
+Parsers for show command output. Every parser is a generator that takes an iterable of lines and yields one record
+per row, so the same parser works on a full output or on lines as they arrive from the device. Parsers are found by
+(device_os, command). Commands are normalized and matched on their longest registered prefix, so
+'sh mac address-table secure vlan 10 | i Gi' uses the 'show mac address-table' parser. nx-os and dell fall back to
+the ios parser when they do not have their own. A command can have more than one view of its output, such as the
+PoE budget of 'show power inline' next to its port rows. Views other than the rows are registered by name.
+'''
+
+### Abbreviations expanded when normalizing so 'sh int desc' and 'show interfaces description' are the same command
+ABBREVIATIONS = {'sh': 'show', 'int': 'interfaces', 'interface': 'interfaces', 'desc': 'description', 'ver': 'version',
+                 'run': 'running-config', 'mod': 'module', 'i': 'include', 'inc': 'include', 'ex': 'exclude'}
+
+'''
+Returns a command with its whitespace collapsed and its keywords expanded. Only the words before the pipe and the
+pipe keyword are expanded, the filter pattern is left as typed.
+'''
+def normalize_command(command):
+    parts = command.split('|')
+    words = [ABBREVIATIONS.get(word, word) for word in parts[0].split()]
+    normalized = ' '.join(words)
+    for part in parts[1:]:
+        words = part.split()
+        if len(words) > 0:
+            words[0] = ABBREVIATIONS.get(words[0], words[0])
+        normalized += ' | ' + ' '.join(words)
+    return normalized
+
+PARSERS = {}
+
+'''
+Decorator that adds a parser to the registry for one or more operating systems
+@args view: name of the view of the output the parser gives. Default is None, the rows of the output
+'''
+def register(command, *device_os, view = None):
+    def add(parser):
+        for os_name in device_os:
+            PARSERS[(os_name, command, view)] = parser
+        return parser
+    return add
+
+'''
+Returns the parser for a command, or None when there is no parser for it
+@args view: name of a registered view. Default is None, the rows of the output
+'''
+def find_parser(device_os, command, view = None):
+    base = normalize_command(command).split(' | ')[0]
+    for os_name in (device_os, 'ios'):
+        words = base.split(' ')
+        while len(words) > 0:
+            parser = PARSERS.get((os_name, ' '.join(words), view))
+            if parser != None:
+                return parser
+            words.pop()
+    return None
+
+'''
+Parse a whole output and return a list of records
+'''
+def parse(device_os, command, output, view = None):
+    return list(iter_parse(device_os, command, output.splitlines(), view))
+
+'''
+Parse lines one at a time and yield records as soon as they are complete
+'''
+def iter_parse(device_os, command, lines, view = None):
+    parser = find_parser(device_os, command, view)
+    if parser == None:
+        raise KeyError('No parser for ' + command + (' ' + view if view != None else '') + ' on ' + device_os)
+    return parser(lines)
+
+### Short interface name for every long or CDP style name of an interface type, keyed in lower case
+PORT_TYPES = {'gigabitethernet': 'Gi', 'gig': 'Gi', 'gi': 'Gi', 'tengigabitethernet': 'Te', 'ten': 'Te', 'te': 'Te',
+              'fastethernet': 'Fa', 'fas': 'Fa', 'fa': 'Fa', 'twogigabitethernet': 'Tw', 'two': 'Tw', 'tw': 'Tw',
+              'twentyfivegige': 'Twe', 'twe': 'Twe', 'fortygigabitethernet': 'Fo', 'for': 'Fo', 'fo': 'Fo',
+              'hundredgige': 'Hu', 'hundredgigabitethernet': 'Hu', 'hun': 'Hu', 'hu': 'Hu', 'ethernet': 'Eth', 'eth': 'Eth',
+              'port-channel': 'Po', 'port-channe': 'Po', 'po': 'Po', 'vlan': 'Vl', 'vl': 'Vl', 'mgmt': 'mgmt'}
+
+PORT_NAME = re.compile(r'^(?P<type>[A-Za-z\-]+)\s*(?P<number>\d.*)$')
+
+'''
+Returns the short form of an interface name so 'GigabitEthernet1/0/1', 'Gig 1/0/1' and 'gi1/0/1' are all 'Gi1/0/1'.
+Names of unknown interface types are returned as they are.
+'''
+def normalize_port(port):
+    match = PORT_NAME.match(port.strip())
+    if match == None:
+        return port.strip()
+    port_type = PORT_TYPES.get(match.group('type').lower())
+    if port_type == None:
+        return port.strip()
+    return port_type + match.group('number')
+
+MAC = r'(?:[0-9a-fA-F]{4}\.[0-9a-fA-F]{4}\.[0-9a-fA-F]{4}|(?:[0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2})'
+
+CDP_HEADER = re.compile(r'^Device[ -]ID')
+CDP_ROW = re.compile(r'^(?P<device>\S+)\s+(?P<type>[A-Za-z]+)\s?(?P<number>\d+(?:/\d+)*)\s+(?P<holdtime>\d+)\s+(?P<rest>.*)$')
+### Port ID, the neighbor's own interface, is the last column of a row
+CDP_PORT_ID = re.compile(r'(?:^|\s)(?P<type>[A-Za-z][A-Za-z\-]*)\s?(?P<number>\d+(?:/\d+)*)\s*$')
+CDP_DEVICE_ONLY = re.compile(r'^(?P<device>\S+)\s*$')
+CDP_CONTINUED = re.compile(r'^\s+(?P<type>[A-Za-z]+)\s?(?P<number>\d+(?:/\d+)*)\s+(?P<holdtime>\d+)\s+(?P<rest>.*)$')
+
+@register('show cdp neighbors', 'ios', 'nx-os')
+def parse_cdp_neighbors(lines):
+    seen_header = False
+    device = None
+    for line in lines:
+        if not seen_header:
+            seen_header = CDP_HEADER.match(line) != None
+            continue
+        if line.startswith('Total'):
+            break
+        ### Long device IDs are printed on their own line with the rest of the row on the next line
+        match = CDP_ROW.match(line)
+        if match == None and device != None:
+            match = CDP_CONTINUED.match(line)
+        if match != None:
+            port = normalize_port(match.group('type') + match.group('number'))
+            record = {'port': port, 'device': match.groupdict().get('device') or device}
+            remote = CDP_PORT_ID.search(match.group('rest'))
+            if remote != None:
+                record['remote_port'] = normalize_port(remote.group('type') + ' ' + remote.group('number'))
+            yield record
+            device = None
+            continue
+        match = CDP_DEVICE_ONLY.match(line)
+        if match != None:
+            device = match.group('device')
+
+INTERFACE_STATUS_ROW = re.compile(r'^(?P<port>\S+)\s+(?P<name>.*)\b(?P<status>connected|notconnect|notconnec|disabled|err-disabled|'
+                                  r'inactive|monitoring|sfpAbsent|xcvrAbsen|noOperMem|suspended|suspnd|faulty|linkFlapE|down|up)'
+                                  r'\s+(?P<vlan>\S+)\s+(?P<duplex>\S+)\s+(?P<speed>\S+)\s*(?P<media>.*?)\s*$')
+
+@register('show interfaces status', 'ios', 'nx-os', 'dell')
+def parse_interface_status(lines):
+    for line in lines:
+        match = INTERFACE_STATUS_ROW.match(line)
+        if match != None and match.group('port') != 'Port':
+            record = match.groupdict()
+            record['name'] = record['name'].strip()
+            yield record
+
+INTERFACE_DESCRIPTION_ROW = re.compile(r'^(?P<port>\S+)\s+(?P<status>admin down|up|down|deleted)\s+'
+                                       r'(?P<protocol>up|down|not present|notpresent|lowerlayerdown|dormant|testing|unknown)\s*(?P<description>.*?)\s*$')
+
+@register('show interfaces description', 'ios', 'dell')
+def parse_interface_description(lines):
+    for line in lines:
+        match = INTERFACE_DESCRIPTION_ROW.match(line)
+        if match != None:
+            yield match.groupdict()
+
+NXOS_DESCRIPTION_ROW = re.compile(r'^(?P<port>(?:Eth|Po|mgmt|Lo|Vlan|Tunnel)\S*)\s+(?P<type>\S+)\s+(?P<speed>\S+)\s+(?P<description>.*?)\s*$')
+
+@register('show interfaces description', 'nx-os')
+def parse_nxos_interface_description(lines):
+    for line in lines:
+        match = NXOS_DESCRIPTION_ROW.match(line)
+        if match != None:
+            description = match.group('description')
+            yield {'port': match.group('port'), 'status': None, 'protocol': None, 'description': '' if description == '--' else description}
+
+MAC_ROW = re.compile(r'^\s*[*+GROC]?\s*(?P<vlan>\d+|All|N/A)\s+(?P<mac>' + MAC + r')\s+(?P<type>\S+)\s+(?:.*\s)?(?P<port>\S+)\s*$')
+
+@register('show mac address-table', 'ios', 'nx-os', 'dell')
+def parse_mac_address_table(lines):
+    for line in lines:
+        match = MAC_ROW.match(line)
+        if match != None:
+            yield {'mac': match.group('mac'), 'port': match.group('port'), 'vlan': match.group('vlan'), 'type': match.group('type')}
+
+ARP_ROW = re.compile(r'^Internet\s+(?P<ip>\d+\.\d+\.\d+\.\d+)\s+(?P<age>\S+)\s+(?P<mac>' + MAC + r'|Incomplete)\s+(?P<type>\S+)\s*(?P<interface>\S*)')
+
+@register('show ip arp', 'ios')
+def parse_ip_arp(lines):
+    for line in lines:
+        match = ARP_ROW.match(line)
+        if match != None:
+            yield match.groupdict()
+
+NXOS_ARP_ROW = re.compile(r'^(?P<ip>\d+\.\d+\.\d+\.\d+)\s+(?P<age>\S+)\s+(?P<mac>' + MAC + r'|INCOMPLETE)\s+(?P<interface>\S+)')
+
+@register('show ip arp', 'nx-os')
+def parse_nxos_ip_arp(lines):
+    for line in lines:
+        match = NXOS_ARP_ROW.match(line)
+        if match != None:
+            record = match.groupdict()
+            ### Same fields as the ios parser
+            if record['mac'] == 'INCOMPLETE':
+                record['mac'] = 'Incomplete'
+            record['type'] = 'ARPA'
+            yield record
+
+@register('show running-config interfaces', 'ios', 'nx-os', 'dell')
+def parse_running_config_interface(lines):
+    started = False
+    for line in lines:
+        line = line.strip()
+        if not started:
+            started = line.startswith('interface ')
+            if not started:
+                continue
+        if line == 'end':
+            break
+        if line != '':
+            yield line
+
+POWER_INLINE_ROW = re.compile(r'^(?P<port>\S+/\S+)\s+(?P<admin_status>\S+)\s+(?P<oper_status>\S+)\s+(?P<poe_ps>\S+)\s+(?P<poe_device>\S+)'
+                              r'(?:\s+(?P<device>.*?))?\s+(?P<class>\S+)\s*$')
+
+@register('show power inline', 'ios')
+def parse_power_inline(lines):
+    for line in lines:
+        match = POWER_INLINE_ROW.match(line)
+        if match != None:
+            record = match.groupdict()
+            if record['device'] == None:
+                record['device'] = ''
+            yield record
+
+POWER_BUDGET_FIELDS = [
+    ('available', re.compile(r'Available:\s*(?P<value>\S+)')),
+    ('used', re.compile(r'Used:\s*(?P<value>\S+)')),
+    ('remaining', re.compile(r'Remaining:\s*(?P<value>\S+)')),
+]
+
+@register('show power inline', 'ios', view = 'budget')
+def parse_power_budget(lines):
+    ### One record per budget line, with the watts as the device prints them, such as 733.7(w). Switches without PoE have none
+    for line in lines:
+        if 'Remaining:' not in line:
+            continue
+        record = {}
+        for name, field in POWER_BUDGET_FIELDS:
+            match = field.search(line)
+            record[name] = match.group('value') if match != None else 'N/A'
+        yield record
+
+@register('show power', 'ios')
+def parse_power(lines):
+    ### The columns after the model differ between platforms, capacity is the fourth one, the wattage of the supply
+    for line in lines:
+        fields = line.split()
+        if 'PWR' in line and len(fields) > 3:
+            yield {'supply': fields[0], 'model': fields[1], 'type': fields[2], 'capacity': fields[3]}
+
+ERRDISABLE_RECOVERY_ROW = re.compile(r'^(?P<port>\S+/\S+)\s+(?P<reason>\S+)\s+(?P<time_left>\d+)\s*$')
+
+@register('show errdisable recovery', 'ios', 'nx-os')
+def parse_errdisable_recovery(lines):
+    for line in lines:
+        match = ERRDISABLE_RECOVERY_ROW.match(line.strip())
+        if match != None:
+            yield match.groupdict()
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+DIRECTORY_HEADER = re.compile(r'^Directory of (?P<directory>\S+)')
+DIRECTORY_ROW = re.compile(r'^\s*(?P<index>\d+)\s+(?P<permissions>\S+)\s+(?P<size>\d+)\s+(?P<month>[A-Z][a-z]{2})\s+(?P<day>\d+)\s+'
+                           r'(?P<year>\d{4})\s+(?P<time>\S+)\s+(?P<timezone>\S+)\s+(?P<name>\S+)\s*$')
+
+@register('dir', 'ios')
+def parse_dir(lines):
+    directory = ''
+    for line in lines:
+        match = DIRECTORY_HEADER.match(line)
+        if match != None:
+            directory = match.group('directory')
+            continue
+        match = DIRECTORY_ROW.match(line)
+        if match != None and match.group('month') in MONTHS:
+            file_date = datetime.date(int(match.group('year')), MONTHS.index(match.group('month')) + 1, int(match.group('day')))
+            yield {'directory': directory, 'name': match.group('name'), 'size': int(match.group('size')), 'date': file_date}
+
+PING_RESULT = re.compile(r'Success rate is (?P<percent>\d+) percent \((?P<successful>\d+)/(?P<total>\d+)\)'
+                         r'(?:, round-trip min/avg/max = (?P<minimum>\d+)/(?P<average>\d+)/(?P<maximum>\d+))?')
+
+@register('ping', 'ios', 'nx-os')
+def parse_ping(lines):
+    for line in lines:
+        match = PING_RESULT.search(line)
+        if match != None:
+            yield match.groupdict()
+            break
+
+### nx-os headers have no line protocol
+INTERFACE_HEADER = re.compile(r'^(?P<port>\S+) is (?P<status>[^,]+?)(?:, line protocol is (?P<protocol>\S+).*)?\s*$')
+INTERFACE_DESCRIPTION = re.compile(r'^\s+Description: (?P<description>.*?)\s*$')
+INTERFACE_COUNTERS = [
+    re.compile(r'(?P<input_errors>\d+) input errors?'),
+    re.compile(r'(?P<crc>\d+) CRC'),
+    re.compile(r'(?P<output_errors>\d+) output errors?'),
+    re.compile(r'Input queue: \d+/\d+/(?P<input_drops>\d+)/\d+'),
+    re.compile(r'Total output drops: (?P<output_drops>\d+)'),
+]
+
+@register('show interfaces', 'ios', 'nx-os')
+def parse_interfaces(lines):
+    record = None
+    for line in lines:
+        match = INTERFACE_HEADER.match(line)
+        if match != None:
+            if record != None:
+                yield record
+            record = {'port': match.group('port'), 'status': match.group('status'), 'protocol': match.group('protocol'), 'description': ''}
+            continue
+        ### Output filtered with include has no header lines, so collect the counters into a record with no port
+        if record == None:
+            record = {'port': None, 'status': None, 'protocol': None, 'description': ''}
+        match = INTERFACE_DESCRIPTION.match(line)
+        if match != None:
+            record['description'] = match.group('description')
+            continue
+        for counter in INTERFACE_COUNTERS:
+            match = counter.search(line)
+            if match != None:
+                for name, value in match.groupdict().items():
+                    record[name] = int(value)
+    if record != None:
+        yield record
+
+### The first field that matches a name is kept. NX-OS prints the version, image and last reload in its own words
+VERSION_FIELDS = [
+    ('iosVer', re.compile(r'Version (?P<value>[^,\s]+)')),
+    ('iosVer', re.compile(r'^\s*(?:NXOS|system):\s+version (?P<value>\S+)')),
+    ('configReg', re.compile(r'Configuration register is (?P<value>\S+)')),
+    ('iosFile', re.compile(r'System image file is "?(?P<value>[^"\s]+)"?')),
+    ('iosFile', re.compile(r'^\s*(?:NXOS|system) image file is:\s*(?P<value>\S+)')),
+    ('lastReload', re.compile(r'System restarted at (?P<value>.+?)\s*$')),
+    ('lastReload', re.compile(r'^Last reset at (?:\d+ usecs after )?(?P<value>.+?)\s*$')),
+    ('uptime', re.compile(r' uptime is (?P<value>.+?)\s*$')),
+    ('processor', re.compile(r'^(?P<value>[Cc]isco .* processor.*?)\s*$')),
+    ('model', re.compile(r'^[Cc]isco (?P<value>\S+) .*processor')),
+    ('modelNumber', re.compile(r'^\s*Model [Nn]umber\s*:\s*(?P<value>\S+)')),
+    ('serialNumber', re.compile(r'^\s*System [Ss]erial [Nn]umber\s*:\s*(?P<value>\S+)')),
+]
+
+@register('show version', 'ios', 'nx-os')
+def parse_version(lines):
+    record = {}
+    for line in lines:
+        for name, field in VERSION_FIELDS:
+            if name not in record:
+                match = field.search(line)
+                if match != None:
+                    record[name] = match.group('value')
+    yield record
+
+MODULE_ROW = re.compile(r'^\s*(?P<module>\d+)\s+(?P<ports>\d+)\s+(?P<card_type>.+?)\s+(?P<model>\S+)\s+(?P<serial>\S+)\s*$')
+
+@register('show module', 'ios')
+def parse_module(lines):
+    for line in lines:
+        ### Only the first table lists the cards, later tables repeat the module numbers
+        if 'MAC address' in line:
+            break
+        match = MODULE_ROW.match(line)
+        if match != None:
+            yield match.groupdict()
+
+INVENTORY_NAME = re.compile(r'^NAME:\s*"(?P<name>[^"]*)",\s*DESCR:\s*"(?P<description>[^"]*)"')
+INVENTORY_IDS = re.compile(r'^PID:\s*(?P<pid>\S*)\s*,\s*VID:\s*(?P<vid>\S*)\s*,\s*SN:\s*(?P<serial>\S*)')
+
+@register('show inventory', 'ios', 'nx-os')
+def parse_inventory(lines):
+    record = None
+    for line in lines:
+        match = INVENTORY_NAME.match(line.strip())
+        if match != None:
+            record = match.groupdict()
+            continue
+        match = INVENTORY_IDS.match(line.strip())
+        if match != None and record != None:
+            record.update(match.groupdict())
+            yield record
+            record = None
@@ -0,0 +1,155 @@
+from collections.abc import Mapping
+from array import array
+import re
+
+'''
+Compact record types returned by the Switch_Driver getters. Records keep their values in __slots__ instead of a
+dictionary per row, but they are read only Mappings, so record['port'], record.get('vlan'), dict(record) and
+comparing with a dictionary all work the way they did when the getters returned dictionaries. A field that was
+never set is left out of the mapping, so a short and a full result can share one record type.
+'''
+
+class Record(Mapping):
+
+    __slots__ = ()
+    ### Dictionary keys in output order. _ATTRS maps each key to its slot
+    KEYS = ()
+    _ATTRS = {}
+
+    def __init__(self, **fields):
+        for key in fields:
+            setattr(self, self._ATTRS[key], fields[key])
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._ATTRS[key])
+        except (KeyError, AttributeError):
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.KEYS:
+            if hasattr(self, self._ATTRS[key]):
+                yield key
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    '''
+    Returns a plain dictionary copy of the record
+    '''
+    def to_dict(self):
+        return dict(self)
+
+class Mac_Record(Record):
+    __slots__ = ('mac', 'port', 'vlan')
+    KEYS = ('mac', 'port', 'vlan')
+    _ATTRS = dict(zip(KEYS, __slots__))
+
+class Poe_Record(Record):
+    __slots__ = ('port', 'admin_status', 'oper_status', 'poe_ps', 'poe_device', 'device', 'power_class')
+    KEYS = ('port', 'admin_status', 'oper_status', 'poe_ps', 'poe_device', 'device', 'class')
+    _ATTRS = dict(zip(KEYS, __slots__))
+
+class Cdp_Record(Record):
+    __slots__ = ('port', 'device', 'remote_port')
+    KEYS = ('port', 'device', 'remote_port')
+    _ATTRS = dict(zip(KEYS, __slots__))
+
+class Port_Record(Record):
+    __slots__ = ('port', 'description', 'vlan', 'duplex', 'speed', 'media')
+    KEYS = ('port', 'description', 'vlan', 'duplex', 'speed', 'media')
+    _ATTRS = dict(zip(KEYS, __slots__))
+
+HEX_DIGITS = re.compile(r'[^0-9a-fA-F]')
+
+'''
+Returns a MAC address in any of the usual formats as a 48 bit int
+'''
+def mac_to_int(mac):
+    digits = HEX_DIGITS.sub('', mac)
+    if len(digits) != 12:
+        raise ValueError('Not a MAC address: ' + mac)
+    return int(digits, 16)
+
+'''
+Returns a 48 bit int as a MAC address in the Cisco xxxx.xxxx.xxxx format
+'''
+def int_to_mac(value):
+    digits = '%012x' % value
+    return digits[0:4] + '.' + digits[4:8] + '.' + digits[8:12]
+
+class Mac_Table:
+
+    '''
+    Column store for MAC address tables gathered from many devices. MACs are kept as 48 bit ints and VLANs as
+    16 bit ints in arrays, hosts and ports are kept once each and referenced by number, so a row costs about
+    16 bytes instead of a dictionary of strings. Rows are read back as Mac_Record objects.
+    '''
+
+    def __init__(self):
+        self.macs = array('Q')
+        self.vlans = array('H')
+        self.port_ids = array('I')
+        self.host_ids = array('I')
+        self._ports = []
+        self._port_numbers = {}
+        self._hosts = []
+        self._host_numbers = {}
+
+    def _number(self, value, values, numbers):
+        number = numbers.get(value)
+        if number == None:
+            number = len(values)
+            values.append(value)
+            numbers[value] = number
+        return number
+
+    '''
+    Add one MAC address entry. VLANs that are not a number, such as All, are stored as 0.
+    @args host: hostname of the device the entry was learned on
+    '''
+    def append(self, mac, port, vlan = None, host = None):
+        self.macs.append(mac_to_int(mac))
+        self.vlans.append(int(vlan) if vlan != None and str(vlan).isdigit() else 0)
+        self.port_ids.append(self._number(port, self._ports, self._port_numbers))
+        self.host_ids.append(self._number(host, self._hosts, self._host_numbers))
+
+    '''
+    Add every record of a get_mac_addresses result
+    @args records: list of Mac_Record objects or dictionaries with mac, port and optionally vlan
+    @args host: hostname of the device the records came from
+    '''
+    def extend(self, records, host = None):
+        for record in records:
+            self.append(record['mac'], record['port'], record.get('vlan'), host)
+
+    def __len__(self):
+        return len(self.macs)
+
+    def __getitem__(self, i):
+        vlan = self.vlans[i]
+        return Mac_Record(mac = int_to_mac(self.macs[i]), port = self._ports[self.port_ids[i]], vlan = str(vlan) if vlan != 0 else None)
+
+    def __iter__(self):
+        for i in range(len(self.macs)):
+            yield self[i]
+
+    '''
+    Returns the hostname of the device row i was learned on
+    '''
+    def host(self, i):
+        return self._hosts[self.host_ids[i]]
+
+    '''
+    Returns a list of (hostname, Mac_Record) for every row with the given MAC address
+    '''
+    def find(self, mac):
+        value = mac_to_int(mac)
+        found = []
+        for i in range(len(self.macs)):
+            if self.macs[i] == value:
+                found.append((self.host(i), self[i]))
+        return found
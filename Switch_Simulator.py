@@ -0,0 +1,988 @@
+from time import time
+from time import sleep
+import random
+import re
+import socket
+import threading
+from netmiko import ConnectHandler
+import Switch_Parsers
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+'''
+Simulated switches for running Switch_Driver without a network. A Simulated_Device answers the CLI of an ios, nx-os
+or dell switch from port, MAC, ARP and CDP tables generated from its hostname, so the same device answers the same
+way every time. Simulated_Session gives a device the netmiko calls Switch_Driver and Connection_Pool use, with the
+prompt, echo, paging, copy and delete dialogues of the real CLI and a configurable latency and bandwidth.
+Simulated_Fleet builds a campus of devices and its factory plugs the sessions into Connection_Pool.
+Simulator_Server serves a fleet over real SSH for end-to-end runs through netmiko.
+'''
+
+### Short interface type used in the CDP Local Intrfce and Port ID columns
+CDP_PORT_TYPES = {'Gi': 'Gig', 'Te': 'Ten', 'Eth': 'Eth', 'Po': 'Por'}
+### netmiko device_type of each device_os, used by Simulator_Server.factory
+DEVICE_TYPES = {'ios': 'cisco_ios', 'nx-os': 'cisco_nxos', 'dell': 'dell_os6'}
+### Model, image and power supply of each device group and os
+PLATFORMS = {
+    ('access', 'ios'): {'model': 'WS-C2960X-48FPD-L', 'image': 'flash:/c2960x-universalk9-mz.152-7.E4.bin', 'version': '15.2(7)E4', 'power': 'PWR-C2-640WAC'},
+    ('access', 'dell'): {'model': 'N3048P', 'image': 'N3000v6.6.3.10.stk', 'version': '6.6.3.10', 'power': 'PWR-DELL-1100'},
+    ('vss', 'ios'): {'model': 'WS-C4506-E', 'image': 'bootflash:cat4500es8-universalk9.SPA.03.11.03.E.152-7.E3.bin', 'version': '03.11.03.E', 'power': 'PWR-C45-4200ACV'},
+    ('core', 'nx-os'): {'model': 'N9K-C93180YC-EX', 'image': 'bootflash:///nxos.9.3.8.bin', 'version': '9.3(8)', 'power': 'NXA-PAC-650W-PE'},
+}
+
+class Simulated_Device:
+
+    '''
+    One simulated switch. Access switches have edge ports with hosts behind them and two uplinks to their VSS. A VSS
+    has one downlink per access switch and holds the ARP entries of every host behind it. A core has one link per VSS.
+    @args hostname: hostname of the device, also its base prompt
+    @args group: device group, such as access, vss or core
+    @args os: ios, nx-os or dell
+    @args ports: number of edge ports on an access switch. Default is 48
+    @args macs: MAC addresses learned on each connected edge port. Default is 1
+    @args config_lines: extra lines added to the running-config to make it larger. Default is 0
+    @args latency: seconds before each reply starts to arrive. Default is 0
+    @args bandwidth: bytes per second each reply arrives at. Default is None, all at once
+    @args error_rate: input errors per second added to every uplink. Default is 0
+    @args page_size: lines per page while paging is on. Default is 24
+    @args number: number of the device in its fleet, used to keep MAC and IP addresses unique. Default is 0
+    @args uplink: hostname of the VSS an access switch connects to. Default is None
+    @args downlinks: list of the Simulated_Device objects a VSS or core connects to. Default is None
+    '''
+
+    def __init__(self, hostname, group, os, ports = 48, macs = 1, config_lines = 0, latency = 0, bandwidth = None, error_rate = 0,
+                 page_size = 24, number = 0, uplink = None, downlinks = None):
+        self.host = hostname
+        self.group = group
+        self.os = os
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.config_lines = config_lines
+        self.number = number
+        self.uplink = uplink
+        self.downlinks = downlinks if downlinks != None else []
+        self.platform = PLATFORMS.get((group, os), PLATFORMS[('access', 'ios')])
+        self.started = time()
+        self.random = random.Random(hostname)
+        self.serial = 'FOC' + ''.join([self.random.choice('0123456789ABCDEFGHJKLMNPQRSTUVWXYZ') for i in range(8)])
+        self.interfaces = []
+        self.mac_table = []
+        self.arp_table = []
+        self.known_hosts = set()
+        self.files = [[self.host + '.cfg', 'Jan 2 2024'], [self.host + '-Mar-3-2020.cfg', 'Mar 3 2020'], ['vlan.dat', 'Jan 2 2024']]
+        self.stats = {'logins': 0, 'commands': 0, 'bytes': 0, 'invalid': 0}
+        self._lock = threading.Lock()
+        self._build(ports, macs)
+
+    ### Show commands the device answers and the method that builds each output. Found on the longest matching prefix
+    COMMANDS = {
+        'show interfaces status': '_show_interfaces_status',
+        'show interfaces description': '_show_interfaces_description',
+        'show interfaces': '_show_interfaces',
+        'show mac address-table count': '_show_mac_count',
+        'show mac address-table': '_show_mac_address_table',
+        'show ip arp summary': '_show_arp_summary',
+        'show ip arp': '_show_ip_arp',
+        'show cdp neighbors': '_show_cdp_neighbors',
+        'show version': '_show_version',
+        'show inventory': '_show_inventory',
+        'show module': '_show_module',
+        'show power inline': '_show_power_inline',
+        'show power': '_show_power',
+        'show running-config interfaces': '_show_running_config_interface',
+        'show running-config': '_show_running_config',
+        'show errdisable recovery': '_show_errdisable_recovery',
+        'dir': '_dir',
+        'ping': '_ping',
+    }
+
+    def count(self, name, amount = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _add_interface(self, name, description, status, vlan, speed, media, uplink = False):
+        errors = [self.random.randint(0, 3), 0, 0] if status == 'connected' else [0, 0, 0]
+        self.interfaces.append({'name': name, 'port': Switch_Parsers.normalize_port(name), 'description': description, 'status': status,
+                                'vlan': vlan, 'speed': speed, 'media': media, 'uplink': uplink, 'errors': errors,
+                                'mac': '00a0.%04x.%04x' % (self.number & 0xffff, len(self.interfaces))})
+
+    '''
+    Generate the interfaces and the MAC and ARP tables of the device
+    '''
+    def _build(self, ports, macs):
+        if self.group == 'core':
+            for i in range(len(self.downlinks)):
+                self._add_interface('Ethernet1/' + str(i + 1), self.downlinks[i].host, 'connected', 'trunk', '10G', '10Gbase-SR', True)
+            for i in range(len(self.downlinks), len(self.downlinks) + 4):
+                self._add_interface('Ethernet1/' + str(i + 1), '', 'notconnect', '1', 'auto', '10Gbase-SR')
+            return
+        if self.group == 'vss':
+            self._add_interface('TenGigabitEthernet1/1/1', 'core uplink', 'connected', 'trunk', '10G', 'SFP-10GBase-SR', True)
+            self._add_interface('TenGigabitEthernet2/1/1', 'core uplink', 'connected', 'trunk', '10G', 'SFP-10GBase-SR', True)
+            for i in range(len(self.downlinks)):
+                downlink = self.downlinks[i]
+                name = 'GigabitEthernet%d/%d' % (3 + i // 48, i % 48 + 1)
+                self._add_interface(name, downlink.host, 'connected', 'trunk', 'a-1000', '10/100/1000-TX', True)
+                ### Every host behind the access switch is learned on its downlink and routed here
+                for vlan, mac, port, ip in downlink.mac_table:
+                    self.mac_table.append((vlan, mac, Switch_Parsers.normalize_port(name), ip))
+                    self.arp_table.append((ip, mac, 'Vlan' + vlan))
+            self._add_interface('Vlan10', '', 'connected', '', '', '')
+            return
+
+        vlans = ['10', '20', '30']
+        for i in range(1, ports + 1):
+            roll = self.random.random()
+            if roll < 0.6:
+                status = 'connected'
+            elif roll < 0.9:
+                status = 'notconnect'
+            elif roll < 0.98:
+                status = 'disabled'
+            else:
+                status = 'err-disabled'
+            description = 'desk ' + str(i) if status == 'connected' and self.random.random() < 0.5 else ''
+            self._add_interface('GigabitEthernet1/0/' + str(i), description, status, vlans[i % 3], 'a-1000' if status == 'connected' else 'auto',
+                                '10/100/1000BaseTX')
+        uplink_description = (self.uplink if self.uplink != None else 'vss') + ' uplink'
+        self._add_interface('TenGigabitEthernet1/1/1', uplink_description, 'connected', 'trunk', '10G', 'SFP-10GBase-SR', True)
+        self._add_interface('TenGigabitEthernet1/1/2', uplink_description, 'connected', 'trunk', '10G', 'SFP-10GBase-SR', True)
+        self._add_interface('Port-channel1', uplink_description, 'connected', 'trunk', 'a-full', '')
+
+        for i in range(len(self.interfaces)):
+            interface = self.interfaces[i]
+            if interface['uplink'] or interface['status'] != 'connected' or 'GigabitEthernet1/0/' not in interface['name']:
+                continue
+            for j in range(macs):
+                host_number = i * macs + j
+                mac = '0050.%04x.%04x' % (self.number & 0xffff, host_number)
+                ip = '10.%d.%d.%d' % (self.number // 256 % 256, self.number % 256, host_number % 240 + 10)
+                self.mac_table.append((interface['vlan'], mac, interface['port'], ip))
+
+    '''
+    Returns the output of a show command, with its include, exclude or begin filters applied, or None when the
+    device does not know the command
+    @args command: command normalized by Switch_Parsers.normalize_command
+    '''
+    def output(self, command):
+        parts = command.split(' | ')
+        words = parts[0].split(' ')
+        args = []
+        name = None
+        while len(words) > 0:
+            name = self.COMMANDS.get(' '.join(words))
+            if name != None:
+                break
+            args.insert(0, words.pop())
+        if name == None:
+            return None
+        lines = getattr(self, name)(args).split('\n')
+        for part in parts[1:]:
+            words = part.split(' ', 1)
+            if len(words) < 2:
+                return None
+            try:
+                pattern = re.compile(words[1].strip('"'))
+            except re.error:
+                return None
+            if words[0] == 'include':
+                lines = [line for line in lines if pattern.search(line)]
+            elif words[0] == 'exclude':
+                lines = [line for line in lines if not pattern.search(line)]
+            elif words[0] == 'begin':
+                for i in range(len(lines)):
+                    if pattern.search(lines[i]):
+                        lines = lines[i:]
+                        break
+                else:
+                    lines = []
+        return '\n'.join(lines)
+
+    '''
+    Returns the input errors, CRC and output errors of an interface. Uplinks gain error_rate errors every second.
+    '''
+    def _errors(self, interface):
+        errors = list(interface['errors'])
+        if interface['uplink'] and self.error_rate > 0:
+            added = int(self.error_rate * (time() - self.started))
+            errors[0] += added
+            errors[1] += added // 2
+        return errors
+
+    def _physical(self):
+        return [interface for interface in self.interfaces if not interface['port'].startswith('Vl')]
+
+    def _show_interfaces_status(self, args):
+        lines = []
+        if self.os == 'nx-os':
+            lines.append('-' * 79)
+        lines.append('%-9s %-18s %-12s %-10s %-7s %-6s %s' % ('Port', 'Name', 'Status', 'Vlan', 'Duplex', 'Speed', 'Type'))
+        if self.os == 'nx-os':
+            lines.append('-' * 79)
+        for interface in self._physical():
+            duplex = 'a-full' if interface['status'] == 'connected' else 'auto'
+            lines.append('%-9s %-18s %-12s %-10s %-7s %-6s %s' % (interface['port'], interface['description'][:18], interface['status'],
+                                                                  interface['vlan'], duplex, interface['speed'], interface['media']))
+        return '\n'.join(lines)
+
+    def _line_status(self, interface):
+        if interface['status'] == 'connected':
+            return 'up', 'up'
+        if interface['status'] == 'disabled':
+            return 'admin down', 'down'
+        return 'down', 'down'
+
+    def _show_interfaces_description(self, args):
+        lines = []
+        if self.os == 'nx-os':
+            lines.append('-' * 79)
+            lines.append('%-13s %-6s %-7s %s' % ('Port', 'Type', 'Speed', 'Description'))
+            lines.append('-' * 79)
+            for interface in self.interfaces:
+                lines.append('%-13s %-6s %-7s %s' % (interface['port'], 'eth', interface['speed'], interface['description'] or '--'))
+            return '\n'.join(lines)
+        lines.append('%-30s %-14s %-8s %s' % ('Interface', 'Status', 'Protocol', 'Description'))
+        for interface in self.interfaces:
+            status, protocol = self._line_status(interface)
+            lines.append('%-30s %-14s %-8s %s' % (interface['port'], status, protocol, interface['description']))
+        return '\n'.join(lines)
+
+    def _show_interfaces(self, args):
+        interfaces = self.interfaces
+        if len(args) > 0:
+            port = Switch_Parsers.normalize_port(' '.join(args))
+            interfaces = [interface for interface in interfaces if interface['port'] == port]
+            if len(interfaces) == 0:
+                return "                          ^\n% Invalid input detected at '^' marker."
+        lines = []
+        for interface in interfaces:
+            status, protocol = self._line_status(interface)
+            input_errors, crc, output_errors = self._errors(interface)
+            packets = 1000 + interface['errors'][0] * 997
+            if self.os == 'nx-os':
+                lines.append(interface['name'] + ' is ' + ('up' if status == 'up' else 'down'))
+                lines.append('admin state is ' + ('down' if status == 'admin down' else 'up') + ', Dedicated Interface')
+                if interface['description'] != '':
+                    lines.append('  Description: ' + interface['description'])
+                lines.append('  Hardware: 1000/10000 Ethernet, address: ' + interface['mac'] + ' (bia ' + interface['mac'] + ')')
+                lines.append('  MTU 9216 bytes, BW 10000000 Kbit, DLY 10 usec')
+                lines.append('  RX')
+                lines.append('    ' + str(packets) + ' unicast packets  0 multicast packets  0 broadcast packets')
+                lines.append('    ' + str(input_errors) + ' input error  0 short frame  0 overrun   0 underrun  0 ignored')
+                lines.append('    0 runts  0 giants  ' + str(crc) + ' CRC  0 no buffer')
+                lines.append('  TX')
+                lines.append('    ' + str(output_errors) + ' output error  0 collision  0 deferred  0 late collision')
+                continue
+            if status == 'admin down':
+                status = 'administratively down'
+            lines.append(interface['name'] + ' is ' + status + ', line protocol is ' + protocol + ' (' + interface['status'] + ')')
+            lines.append('  Hardware is Gigabit Ethernet, address is ' + interface['mac'] + ' (bia ' + interface['mac'] + ')')
+            if interface['description'] != '':
+                lines.append('  Description: ' + interface['description'])
+            lines.append('  MTU 1500 bytes, BW 1000000 Kbit/sec, DLY 10 usec,')
+            lines.append('     reliability 255/255, txload 1/255, rxload 1/255')
+            lines.append('  Input queue: 0/2000/0/0 (size/max/drops/flushes); Total output drops: 0')
+            lines.append('  5 minute input rate 1000 bits/sec, 2 packets/sec')
+            lines.append('     ' + str(packets) + ' packets input, ' + str(packets * 512) + ' bytes, 0 no buffer')
+            lines.append('     ' + str(input_errors) + ' input errors, ' + str(crc) + ' CRC, 0 frame, 0 overrun, 0 ignored')
+            lines.append('     ' + str(packets) + ' packets output, ' + str(packets * 512) + ' bytes, 0 underruns')
+            lines.append('     ' + str(output_errors) + ' output errors, 0 collisions, 1 interface resets')
+        return '\n'.join(lines)
+
+    '''
+    Returns the MAC table rows a 'show mac address-table' with these keywords lists
+    '''
+    def _mac_rows(self, args):
+        rows = self.mac_table
+        if 'vlan' in args and args.index('vlan') + 1 < len(args):
+            vlan = args[args.index('vlan') + 1]
+            rows = [row for row in rows if row[0] == vlan]
+        return rows
+
+    def _show_mac_address_table(self, args):
+        if self.group == 'vss':
+            kind = 'dynamic'
+        elif 'secure' in args:
+            kind = 'STATIC'
+        else:
+            kind = 'DYNAMIC'
+        lines = ['          Mac Address Table', '-------------------------------------------', '',
+                 'Vlan    Mac Address       Type        Ports', '----    -----------       --------    -----']
+        for vlan, mac, port, ip in self._mac_rows(args):
+            lines.append('%4s    %-17s %-11s %s' % (vlan, mac, kind, port))
+        lines.append('Total Mac Addresses for this criterion: ' + str(len(lines) - 5))
+        return '\n'.join(lines)
+
+    def _show_mac_count(self, args):
+        return 'Mac Entries for all vlans :\nDynamic Address Count:  ' + str(len(self.mac_table)) + '\nTotal Mac Addresses for this criterion:  ' + str(len(self.mac_table))
+
+    def _show_ip_arp(self, args):
+        if self.os == 'nx-os':
+            lines = ['IP ARP Table for context default', 'Total number of entries: ' + str(len(self.arp_table)),
+                     'Address         Age       MAC Address     Interface']
+            for ip, mac, interface in self.arp_table:
+                lines.append('%-15s %-9s %-15s %s' % (ip, '00:01:23', mac, interface))
+            return '\n'.join(lines)
+        lines = ['Protocol  Address          Age (min)  Hardware Addr   Type   Interface']
+        for ip, mac, interface in self.arp_table:
+            lines.append('Internet  %-16s %9s   %-14s  ARPA   %s' % (ip, '3', mac, interface))
+        return '\n'.join(lines)
+
+    def _show_arp_summary(self, args):
+        return str(len(self.arp_table)) + ' IP ARP entries, with 0 of them incomplete'
+
+    '''
+    Returns (local port, neighbor device ID, neighbor port) for every CDP neighbor
+    '''
+    def _neighbors(self):
+        neighbors = []
+        if self.uplink != None:
+            neighbors.append(('Te1/1/1', self.uplink + '.ilstu.net', 'Gi3/' + str(self.number % 48 + 1)))
+            neighbors.append(('Te1/1/2', self.uplink + '.ilstu.net', 'Gi4/' + str(self.number % 48 + 1)))
+        for interface in self.interfaces:
+            if interface['uplink'] and interface['description'] in [downlink.host for downlink in self.downlinks]:
+                neighbors.append((interface['port'], interface['description'] + '.ilstu.net', 'Te1/1/1'))
+        return neighbors
+
+    def _cdp_port(self, port):
+        match = Switch_Parsers.PORT_NAME.match(port)
+        return CDP_PORT_TYPES.get(match.group('type'), match.group('type')) + ' ' + match.group('number')
+
+    def _show_cdp_neighbors(self, args):
+        lines = ['Capability Codes: R - Router, T - Trans Bridge, B - Source Route Bridge',
+                 '                  S - Switch, H - Host, I - IGMP, r - Repeater, P - Phone', '',
+                 'Device ID        Local Intrfce     Holdtme    Capability  Platform  Port ID']
+        neighbors = self._neighbors()
+        for local_port, device, remote_port in neighbors:
+            row = '%-17s %-10s %-11s %-9s %s' % (self._cdp_port(local_port), '150', 'R S I', 'WS-C4506', self._cdp_port(remote_port))
+            ### Long device IDs go on their own line
+            if len(device) > 16:
+                lines.append(device)
+                lines.append(' ' * 17 + row)
+            else:
+                lines.append('%-16s %s' % (device, row))
+        lines.append('')
+        lines.append('Total cdp entries displayed : ' + str(len(neighbors)))
+        return '\n'.join(lines)
+
+    def _show_version(self, args):
+        platform = self.platform
+        if self.os == 'nx-os':
+            return '\n'.join(['Cisco Nexus Operating System (NX-OS) Software', 'Software', '  NXOS: version ' + platform['version'],
+                              '  NXOS image file is: ' + platform['image'], 'Hardware',
+                              '  cisco Nexus9000 ' + platform['model'] + ' chassis', '  Processor Board ID ' + self.serial,
+                              '  Device name: ' + self.host, 'Kernel uptime is 21 day(s), 4 hour(s), 1 minute(s), 5 second(s)',
+                              'Last reset at 120511 usecs after Mon Jan  1 10:00:00 2024'])
+        if self.os == 'dell':
+            return '\n'.join(['System Description............................. Dell Networking ' + platform['model'],
+                              'System Model ID................................ ' + platform['model'],
+                              'Machine Type................................... Dell Networking ' + platform['model'],
+                              'Serial Number.................................. ' + self.serial,
+                              'Software Version............................... ' + platform['version']])
+        return '\n'.join(['Cisco IOS Software, Catalyst Software, Version ' + platform['version'] + ', RELEASE SOFTWARE (fc2)',
+                          'Technical Support: http://www.cisco.com/techsupport', '',
+                          self.host + ' uptime is 3 weeks, 0 days, 4 hours, 1 minute',
+                          'System returned to ROM by power-on',
+                          'System restarted at 10:00:00 CDT Mon Jan 1 2024',
+                          'System image file is "' + platform['image'] + '"', '',
+                          'cisco ' + platform['model'] + ' (APM86XXX) processor (revision A0) with 524288K bytes of memory.',
+                          'Processor board ID ' + self.serial, '',
+                          'Model number                    : ' + platform['model'],
+                          'System serial number            : ' + self.serial, '',
+                          'Configuration register is 0x2102'])
+
+    def _show_inventory(self, args):
+        return '\n'.join(['NAME: "1", DESCR: "' + self.platform['model'] + '"',
+                          'PID: ' + self.platform['model'] + '  , VID: V02  , SN: ' + self.serial, '',
+                          'NAME: "Power Supply 1", DESCR: "' + self.platform['power'] + '"',
+                          'PID: ' + self.platform['power'] + '  , VID: V01  , SN: LIT' + self.serial[3:]])
+
+    def _show_module(self, args):
+        lines = ['Chassis Type : ' + self.platform['model'], '', 'Power consumed by backplane : 40 Watts', '',
+                 'Mod Ports Card Type                              Model              Serial No.',
+                 '---+-----+--------------------------------------+------------------+-----------',
+                 ' 1     4  Sup 8-E 10GE (SFP+), 1000BaseX (SFP)   WS-X45-SUP8-E      CAT' + self.serial[3:]]
+        for slot in range(2, 2 + (len(self.downlinks) + 47) // 48):
+            lines.append('%2d    48  10/100/1000BaseT Premium POE E Series  WS-X4748-RJ45V+E   CAT%d%s' % (slot, slot, self.serial[4:]))
+        lines.append('')
+        lines.append(' M MAC addresses                    Hw  Fw           Sw               Status')
+        lines.append('--+--------------------------------+---+------------+----------------+---------')
+        lines.append(' 1 00a0.0000.0000 to 00a0.0000.0003 1.0 15.1(1r)SG10 03.11.03.E       Ok')
+        return '\n'.join(lines)
+
+    def _show_power(self, args):
+        return '\n'.join(['Power                                                   Fan      Inline',
+                          'Supply  Model No          Type       Status    Sensor   Status',
+                          '------  ----------------  ---------  ----------- -------  -------',
+                          'PS1     ' + '%-17s %-10s good        good     good' % (self.platform['power'], 'AC 4200W'),
+                          'PS2     ' + '%-17s %-10s good        good     good' % (self.platform['power'], 'AC 4200W')])
+
+    def _show_power_inline(self, args):
+        edge = [interface for interface in self.interfaces if 'GigabitEthernet1/0/' in interface['name']]
+        if self.group != 'access' or len(edge) == 0:
+            return ''
+        used = 0
+        rows = []
+        for interface in edge:
+            if interface['status'] == 'connected':
+                rows.append('%-9s %-6s %-10s %-7s %-19s %s' % (interface['port'], 'auto', 'on', '6.3', 'IP Phone 8845', '2'))
+                used += 6.3
+            else:
+                rows.append('%-9s %-6s %-10s %-7s %-19s %s' % (interface['port'], 'auto', 'off', '0.0', 'n/a', 'n/a'))
+        lines = ['Available:740.0(w)  Used:%.1f(w)  Remaining:%.1f(w)' % (used, 740 - used), '',
+                 'Interface Admin  Oper       Power   Device              Class', '                            (Watts)',
+                 '--------- ------ ---------- ------- ------------------- -----']
+        return '\n'.join(lines + rows)
+
+    def _interface_config(self, interface):
+        lines = ['interface ' + interface['name']]
+        if interface['description'] != '':
+            lines.append(' description ' + interface['description'])
+        if interface['vlan'] == 'trunk':
+            lines.append(' switchport mode trunk')
+        elif interface['vlan'] != '':
+            lines.append(' switchport access vlan ' + interface['vlan'])
+            lines.append(' switchport mode access')
+        if interface['status'] == 'disabled':
+            lines.append(' shutdown')
+        return lines
+
+    def _show_running_config_interface(self, args):
+        port = Switch_Parsers.normalize_port(' '.join(args))
+        for interface in self.interfaces:
+            if interface['port'] == port:
+                lines = self._interface_config(interface)
+                return '\n'.join(['Building configuration...', '', 'Current configuration : ' + str(len('\n'.join(lines))) + ' bytes', '!'] + lines + ['end'])
+        return "                          ^\n% Invalid input detected at '^' marker."
+
+    def _show_running_config(self, args):
+        lines = ['!', 'version ' + self.platform['version'], 'hostname ' + self.host, '!']
+        if self.group == 'vss':
+            lines.extend(['power redundancy-mode redundant', '!'])
+        lines.extend(['ip scp server enable', 'errdisable recovery cause psecure-violation', '!'])
+        for vlan in ['10', '20', '30']:
+            lines.extend(['vlan ' + vlan, ' name vlan' + vlan, '!'])
+        for interface in self.interfaces:
+            lines.extend(self._interface_config(interface))
+            lines.append('!')
+        for i in range(self.config_lines):
+            lines.append('access-list 100 permit ip 10.%d.%d.0 0.0.0.255 any' % (i // 256 % 256, i % 256))
+        lines.extend(['!', 'end'])
+        config = '\n'.join(lines)
+        return '\n'.join(['Building configuration...', '', 'Current configuration : ' + str(len(config)) + ' bytes',
+                          '!', '! Last configuration change at 10:00:00 CDT Mon Jan 1 2024']) + '\n' + config
+
+    def _show_errdisable_recovery(self, args):
+        lines = ['ErrDisable Reason            Timer Status', '-----------------            --------------',
+                 'psecure-violation            Enabled', '', 'Timer interval: 300 seconds', '',
+                 'Interfaces that will be enabled at the next timeout:', '',
+                 'Interface       Errdisable reason       Time left(sec)', '---------       -----------------       --------------']
+        for interface in self.interfaces:
+            if interface['status'] == 'err-disabled':
+                lines.append('%-15s %-23s %s' % (interface['port'], 'psecure-violation', '120'))
+        return '\n'.join(lines)
+
+    def _dir(self, args):
+        lines = ['Directory of flash:/', '']
+        with self._lock:
+            files = list(self.files)
+        for i in range(len(files)):
+            month, day, year = files[i][1].split(' ')
+            lines.append('%5d  -rwx  %10d  %s %s %s 10:00:00 -06:00  %s' % (i + 2, 5120 + i, month, day, year, files[i][0]))
+        lines.append('')
+        lines.append('122185728 bytes total (68714496 bytes free)')
+        return '\n'.join(lines)
+
+    def delete(self, path):
+        name = path.split('/')[-1].split(':')[-1]
+        with self._lock:
+            self.files = [entry for entry in self.files if entry[0] != name]
+
+    def _ping(self, args):
+        target = args[0] if len(args) > 0 else ''
+        count = int(args[args.index('repeat') + 1]) if 'repeat' in args and args.index('repeat') + 1 < len(args) else 5
+        size = args[args.index('size') + 1] if 'size' in args and args.index('size') + 1 < len(args) else '100'
+        ### Addresses ending in .0 to .9 do not answer
+        reachable = target.split('.')[-1] not in [str(i) for i in range(10)]
+        lines = ['Type escape sequence to abort.',
+                 'Sending ' + str(count) + ', ' + size + '-byte ICMP Echos to ' + target + ', timeout is 2 seconds:']
+        if reachable:
+            lines.append('!' * count)
+            lines.append('Success rate is 100 percent (' + str(count) + '/' + str(count) + '), round-trip min/avg/max = 1/2/4 ms')
+        else:
+            lines.append('.' * count)
+            lines.append('Success rate is 0 percent (0/' + str(count) + ')')
+        return '\n'.join(lines)
+
+class Simulated_Session:
+
+    '''
+    A logged in session on a Simulated_Device with the netmiko calls that Switch_Driver and Connection_Pool use.
+    Each written line is answered the way the device's CLI would, with the echo first and the prompt last, and the
+    reply is held back by the device latency and bandwidth before read_channel returns it. Paging and config mode are
+    per session, like a real vty line.
+    @args device: Simulated_Device the session is logged into
+    '''
+
+    RETURN = '\n'
+    ### Most characters one read_channel returns, like one read from an SSH channel
+    MAX_READ = 65535
+
+    def __init__(self, device):
+        self.device = device
+        self.base_prompt = device.host
+        self.paging = True
+        self.config_mode = False
+        self.dialogue = None
+        self.dialogue_answers = []
+        self.more = None
+        self._typed = ''
+        self._pending = []
+        self._last_end = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._prompt_regex = re.compile(re.escape(device.host) + r'(\([\w.\-]+\))?[>#]\s*$')
+        device.count('logins')
+
+    def prompt(self):
+        return self.device.host + ('(config)#' if self.config_mode else '#')
+
+    '''
+    Queue a reply. It starts to arrive after the device latency and after the reply before it has arrived.
+    '''
+    def _queue(self, text):
+        start = max(time() + self.device.latency, self._last_end)
+        self._last_end = start + (len(text) / self.device.bandwidth if self.device.bandwidth else 0)
+        self._pending.append([start, text, 0])
+
+    def write_channel(self, out_data):
+        if self._closed:
+            raise OSError('Socket is closed')
+        with self._lock:
+            ### IOS drops NUL, which netmiko's is_alive() writes to check the session
+            self._typed += out_data.replace('\x00', '').replace('\r\n', '\n').replace('\r', '\n')
+            while len(self._typed) > 0:
+                ### Any key shows the next page, q stops the output
+                if self.more != None:
+                    key = self._typed[0]
+                    self._typed = self._typed[1:]
+                    self._queue(self._next_page(key))
+                    continue
+                if '\n' not in self._typed:
+                    break
+                line, self._typed = self._typed.split('\n', 1)
+                ### Passwords are not echoed
+                secret = self.dialogue != None and self.dialogue['questions'][0][1]
+                reply = self._answer(line)
+                if '% Invalid input' in reply:
+                    self.device.count('invalid')
+                self._queue(('' if secret else line) + '\n' + reply)
+
+    def read_channel(self):
+        if self._closed:
+            raise OSError('Socket is closed')
+        now = time()
+        data = ''
+        with self._lock:
+            while len(self._pending) > 0 and len(data) < self.MAX_READ:
+                entry = self._pending[0]
+                if now < entry[0]:
+                    break
+                if self.device.bandwidth:
+                    arrived = min(len(entry[1]), int((now - entry[0]) * self.device.bandwidth))
+                else:
+                    arrived = len(entry[1])
+                take = min(arrived - entry[2], self.MAX_READ - len(data))
+                data += entry[1][entry[2]:entry[2] + take]
+                entry[2] += take
+                if entry[2] < len(entry[1]):
+                    break
+                self._pending.pop(0)
+        if data:
+            self.device.count('bytes', len(data))
+        return data
+
+    '''
+    Returns the reply to one typed line, ending with the prompt or with the next question of a dialogue
+    '''
+    def _answer(self, line):
+        if self.dialogue != None:
+            return self._dialogue_step(line)
+        command = line.strip()
+        if command == '':
+            return self.prompt()
+        self.device.count('commands')
+        normalized = Switch_Parsers.normalize_command(command)
+        words = normalized.split(' ')
+        if self.config_mode:
+            if words[0] in ['end', 'exit']:
+                self.config_mode = False
+            return self.prompt()
+        if words[0] in ['conf', 'configure']:
+            self.config_mode = True
+            return 'Enter configuration commands, one per line.  End with CNTL/Z.\n' + self.prompt()
+        if words[0] in ['terminal', 'term']:
+            if words[-2:] == ['length', '0']:
+                self.paging = False
+            return self.prompt()
+        if words[0] == 'copy':
+            return self._copy(words)
+        if words[0] == 'delete' and len(words) > 1:
+            path = words[-1]
+            return self._start_dialogue([('Delete filename [' + path.split('/')[-1] + ']? ', False, False),
+                                         ('Delete ' + path + '? [confirm]', False, False)], lambda: self.device.delete(path) or '')
+        output = self.device.output(normalized)
+        if output == None:
+            output = "                          ^\n% Invalid input detected at '^' marker."
+        return self._page(output.split('\n'))
+
+    '''
+    Returns the first page of an output and keeps the rest for the next key while paging is on
+    '''
+    def _page(self, lines):
+        if self.paging and len(lines) > self.device.page_size:
+            self.more = lines[self.device.page_size:]
+            return '\n'.join(lines[:self.device.page_size]) + '\n --More-- '
+        self.more = None
+        if len(lines) == 1 and lines[0] == '':
+            return self.prompt()
+        return '\n'.join(lines) + '\n' + self.prompt()
+
+    def _next_page(self, key):
+        if key == 'q':
+            self.more = None
+            return '\n' + self.prompt()
+        return '\n' + self._page(self.more)
+
+    '''
+    Start a copy dialogue. Each question is (text, secret, yes or no). The done function runs after the last answer
+    and returns the text shown before the prompt.
+    '''
+    def _copy(self, words):
+        device = self.device
+        target = words[-1]
+        if target in ['start', 'startup-config']:
+            if device.os == 'nx-os':
+                return '[########################################] 100%\nCopy complete.\n' + self.prompt()
+            if device.os == 'dell':
+                return self._start_dialogue([('\nThis operation may take a few minutes.\nManagement interfaces will not be available during this time.\n\n'
+                                              'Are you sure you want to save? (y/n) ', False, True)], lambda: '\nConfiguration Saved!')
+            return self._start_dialogue([('Destination filename [startup-config]? ', False, False)], lambda: 'Building configuration...\n[OK]')
+        if not target.startswith('scp:'):
+            return "%Error opening " + target + " (Invalid argument)\n" + self.prompt()
+
+        size = len(device.output('show running-config'))
+        if device.os == 'dell':
+            return self._start_dialogue([('Remote Password:', True, False),
+                                         ('\nMode...................................... SCP\nSet Server IP............................. ' + target.split('@')[-1].split('/')[0] +
+                                          '\nData Type................................. Config Script\n\n'
+                                          'Management access will be blocked for the duration of the transfer\nAre you sure you want to start? (y/n) ', False, True)],
+                                        lambda: '\nFile transfer operation completed successfully.')
+        if device.os == 'nx-os':
+            questions = [('Enter destination filename: [' + device.host + '-running-config] ', False, False),
+                         ("Enter vrf (If no input, current vrf 'default' is considered): ", False, False),
+                         ('Enter hostname for the scp server: ', False, False),
+                         ('Enter username: ', False, False)]
+            ### The host key question is only asked the first time the device copies to a server
+            if len(device.known_hosts) == 0:
+                questions.append(("The authenticity of host 'scp server' can't be established.\n"
+                                  'Are you sure you want to continue connecting (yes/no)? ', False, True))
+            questions.append(("scp server's password: ", True, False))
+
+            def done():
+                device.known_hosts.add(self.dialogue_answers[2])
+                return 'Copy complete, now saving to disk (please wait)...\nCopy complete.'
+
+            return self._start_dialogue(questions, done)
+        return self._start_dialogue([('Address or name of remote host []? ', False, False),
+                                     ('Destination username [' + device.host + ']? ', False, False),
+                                     ('Destination filename [' + device.host.lower() + '-confg]? ', False, False),
+                                     ('Password: ', True, False)],
+                                    lambda: '!\n' + str(size) + ' bytes copied in 0.512 secs (' + str(size * 2) + ' bytes/sec)')
+
+    def _start_dialogue(self, questions, done):
+        self.dialogue = {'questions': questions, 'done': done}
+        self.dialogue_answers = []
+        return questions[0][0]
+
+    def _dialogue_step(self, line):
+        question = self.dialogue['questions'].pop(0)
+        self.dialogue_answers.append(line.strip())
+        if question[2] and not line.strip().lower().startswith('y'):
+            self.dialogue = None
+            return 'Operation aborted.\n' + self.prompt()
+        if len(self.dialogue['questions']) > 0:
+            return self.dialogue['questions'][0][0]
+        done = self.dialogue['done']
+        text = done()
+        self.dialogue = None
+        return (text + '\n' if text != '' else '') + self.prompt()
+
+    '''
+    Read until the pattern is found at the end of the output, or anywhere in it for an expect_string like netmiko
+    '''
+    def _read_until(self, pattern, anywhere = False, timeout = 30):
+        output = ''
+        started = time()
+        while True:
+            output += self.read_channel()
+            if (anywhere and pattern.search(output)) or (not anywhere and pattern.search(output[-256:])):
+                return output
+            if time() - started > timeout:
+                raise IOError('Pattern not detected: ' + pattern.pattern + ' in output.')
+            sleep(0.001)
+
+    def _strip(self, output):
+        lines = output.split('\n')
+        if len(lines) > 1:
+            del lines[0]
+        if len(lines) > 0 and self._prompt_regex.search(lines[-1]):
+            del lines[-1]
+        return '\n'.join(lines)
+
+    def find_prompt(self, *args, **kwargs):
+        return self.prompt()
+
+    def send_command(self, command_string, expect_string = None, read_timeout = 30, **kwargs):
+        self.write_channel(command_string + self.RETURN)
+        if expect_string != None:
+            return self._strip(self._read_until(re.compile(expect_string), anywhere = True, timeout = read_timeout))
+        return self._strip(self._read_until(self._prompt_regex, timeout = read_timeout))
+
+    def send_command_expect(self, command_string, expect_string = None, read_timeout = 30, **kwargs):
+        return self.send_command(command_string, expect_string = expect_string, read_timeout = read_timeout)
+
+    '''
+    Returns whatever the device sends until it stops sending, for commands that end in a question instead of the prompt
+    '''
+    def send_command_timing(self, command_string, **kwargs):
+        self.write_channel(command_string + self.RETURN)
+        output = ''
+        while True:
+            output += self.read_channel()
+            with self._lock:
+                if len(self._pending) == 0:
+                    break
+            sleep(0.001)
+        return self._strip(output)
+
+    def send_config_set(self, config_commands = None, **kwargs):
+        output = ''
+        for command in ['configure terminal'] + list(config_commands or []) + ['end']:
+            output += self.send_command_timing(command) + '\n'
+        return output
+
+    def is_alive(self):
+        return not self._closed
+
+    def disconnect(self):
+        self._closed = True
+
+class Simulated_Fleet:
+
+    '''
+    A campus of simulated devices. Access switches are spread over the VSS gateways and list their VSS as a CDP
+    neighbor, each VSS learns and routes every host behind its access switches, and each core links to every VSS,
+    so get_ip_address and the fleet jobs work end to end. The devices list is in the same format as
+    driver_test.read_devices and factory opens sessions for Connection_Pool.
+    @args access: number of ios access switches. Default is 10
+    @args vss: number of VSS gateways. Default is 1
+    @args core: number of nx-os core switches. Default is 0
+    @args dell: number of dell access switches. Default is 0
+    @args login_time: seconds each new session takes to log in. Default is 0
+    @args options: passed to every Simulated_Device, such as ports, latency or bandwidth
+    '''
+
+    def __init__(self, access = 10, vss = 1, core = 0, dell = 0, login_time = 0, **options):
+        self.login_time = login_time
+        self.devices = {}
+        self._order = []
+        gateways = ['sim-vss%02d' % (i + 1) for i in range(vss)]
+        downlinks = dict([(gateway, []) for gateway in gateways])
+        number = 0
+        for kind, amount, name, os in [('access', access, 'sim-as%05d', 'ios'), ('access', dell, 'sim-dell%05d', 'dell')]:
+            for i in range(amount):
+                number += 1
+                uplink = gateways[number % vss] if vss > 0 else None
+                device = Simulated_Device(name % (i + 1), kind, os, number = number, uplink = uplink, **options)
+                self._add(device)
+                if uplink != None:
+                    downlinks[uplink].append(device)
+        for gateway in gateways:
+            number += 1
+            self._add(Simulated_Device(gateway, 'vss', 'ios', number = number, downlinks = downlinks[gateway], **options))
+        for i in range(core):
+            number += 1
+            self._add(Simulated_Device('sim-core%02d' % (i + 1), 'core', 'nx-os', number = number,
+                                       downlinks = [self.devices[gateway] for gateway in gateways], **options))
+
+    def _add(self, device):
+        self.devices[device.host.lower()] = device
+        self._order.append(device)
+
+    '''
+    Returns a list of dictionaries with hostname, group, and os of every device
+    '''
+    def device_list(self):
+        return [{'hostname': device.host, 'group': device.group, 'os': device.os} for device in self._order]
+
+    '''
+    Opens a session to a simulated device. Use as the factory of a Connection_Pool.
+    The os is the simulated device's own, device_os is only taken to match the factory arguments.
+    '''
+    def factory(self, hostname, username, password, device_os = None):
+        device = self.devices.get(hostname.lower())
+        if device == None:
+            raise IOError('TCP connection to device failed. ' + hostname + ' is not a simulated device')
+        if self.login_time > 0:
+            sleep(self.login_time)
+        return Simulated_Session(device)
+
+    '''
+    Returns the logins, commands, bytes read and commands answered with % Invalid input summed over every device
+    '''
+    def stats(self):
+        totals = {'logins': 0, 'commands': 0, 'bytes': 0, 'invalid': 0}
+        for device in self._order:
+            with device._lock:
+                for name in totals:
+                    totals[name] += device.stats[name]
+        return totals
+
+class _Ssh_Interface(paramiko.ServerInterface if paramiko != None else object):
+
+    '''
+    Accepts any password. The device is picked by the username, which is given as username@hostname, or by the
+    destination of a direct-tcpip channel when the server is used as a jump host.
+    '''
+
+    def __init__(self):
+        self.hostname = None
+        self.shell = threading.Event()
+        ### Destination hostname of each direct-tcpip channel, by channel id
+        self.forwards = {}
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        self.hostname = username.split('@')[-1]
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.forwards[chanid] = destination[0].split('.')[0]
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell.set()
+        return True
+
+class Simulator_Server:
+
+    '''
+    Serves a Simulated_Fleet over SSH on a local port, so netmiko and Switch_Driver can be run end to end against
+    it, including the SSH handshake and channel reads. Every connection gets its own Simulated_Session. The server
+    is also a jump host: a direct-tcpip channel to a device hostname carries its own SSH connection to that device.
+    Needs paramiko.
+    @args fleet: Simulated_Fleet to serve
+    @args port: TCP port to listen on. Default is 0, any free port
+    @args address: address to listen on. Default is 127.0.0.1
+    '''
+
+    def __init__(self, fleet, port = 0, address = '127.0.0.1'):
+        if paramiko == None:
+            raise ImportError('Simulator_Server needs paramiko')
+        self.fleet = fleet
+        self.address = address
+        self._key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((address, port))
+        self._socket.listen(128)
+        self.port = self._socket.getsockname()[1]
+        self._closed = False
+        threading.Thread(target = self._accept, daemon = True).start()
+
+    '''
+    Write the server's host key to a known_hosts file, so clients that refuse unknown keys can connect
+    '''
+    def write_known_hosts(self, path):
+        with open(path, 'w') as known_hosts:
+            known_hosts.write('[' + self.address + ']:' + str(self.port) + ' ' + self._key.get_name() + ' ' + self._key.get_base64() + '\n')
+        return path
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                client, peer = self._socket.accept()
+            except OSError:
+                break
+            threading.Thread(target = self._serve, args = (client,), daemon = True).start()
+
+    '''
+    Run one SSH connection. Typed bytes are passed to the session and its replies are sent back as they arrive.
+    Each direct-tcpip channel is served as an SSH connection of its own, to the device it was opened to.
+    @args hostname: device of the connection. Default is the one given in the username
+    '''
+    def _serve(self, client, hostname = None):
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self._key)
+        server = _Ssh_Interface()
+        try:
+            transport.start_server(server = server)
+            channel = None
+            while channel == None and transport.is_active() and not self._closed:
+                channel = transport.accept(1)
+                if channel != None and channel.get_id() in server.forwards:
+                    threading.Thread(target = self._serve, args = (channel, server.forwards.pop(channel.get_id())), daemon = True).start()
+                    channel = None
+            if channel == None or not server.shell.wait(20):
+                return
+            device = self.fleet.devices.get((hostname or server.hostname or '').lower())
+            if device == None:
+                channel.send('% Unknown host\r\n')
+                return
+            session = Simulated_Session(device)
+            channel.send('\r\n' + session.prompt())
+            channel.settimeout(0.005)
+            while not self._closed and not channel.closed:
+                try:
+                    data = channel.recv(4096)
+                    if not data:
+                        break
+                    session.write_channel(data.decode(errors = 'replace'))
+                except socket.timeout:
+                    pass
+                reply = session.read_channel()
+                if reply:
+                    channel.sendall(reply.replace('\n', '\r\n'))
+        except Exception:
+            pass
+        finally:
+            transport.close()
+
+    '''
+    Opens a netmiko session to a simulated device through the server. Use as the factory of a Connection_Pool.
+    The device_type comes from the simulated device's own os, device_os is only taken to match the factory arguments.
+    '''
+    def factory(self, hostname, username, password, device_os = None):
+        device = self.fleet.devices.get(hostname.lower())
+        device_type = DEVICE_TYPES.get(device.os, 'cisco_ios') if device != None else 'cisco_ios'
+        return ConnectHandler(device_type = device_type, ip = self.address, port = self.port, username = username + '@' + hostname, password = password)
+
+    def close(self):
+        self._closed = True
+        self._socket.close()
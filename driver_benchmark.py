@@ -0,0 +1,251 @@
+import argparse
+import contextlib
+import io
+import os
+from time import time
+import Arp_Resolver
+import Connection_Pool
+import Fleet_Executor
+import Jump_Host
+import Switch_Metrics
+import Switch_Driver
+import Switch_Simulator
+
+'''
+End-to-end benchmark of the Switch_Driver methods against a Simulated_Fleet. Every method is run across the whole
+fleet through Fleet_Executor, with a Connection_Pool that opens simulated sessions, and the wall time, logins,
+commands and bytes read per device are printed for each fleet size. Nothing is sent over the network unless --ssh
+is given, which serves the fleet through Switch_Simulator.Simulator_Server and goes through netmiko. --jump goes
+through the same server used as a bastion, with every session a channel on --jump-transports SSH connections.
+'''
+
+'''
+Looks up the IP address of every MAC address on an access switch, sharing one Arp_Resolver across the fleet
+'''
+def resolve_ips(drive, resolver):
+    return drive.get_ip_address([record['mac'] for record in drive.get_mac_addresses()], resolver = resolver)
+
+'''
+Returns the running-config of the first three ports of a device, so every group is asked for ports it has
+'''
+def config_ports(drive):
+    return drive.get_config_port([entry['port'] for entry in list(drive.interface_index().values())[:3]])
+
+### Benchmarked methods: (label, method name or callable, args, kwargs)
+METHODS = [
+    ('get_cdp_neighbors', 'get_cdp_neighbors', (), {}),
+    ('get_connected_ports', 'get_connected_ports', (), {}),
+    ('get_connected_ports full', 'get_connected_ports', (), {'full': True}),
+    ('get_active_ports full', 'get_active_ports', (), {'full': True}),
+    ('get_open_ports', 'get_open_ports', (), {}),
+    ('get_mac_addresses', 'get_mac_addresses', (), {'full': True}),
+    ('get_ip_address', resolve_ips, (), {}),
+    ('get_config_port', config_ports, (), {}),
+    ('get_poe_ports', 'get_poe_ports', (), {'full': True}),
+    ('get_vitals', 'get_vitals', (), {}),
+    ('get_errdisabled', 'get_errdisabled', (), {}),
+    ('get_interface_counters', 'get_interface_counters', (), {}),
+    ('monitor_uplinks', 'monitor_uplinks', (), {}),
+    ('monitor_uplinks single_pass', 'monitor_uplinks', (), {'single_pass': True}),
+    ('ping', 'ping', (['10.1.1.20', '10.1.1.21'],), {}),
+    ('is_pingable', 'is_pingable', ('10.1.1.20',), {}),
+    ('get_running_config', 'get_running_config', (), {}),
+    ('backup', 'backup', ('svc_scp', 'scp_password'), {}),
+    ('erase_old_configs', 'erase_old_configs', (), {}),
+]
+
+'''
+Returns the number of physical ports of a simulated device whose status is one of statuses
+'''
+def port_count(device, statuses):
+    return len([interface for interface in device._physical() if interface['status'] in statuses and interface['port'][:2] not in Switch_Driver.Switch_Driver.LOGICAL_PORTS])
+
+def row_count(expected):
+    def check(device, result):
+        if not isinstance(result, (list, dict)) or len(result) != expected(device):
+            return 'expected ' + str(expected(device)) + ' rows, got ' + (str(len(result)) if isinstance(result, (list, dict)) else repr(result)[:60])
+        return None
+    return check
+
+'''
+Dell switches are asked for the MAC addresses on their Te ports only
+'''
+def mac_count(device):
+    if device.os == 'dell':
+        return len([row for row in device.mac_table if 'Te' in row[2]])
+    return len(device.mac_table)
+
+def not_empty(device, result):
+    return 'empty result' if not result else None
+
+'''
+Only access switches have PoE ports
+'''
+def poe_ports(device, result):
+    return not_empty(device, result) if device.group == 'access' else None
+
+'''
+Every IP resolved on ios access switches. Dell switches do not run CDP, so they have no gateway to ask
+'''
+def resolved(device, result):
+    error = row_count(mac_count)(device, result)
+    if error == None and device.os == 'ios' and 'N/A' in [row['ip'] for row in result]:
+        return 'unresolved IP address'
+    return error
+
+def errdisabled(device, result):
+    expected = port_count(device, ['err-disabled']) if device.os == 'ios' and device.group == 'access' else 0
+    if expected == 0:
+        return None if isinstance(result, str) else 'expected no err-disabled ports, got ' + repr(result)[:60]
+    return row_count(lambda device: expected)(device, result)
+
+'''
+The keys Fleet_Inventory compares to decide whether to poll a device again are parsed on ios and nx-os
+'''
+def vitals(device, result):
+    if not result:
+        return 'empty result'
+    if device.os in ['ios', 'nx-os']:
+        missing = [name for name in ['iosVer', 'iosFile', 'lastReload'] if result.get(name, 'N/A') == 'N/A']
+        if len(missing) > 0:
+            return 'show version gave no ' + ', '.join(missing)
+    return None
+
+def backed_up(device, result):
+    return None if result['complete'] else 'backup did not complete'
+
+### Check of each benchmarked method's result against the simulated device: function(device, result) returning an error or None
+CHECKS = {
+    'get_cdp_neighbors': row_count(lambda device: len(device._neighbors()) if device.os in ['ios', 'nx-os'] else 0),
+    'get_connected_ports': row_count(lambda device: port_count(device, ['connected'])),
+    'get_connected_ports full': row_count(lambda device: port_count(device, ['connected'])),
+    'get_active_ports full': row_count(lambda device: len([interface for interface in device._physical() if interface['port'][:2] not in Switch_Driver.Switch_Driver.LOGICAL_PORTS]) - port_count(device, ['disabled', 'err-disabled'])),
+    'get_open_ports': row_count(lambda device: port_count(device, ['disabled', 'err-disabled'])),
+    'get_mac_addresses': row_count(mac_count),
+    'get_ip_address': resolved,
+    'get_config_port': row_count(lambda device: 3),
+    'get_poe_ports': poe_ports,
+    'get_vitals': vitals,
+    'get_errdisabled': errdisabled,
+    'get_interface_counters': row_count(lambda device: len(device.interfaces)),
+    'ping': row_count(lambda device: 2),
+    'is_pingable': row_count(lambda device: 1),
+    'get_running_config': not_empty,
+    'backup': backed_up,
+}
+
+'''
+Builds a fleet of size devices: one VSS per 100 devices, one core per 1000 and one dell switch per 50. The rest are
+ios access switches.
+'''
+def build_fleet(size, options):
+    vss = max(1, size // 100) if size > 1 else 0
+    core = size // 1000
+    dell = size // 50
+    return Switch_Simulator.Simulated_Fleet(access = size - vss - core - dell, vss = vss, core = core, dell = dell, **options)
+
+'''
+Run one method across the fleet and return a dictionary of its measurements. A device fails when the method
+raised, when any command it sent was answered with % Invalid input, or when the result does not match the device.
+'''
+def run_method(fleet, executor, devices, label, method, args, kwargs):
+    before = fleet.stats()
+    invalid = dict([(host, device.stats['invalid']) for host, device in fleet.devices.items()])
+    starting_time = time()
+    ### Methods like backup print a line per device
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = executor.run(devices, method, *args, **kwargs)
+    wall = time() - starting_time
+    after = fleet.stats()
+    failed = []
+    for result in results:
+        device = fleet.devices[result['host'].lower()]
+        if result['error'] == None and device.stats['invalid'] > invalid[result['host'].lower()]:
+            result['error'] = ValueError(result['host'] + ' answered a command with % Invalid input')
+        elif result['error'] == None and label in CHECKS:
+            error = CHECKS[label](device, result['result'])
+            if error != None:
+                result['error'] = ValueError(result['host'] + ' ' + error)
+        if result['error'] != None:
+            failed.append(result)
+    return {'hosts': len(devices), 'method': label, 'wall': wall, 'logins': after['logins'] - before['logins'],
+            'commands': (after['commands'] - before['commands']) / len(devices), 'bytes': (after['bytes'] - before['bytes']) / len(devices),
+            'slowest': max([result['elapsed'] for result in results] + [0]), 'failed': len(failed),
+            'error': repr(failed[0]['error']) if len(failed) > 0 else ''}
+
+def report(row):
+    print('%6d  %-28s %9.2f %7d %10.1f %11.0f %9.2f %7d' % (row['hosts'], row['method'], row['wall'], row['logins'], row['commands'],
+                                                           row['bytes'], row['slowest'], row['failed']))
+
+parser = argparse.ArgumentParser(description = 'Benchmark Switch_Driver against simulated switches')
+parser.add_argument('--sizes', type = int, nargs = '+', default = [1, 10, 100, 1000], help = 'fleet sizes to run, up to 5000')
+parser.add_argument('--methods', nargs = '+', help = 'labels of the methods to run. Default is every method')
+parser.add_argument('--max-sessions', type = int, default = 1000, help = 'Fleet_Executor max_sessions')
+parser.add_argument('--latency', type = float, default = 0, help = 'seconds before each reply starts to arrive')
+parser.add_argument('--bandwidth', type = float, help = 'bytes per second each reply arrives at')
+parser.add_argument('--login-time', type = float, default = 0, help = 'seconds each new session takes to log in')
+parser.add_argument('--ports', type = int, default = 48, help = 'edge ports per access switch')
+parser.add_argument('--macs', type = int, default = 1, help = 'MAC addresses per connected edge port')
+parser.add_argument('--config-lines', type = int, default = 0, help = 'extra running-config lines per device')
+parser.add_argument('--ssh', action = 'store_true', help = 'go through netmiko and a local SSH server instead of in-process sessions')
+parser.add_argument('--jump', action = 'store_true', help = 'like --ssh, with every session a direct-tcpip channel through the server as a Jump_Host')
+parser.add_argument('--jump-transports', type = int, default = 1, help = 'SSH connections to the Jump_Host. Default is 1')
+parser.add_argument('--file', help = 'name of a CSV file in output/ for the results')
+parser.add_argument('--metrics', help = 'name of a file in output/ for the Switch_Metrics of the run. JSON when it ends in .json, Prometheus text otherwise')
+arguments = parser.parse_args()
+
+options = {'latency': arguments.latency, 'bandwidth': arguments.bandwidth, 'ports': arguments.ports, 'macs': arguments.macs,
+           'config_lines': arguments.config_lines}
+rows = []
+os.makedirs('output', exist_ok = True)
+print('%6s  %-28s %9s %7s %10s %11s %9s %7s' % ('Hosts', 'Method', 'Wall(s)', 'Logins', 'Cmds/dev', 'Bytes/dev', 'Slowest', 'Failed'))
+for size in arguments.sizes:
+    fleet = build_fleet(size, options)
+    fleet.login_time = arguments.login_time
+    server = None
+    jump = None
+    if arguments.jump:
+        server = Switch_Simulator.Simulator_Server(fleet)
+        jump = Jump_Host.Jump_Host(server.address, 'benchmark', 'benchmark', port = server.port, transports = arguments.jump_transports, domain = '',
+                                   known_hosts = server.write_known_hosts('output/benchmark_known_hosts'))
+        pool = Connection_Pool.Connection_Pool(factory = jump.factory)
+    elif arguments.ssh:
+        server = Switch_Simulator.Simulator_Server(fleet)
+        pool = Connection_Pool.Connection_Pool(factory = server.factory)
+    else:
+        pool = Connection_Pool.Connection_Pool(factory = fleet.factory)
+    executor = Fleet_Executor.Fleet_Executor('benchmark', 'benchmark', max_sessions = arguments.max_sessions, pool = pool)
+    devices = fleet.device_list()
+    resolver = Arp_Resolver.Arp_Resolver('benchmark', 'benchmark', pool = pool, devices = devices)
+    for label, method, args, kwargs in METHODS:
+        if arguments.methods != None and label not in arguments.methods:
+            continue
+        if method == resolve_ips:
+            args = (resolver,)
+        row = run_method(fleet, executor, devices, label, method, args, kwargs)
+        report(row)
+        rows.append(row)
+        if row['failed'] > 0:
+            print('        first error:', row['error'])
+    pool.close_all()
+    if jump != None:
+        print('        jump host logins:', jump.logins, 'channels:', jump.channels)
+        jump.close()
+    if server != None:
+        server.close()
+
+### Commands that took the most time over every run, from the drivers' metrics
+metrics = Switch_Metrics.default_metrics()
+print('\n%-44s %8s %10s %9s %9s' % ('Command', 'Count', 'Total(s)', 'p50(s)', 'p95(s)'))
+for row in metrics.summary()[:15]:
+    print('%-44s %8d %10.2f %9.4f %9.4f' % (row['command'][:44], row['count'], row['total'], row['p50'], row['p95']))
+if arguments.metrics != None:
+    metrics.write('output/' + arguments.metrics)
+
+if arguments.file != None:
+    file = open('output/' + arguments.file + '.csv', 'w')
+    file.write('Hosts,Method,Wall,Logins,Commands per device,Bytes per device,Slowest,Failed\n')
+    for row in rows:
+        file.write(','.join([str(row['hosts']), row['method'], format(row['wall'], '.3f'), str(row['logins']), format(row['commands'], '.1f'),
+                             format(row['bytes'], '.0f'), format(row['slowest'], '.3f'), str(row['failed'])]) + '\n')
+    file.close()
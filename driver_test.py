@@ -1,6 +1,6 @@
-import Switch_Driver
+import Fleet_Executor
+import Switch_Metrics
 import getpass
-from multiprocessing.dummy import Pool as ThreadPool
 from time import time
 
 def read_devices(devices_filename):
@@ -15,57 +15,41 @@ def read_devices(devices_filename):
 
 '''
 This is where you call the SwitchDriver function you want to run.
+Prints each device as soon as it finishes so failures show up while the sweep is still running.
 '''
-def worker(device_and_creds):
-    device = device_and_creds[0]
-    creds  = device_and_creds[1]
-	### Creating friendly names for arguments in net_connect
-	### device_type must match a preset type in netmiko. All devices in the list are Cisco or Cisco-like so device_type is being harcoded to cisco_ios
-    device_hostname = device[0]
-    device_group = device[1]
-    device_os = device[2]
-    user = creds[0]
-    pw = creds[1]
-    ### If connecting to atconfig is needed
-    # scp_user = creds[2]
-    # scp_password = creds[3]
-
-    ### Create SwitchDriver object and call method
-    ### Runs inside a try clause so the script keeps running if there is an error on the device
-    try:
-        drive = Switch_Driver.Switch_Driver(device_hostname, user, pw, device_group, device_os)
-        drive.get_errdisabled()
-    except:
-        print('****************', device_hostname, 'did not start.')
+def report(result):
+    ### Runs inside a try clause in the executor so the script keeps running if there is an error on the device
+    if result['error'] != None:
+        print('****************', result['host'], 'did not start.')
 
 
 devices = read_devices('host_files/backup_all_hosts.txt')
 user = input('Username: ')
 password = getpass.getpass('Password: ')
-creds = [user, password]
 ### If needing to connect to atconfig
 # scp_user = 'svc_scpatconfig'
 # scp_password = getpass.getpass('SCP Password: ')
-# creds = [user, password, scp_user, scp_password]
-
-num_threads_str = input('\nNumber of threads (10): ') or '10'
-num_threads = int(num_threads_str)
-
-###Create list for passing to config worker
-config_params_list = []
 
-for i in range(len(devices)):
-	device = [devices[i]['hostname'], devices[i]['group'], devices[i]['os']]
-	config_params_list.append((device, creds))
+max_sessions_str = input('\nMaximum concurrent sessions (100): ') or '100'
+max_sessions = int(max_sessions_str)
 
 starting_time = time()
 
-print ('\n--- Creating threadpool\n')
-threads = ThreadPool(num_threads)
-results = threads.map(worker, config_params_list)
-
-threads.close()
-threads.join()
+print ('\n--- Creating fleet executor\n')
+executor = Fleet_Executor.Fleet_Executor(user, password, max_sessions = max_sessions)
+### Call the SwitchDriver method by name. Arguments after the name are passed to the method
+results = executor.run(devices, 'get_errdisabled', callback = report)
+### If connecting to atconfig is needed
+# results = executor.run(devices, 'backup', scp_user, scp_password, callback = report)
+### To write the records of every device to one file, give the method a Result_Sink as its file. CSV, JSONL or Parquet by extension
+# import Result_Sink
+# with Result_Sink.Result_Sink('output/errdisabled.csv') as sink:
+#     results = executor.run(devices, 'get_errdisabled', file = sink, callback = report)
 
 total_time = format((time()-starting_time)/60, '.2f')
-print('\n---- Elapsed time: ', str(total_time) + ' minutes')
\ No newline at end of file
+print('\n---- Elapsed time: ', str(total_time) + ' minutes')
+
+### Where the time went, per command. The full histograms can be written for Prometheus or as JSON
+for row in Switch_Metrics.default_metrics().summary()[:10]:
+    print(row['command'], row['count'], format(row['total'], '.1f') + 's', 'p95', format(row['p95'], '.2f') + 's')
+# Switch_Metrics.default_metrics().write('output/metrics.prom')
\ No newline at end of file